@@ -0,0 +1,262 @@
+"""
+Микробенчмарки слоя хранения UrlInfoDbClient.
+
+    python -m benchmarks.bench_db --sizes 10k --check
+    python -m benchmarks.bench_db --sizes 10k,1m,10m --update-baseline
+
+Для каждого размера строится синтетическая база (кэшируется в
+--cache-dir) и замеряются get_by_id по ссылке и по коду,
+increment_clicks, process, get_all и delete_by_id: ops/s, p50 и p99
+последовательно и с --concurrency одновременными вызовами.
+
+--check сравнивает ops/s с baseline_db.json и завершается с кодом 1,
+если операция замедлилась больше чем на --threshold. Базовые значения
+зависят от машины: их нужно обновлять (--update-baseline) на той же
+машине, где работает проверка.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("REAPER_ENABLED", "false")
+os.environ.setdefault("LOG_RATE_LIMITS", '{"database": 10, "database_errors": 10}')
+
+from src.db.clients import lite_client  # noqa: E402
+from src.db.clients.lite_client import UrlInfoDbClient  # noqa: E402
+from src.db.compression import url_codec  # noqa: E402
+from src.db.session import create_secondary_indexes, drop_secondary_indexes, init_schema  # noqa: E402
+from src.db.writer import db_writer  # noqa: E402
+from src.utils.generators import build_short_url, sequence_short_code, url_digest  # noqa: E402
+
+
+BASELINE_PATH = Path(__file__).with_name("baseline_db.json")
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def synthetic_url(i: int) -> str:
+    return f"https://site{i % 997}.bench.test/articles/{i}?utm_source=bench&ref={i * 7919 % 100_000}"
+
+
+def build_database(path: Path, rows: int, batch: int = 50_000):
+    """Синтетическая база из rows ссылок (без сжатия)"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    init_schema(conn)
+    drop_secondary_indexes(conn)
+    for start in range(0, rows, batch):
+        conn.execute("BEGIN")
+        conn.executemany(
+            """
+            INSERT INTO urls (id, short_url, original_url, url_hash, short_code, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    i + 1,
+                    build_short_url("http://sho.rt", sequence_short_code(i)),
+                    synthetic_url(i),
+                    url_digest(synthetic_url(i)),
+                    sequence_short_code(i),
+                    i,
+                )
+                for i in range(start, min(start + batch, rows))
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO url_clicks (link_id, clicks) VALUES (?, ?)",
+            ((i + 1, i % 50) for i in range(start, min(start + batch, rows)) if i % 50),
+        )
+        conn.execute("COMMIT")
+    create_secondary_indexes(conn)
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+def use_database(path: Path):
+    """Направить клиент, writer и кодек на базу бенчмарка"""
+    lite_client.db_path = str(path)
+    db_writer.db_path = str(path)
+    url_codec.db_path = str(path)
+    url_codec.reload()
+
+
+async def measure(
+    op: Callable[[int], Awaitable[None]], count: int, concurrency: int
+) -> Dict[str, float]:
+    """ops/s и перцентили задержки count вызовов op(i) в concurrency потоков"""
+    latencies: List[float] = []
+    counter = iter(range(count))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await op(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "ops_per_sec": round(count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+    }
+
+
+def primitives(rows: int, run_id: str) -> Dict[str, Callable[[int], Awaitable[None]]]:
+    rnd = random.Random(rows)
+    sample = [rnd.randrange(rows) for _ in range(4096)]
+    new_url = lambda i: f"https://new.bench.test/{run_id}/{i}"  # noqa: E731
+
+    async def get_by_url(i):
+        await asyncio.to_thread(UrlInfoDbClient.get_by_id, synthetic_url(sample[i % 4096]))
+
+    async def get_by_code(i):
+        await asyncio.to_thread(UrlInfoDbClient.get_by_id, "", sequence_short_code(sample[i % 4096]))
+
+    async def increment_clicks(i):
+        # id строк шаблонной базы - номер ссылки + 1
+        await UrlInfoDbClient.increment_clicks(sample[i % 4096] + 1)
+
+    async def process(i):
+        code = f"n{run_id}x{i}"
+        await UrlInfoDbClient.process(
+            {"short_url": build_short_url("http://sho.rt", code), "short_code": code, "original_url": new_url(i)}
+        )
+
+    async def get_all(i):
+        await asyncio.to_thread(UrlInfoDbClient.get_all, sample[i % 4096] % 1000, 20)
+
+    async def delete_by_id(i):
+        # Удаляет ссылки, созданные замером process
+        await UrlInfoDbClient.delete_by_id(new_url(i))
+
+    return {
+        "get_by_url": get_by_url,
+        "get_by_code": get_by_code,
+        "increment_clicks": increment_clicks,
+        "process": process,
+        "get_all": get_all,
+        "delete_by_id": delete_by_id,
+    }
+
+
+async def run_size(
+    path: Path, rows: int, ops: int, concurrency: int, repeat: int
+) -> Dict[str, Dict[str, float]]:
+    """Лучший из repeat замеров каждой операции: меньше шума от соседних процессов"""
+    use_database(path)
+    await db_writer.start()
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for mode, workers in (("seq", 1), (f"c{concurrency}", concurrency)):
+            for attempt in range(repeat):
+                # process и delete_by_id каждого прогона работают со своими ссылками
+                for name, op in primitives(rows, run_id=f"{mode}-{attempt}").items():
+                    result = await measure(op, ops, workers)
+                    key = f"{name}.{mode}"
+                    if key not in results or result["ops_per_sec"] > results[key]["ops_per_sec"]:
+                        results[key] = result
+    finally:
+        await db_writer.stop()
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Операции, ops/s которых упал больше чем на threshold"""
+    regressions = []
+    for size, ops in results.items():
+        for name, current in ops.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            drop = 1 - current["ops_per_sec"] / base["ops_per_sec"]
+            if drop > threshold:
+                regressions.append(
+                    f"{size} {name}: {current['ops_per_sec']:.0f} ops/s, "
+                    f"baseline {base['ops_per_sec']:.0f} ({drop:.0%} slower)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10k", help=f"Размеры баз через запятую: {', '.join(SIZES)}")
+    parser.add_argument("--ops", type=int, default=2000, help="Вызовов каждой операции в замере")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных вызовов")
+    parser.add_argument("--repeat", type=int, default=3, help="Замеров каждой операции (берется лучший)")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "boto-bench"))
+    parser.add_argument("--threshold", type=float, default=0.25, help="Допустимое замедление (0.25 = 25%%)")
+    parser.add_argument("--check", action="store_true", help="Сравнить с baseline_db.json")
+    parser.add_argument("--update-baseline", action="store_true", help="Записать результаты в baseline")
+    args = parser.parse_args()
+
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    results = {}
+    for size in args.sizes.split(","):
+        rows = SIZES[size]
+        template = cache_dir / f"urls-{size}.db"
+        if not template.exists():
+            started = time.perf_counter()
+            build_database(template, rows)
+            print(f"built {size} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        else:
+            # Шаблон из кэша мог быть собран до последней миграции схемы
+            conn = sqlite3.connect(template)
+            conn.row_factory = sqlite3.Row
+            init_schema(conn)
+            conn.close()
+
+        # Замеры пишут в копию, чтобы шаблон оставался одинаковым между запусками
+        work = cache_dir / f"work-{size}.db"
+        src = sqlite3.connect(template)
+        dst = sqlite3.connect(work)
+        src.backup(dst)
+        src.close()
+        dst.close()
+
+        results[size] = asyncio.run(run_size(work, rows, args.ops, args.concurrency, args.repeat))
+
+    print(f"{'size':<6}{'operation':<28}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for size, ops in results.items():
+        for name, r in ops.items():
+            print(f"{size:<6}{name:<28}{r['ops_per_sec']:>12.0f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+    if args.update_baseline:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+    if args.check:
+        if not BASELINE_PATH.exists():
+            print("no baseline to compare with", file=sys.stderr)
+            return 1
+        regressions = compare(results, json.loads(BASELINE_PATH.read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Задержка POST /shorten во время всплеска регистраций.
+
+    python -m benchmarks.bench_hashing --signups 40 --requests 200
+
+Сравнивает три режима:
+- idle: регистраций нет;
+- inline: хеш пароля считается прямо в обработчике (как get_password_hash);
+- pool: хеш считается через password_hasher в пуле процессов.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from typing import List
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("REAPER_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from src.core.config import settings  # noqa: E402
+from src.db.session import get_db, init_schema  # noqa: E402
+from src.main import app  # noqa: E402
+from src.services.hashing import hash_password_sync, password_hasher  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+async def shorten_latencies(client: httpx.AsyncClient, count: int) -> List[float]:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.post("/shorten", json={"url": f"https://bench.test/{uuid.uuid4()}"})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return latencies
+
+
+async def inline_signup():
+    await asyncio.sleep(0)
+    hash_password_sync(
+        "password", settings.PASSWORD_HASH_N, settings.PASSWORD_HASH_R, settings.PASSWORD_HASH_P
+    )
+
+
+async def pooled_signup():
+    await password_hasher.hash("password")
+
+
+async def run(signups: int, requests: int):
+    with get_db(settings.DB_PATH) as conn:
+        init_schema(conn)
+    # Прогрев пула, чтобы не мерить запуск процессов
+    await asyncio.gather(*(pooled_signup() for _ in range(settings.PASSWORD_HASH_WORKERS)))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await shorten_latencies(client, 10)
+
+        print(f"{'mode':<8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for mode, signup in (("idle", None), ("inline", inline_signup), ("pool", pooled_signup)):
+            burst = None
+            if signup is not None:
+                burst = asyncio.gather(*(signup() for _ in range(signups)))
+            latencies = await shorten_latencies(client, requests)
+            if burst is not None:
+                await burst
+            print(
+                f"{mode:<8}{percentile(latencies, 0.5) * 1000:>10.2f}"
+                f"{percentile(latencies, 0.99) * 1000:>10.2f}{max(latencies) * 1000:>10.2f}"
+            )
+
+    await password_hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--signups", type=int, default=40, help="Регистраций во всплеске")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов /shorten в замере")
+    args = parser.parse_args()
+    asyncio.run(run(args.signups, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Память и скорость представления ссылки: UrlInfo (pydantic) против LinkRecord.
+
+    python -m benchmarks.bench_records --links 50000 --lookups 20000
+
+Для каждого представления выводится:
+- bytes/link: сколько памяти удерживает одна ссылка в списке из --links
+  записей вместе со строками (tracemalloc: выборка строк из базы, запись,
+  затем строки выборки освобождаются, и остается то, что держит запись);
+- convert/s: преобразований строки выборки в запись;
+- lookups/s: поисков по коду с запросом к базе, как в get_by_id.
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("REAPER_ENABLED", "false")
+
+from src.core.config import settings  # noqa: E402
+from src.db.clients.lite_client import (  # noqa: E402
+    LINK_COLUMNS, URL_COLUMNS, URLS_WITH_CLICKS, UrlInfoDbClient,
+)
+from src.db.session import get_db, init_schema  # noqa: E402
+from src.utils.generators import build_short_url, sequence_short_code, url_digest  # noqa: E402
+
+
+def fill(conn: sqlite3.Connection, links: int):
+    init_schema(conn)
+    conn.execute("DELETE FROM urls")
+    conn.executemany(
+        "INSERT INTO urls (short_url, original_url, url_hash, short_code) VALUES (?, ?, ?, ?)",
+        (
+            (
+                build_short_url("http://sho.rt", sequence_short_code(i)),
+                f"https://site{i % 997}.bench.test/articles/{i}?ref={i * 7919 % 100_000}",
+                url_digest(f"https://site{i % 997}.bench.test/articles/{i}?ref={i * 7919 % 100_000}"),
+                sequence_short_code(i),
+            )
+            for i in range(links)
+        ),
+    )
+    conn.commit()
+
+
+def bytes_per_link(conn: sqlite3.Connection, sql: str, convert: Callable) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = conn.execute(sql).fetchall()
+    records = [convert(row) for row in rows]
+    del rows
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = len(records)
+    del records
+    return (after - before) / count
+
+
+def rate(count: int, fn: Callable[[int], object]) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--links", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with get_db(settings.DB_PATH) as conn:
+        fill(conn, args.links)
+        variants = {
+            "UrlInfo": (URL_COLUMNS, UrlInfoDbClient._from_row),
+            "LinkRecord": (LINK_COLUMNS, UrlInfoDbClient._record_from_row),
+        }
+        print(f"{'record':<12}{'bytes/link':>12}{'convert/s':>14}{'lookups/s':>14}")
+        for name, (columns, convert) in variants.items():
+            sql = f"SELECT {columns} FROM {URLS_WITH_CLICKS}"
+            size = bytes_per_link(conn, sql, convert)
+            rows = conn.execute(sql).fetchall()
+            # Переменные цикла связываются аргументами по умолчанию (ruff B023)
+            converts = rate(len(rows), lambda i, rows=rows, convert=convert: convert(rows[i]))
+
+            def lookup(i, columns=columns, convert=convert):
+                code = sequence_short_code(i * 7 % args.links)
+                row = conn.execute(
+                    f"SELECT {columns} FROM {URLS_WITH_CLICKS} WHERE short_code = ?", (code,)
+                ).fetchone()
+                return convert(row)
+
+            lookups = rate(args.lookups, lookup)
+            print(f"{name:<12}{size:>12.0f}{converts:>14.0f}{lookups:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
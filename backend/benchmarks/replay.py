@@ -0,0 +1,297 @@
+"""
+Воспроизведение записанного трафика (src.services.traffic_capture).
+
+    python -m benchmarks.replay run boto.db.trace.* --speed 10 --output new.json
+    python -m benchmarks.replay seed boto.db.trace.* --db replay.db
+    python -m benchmarks.replay run boto.db.trace.* --url http://127.0.0.1:8000 --output new.json
+    python -m benchmarks.replay compare old.json new.json --threshold 0.1
+
+run без --url поднимает приложение в этом же процессе на временной базе,
+в которую заранее записаны все коды из трейса. С --url нагрузка идет
+на уже запущенный экземпляр; его базу нужно заранее заполнить командой
+seed. Сравнение двух сборок: run на каждой сборке с --output и compare.
+
+Запросы отправляются по расписанию трейса (--speed 1 - реальное время,
+10 - в 10 раз быстрее, 0 - без пауз), не дожидаясь ответов на предыдущие.
+Задержка считается от запланированного момента отправки, поэтому
+очередь перед перегруженным сервером тоже попадает в перцентили.
+Ссылки /shorten восстанавливаются из url_digest как синтетические:
+одна и та же ссылка в трейсе дает одну и ту же синтетическую.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "replay.db"))
+for _task in ("REAPER", "BACKUP", "SEARCH_BACKFILL", "ARCHIVE", "MEMORY_WATCH", "TRAFFIC_CAPTURE"):
+    os.environ.setdefault(f"{_task}_ENABLED", "false")
+os.environ.setdefault("LOG_RATE_LIMITS", '{"network": 10, "database": 10, "database_errors": 10}')
+
+from src.db.session import init_schema  # noqa: E402
+from src.services.traffic_capture import (  # noqa: E402
+    KIND_LOOKUP, KIND_NAMES, KIND_SHORTEN, TraceRecord, merge_traces,
+)
+from src.utils.generators import build_short_url, url_digest  # noqa: E402
+
+
+PERCENTILES = {"p50_ms": 0.5, "p90_ms": 0.9, "p99_ms": 0.99, "p999_ms": 0.999}
+
+Send = Callable[[int, bytes], Awaitable[int]]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def synthetic_url(url_hash: bytes) -> str:
+    return f"https://replay.test/{url_hash.hex()}"
+
+
+def seed_database(path: str, records: Iterable[TraceRecord]) -> int:
+    """Записать в базу все найденные в трейсе коды, вернуть их число"""
+    codes = {key.decode() for _, kind, key in records if kind == KIND_LOOKUP}
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        init_schema(conn)
+        conn.execute("BEGIN")
+        before = conn.total_changes
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO urls (short_url, original_url, url_hash, short_code, updated_at)
+            VALUES (?, ?, ?, ?, 0)
+            """,
+            (
+                (build_short_url("http://replay", code), url, url_digest(url), code)
+                for code, url in ((code, f"https://replay.test/code/{code}") for code in sorted(codes))
+            ),
+        )
+        seeded = conn.total_changes - before
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return seeded
+
+
+def http_sender(client) -> Send:
+    """Запрос трейса -> HTTP-запрос, возвращает статус ответа"""
+    async def send(kind: int, key: bytes) -> int:
+        if kind == KIND_SHORTEN:
+            response = await client.post("/shorten", json={"url": synthetic_url(key)})
+        else:
+            response = await client.get("/" + key.decode())
+        return response.status_code
+
+    return send
+
+
+async def replay(
+    records: Iterable[TraceRecord], send: Send, speed: float, max_inflight: int
+) -> Dict[str, Any]:
+    """Проиграть записи по расписанию, вернуть сырые результаты"""
+    loop = asyncio.get_running_loop()
+    inflight = asyncio.Semaphore(max_inflight)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    tasks = set()
+    max_lag = 0.0
+    started = loop.time()
+    first_ts: Optional[int] = None
+
+    async def one(kind: int, key: bytes, due: float):
+        name = KIND_NAMES.get(kind, "unknown")
+        try:
+            status = await send(kind, key)
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            inflight.release()
+        latencies[name].append(loop.time() - due)
+        statuses[name][str(status)] += 1
+
+    for ts, kind, key in records:
+        if first_ts is None:
+            first_ts = ts
+        due = started + (ts - first_ts) / 1000 / speed if speed > 0 else loop.time()
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await inflight.acquire()
+        max_lag = max(max_lag, loop.time() - due)
+        task = asyncio.create_task(one(kind, key, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
+    return {
+        "duration_s": loop.time() - started,
+        "max_lag_ms": round(max_lag * 1000, 3),
+        "latencies": latencies,
+        "statuses": statuses,
+    }
+
+
+def summarize(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Перцентили по каждому типу запроса и по всем вместе"""
+    duration = max(raw["duration_s"], 1e-9)
+    groups = dict(raw["latencies"])
+    groups["all"] = [value for values in raw["latencies"].values() for value in values]
+    statuses = dict(raw["statuses"])
+    statuses["all"] = sum(raw["statuses"].values(), Counter())
+
+    routes = {}
+    for name, values in groups.items():
+        if not values:
+            continue
+        counts = statuses[name]
+        route = {
+            "count": len(values),
+            "rps": round(len(values) / duration, 1),
+            "errors": sum(n for status, n in counts.items() if not status.isdigit() or int(status) >= 500),
+            "statuses": dict(counts),
+        }
+        for key, q in PERCENTILES.items():
+            route[key] = round(percentile(values, q) * 1000, 3)
+        route["max_ms"] = round(max(values) * 1000, 3)
+        routes[name] = route
+    return {"duration_s": round(raw["duration_s"], 3), "max_lag_ms": raw["max_lag_ms"], "routes": routes}
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> Tuple[List[str], List[str]]:
+    """Таблица сравнения двух отчетов и список регрессий (p99 или ошибки)"""
+    lines = [f"{'route':<14}{'metric':<10}{'base':>12}{'new':>12}{'change':>10}"]
+    regressions = []
+    for name, current in new["routes"].items():
+        previous = base["routes"].get(name)
+        if previous is None:
+            continue
+        for metric in (*PERCENTILES, "max_ms", "rps", "errors"):
+            old, value = previous[metric], current[metric]
+            change = (value - old) / old if old else 0.0
+            lines.append(f"{name:<14}{metric:<10}{old:>12.3f}{value:>12.3f}{change:>+10.1%}")
+        if previous["p99_ms"] and current["p99_ms"] > previous["p99_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {previous['p99_ms']:.3f} -> {current['p99_ms']:.3f} ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return lines, regressions
+
+
+def _build_id() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _run_local(records: List[TraceRecord], speed: float, max_inflight: int) -> Dict[str, Any]:
+    """Приложение в этом процессе на временной базе с кодами из трейса"""
+    import httpx
+
+    from src.main import app
+
+    seed_database(os.environ["DB_PATH"], records)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            return await replay(records, http_sender(client), speed, max_inflight)
+
+
+async def _run_remote(records: List[TraceRecord], url: str, speed: float, max_inflight: int) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max_inflight)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        return await replay(records, http_sender(client), speed, max_inflight)
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"{'route':<14}{'count':>8}{'rps':>10}{'errors':>8}" + "".join(f"{key:>10}" for key in PERCENTILES) + f"{'max_ms':>10}")
+    for name, r in report["routes"].items():
+        print(
+            f"{name:<14}{r['count']:>8}{r['rps']:>10.1f}{r['errors']:>8}"
+            + "".join(f"{r[key]:>10.3f}" for key in PERCENTILES)
+            + f"{r['max_ms']:>10.3f}"
+        )
+    print(f"duration {report['duration_s']:.1f}s, max schedule lag {report['max_lag_ms']:.1f} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Проиграть трейс и записать отчет")
+    run.add_argument("traces", nargs="+", help="Файлы трейса (по одному на воркер)")
+    run.add_argument("--url", help="Адрес запущенного экземпляра (по умолчанию - приложение в процессе)")
+    run.add_argument("--speed", type=float, default=1.0, help="Ускорение: 1 - реальное время, 0 - без пауз")
+    run.add_argument("--max-inflight", type=int, default=256, help="Одновременных запросов не больше")
+    run.add_argument("--limit", type=int, help="Проиграть только первые N запросов")
+    run.add_argument("--output", help="Куда записать отчет JSON")
+    run.add_argument("--compare", help="Отчет базовой сборки для сравнения")
+    run.add_argument("--threshold", type=float, default=0.1, help="Допустимый рост p99 (0.1 = 10%%)")
+
+    seed = subparsers.add_parser("seed", help="Записать коды из трейса в базу экземпляра для --url")
+    seed.add_argument("traces", nargs="+")
+    seed.add_argument("--db", required=True, help="Путь к базе SQLite")
+
+    diff = subparsers.add_parser("compare", help="Сравнить два отчета")
+    diff.add_argument("base")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=0.1, help="Допустимый рост p99 (0.1 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        print(f"seeded {seed_database(args.db, merge_traces(args.traces))} codes")
+        return 0
+
+    if args.command == "compare":
+        base, new = (json.loads(Path(path).read_text()) for path in (args.base, args.new))
+    else:
+        records = list(merge_traces(args.traces))[:args.limit]
+        if not records:
+            print("trace is empty", file=sys.stderr)
+            return 1
+        if args.url:
+            raw = asyncio.run(_run_remote(records, args.url, args.speed, args.max_inflight))
+        else:
+            raw = asyncio.run(_run_local(records, args.speed, args.max_inflight))
+        new = summarize(raw)
+        new["meta"] = {
+            "build": _build_id(),
+            "target": args.url or "in-process",
+            "speed": args.speed,
+            "records": len(records),
+            "traces": [os.path.basename(path) for path in args.traces],
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        _print_report(new)
+        if args.output:
+            Path(args.output).write_text(json.dumps(new, indent=2, sort_keys=True) + "\n")
+        if not args.compare:
+            return 0
+        base = json.loads(Path(args.compare).read_text())
+
+    lines, regressions = compare(base, new, args.threshold)
+    print(f"base {base.get('meta', {}).get('build', '?')} vs new {new.get('meta', {}).get('build', '?')}")
+    for line in lines:
+        print(line)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,8 @@ from fastapi.responses import PlainTextResponse
 
 
 
-from src.api.v1 import health, page
+from src.api.v1 import admin, auth, bulk_delete, health, metrics, page, search, stats, sync
+from src.core.config import settings
 
 
 home_router = APIRouter()
@@ -16,4 +17,15 @@ async def home():
 
 api_router = APIRouter()
 api_router.include_router(health.router)
+api_router.include_router(metrics.router)
+api_router.include_router(admin.router)
+if not settings.CODE_INDEX_PATH:
+    # Синхронизация, статистика, поиск и массовое удаление работают с SQLite, в режиме только чтения их нет
+    api_router.include_router(sync.router)
+    api_router.include_router(stats.router)
+    api_router.include_router(search.router)
+    api_router.include_router(bulk_delete.router)
+    if settings.SECRET_KEY:
+        # Без ключа подписи токены выдавать нельзя
+        api_router.include_router(auth.router)
 api_router.include_router(page.router)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import hmac
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from src.core.config import settings
+from src.services.memory import memory_profiler
+from src.services.traffic_capture import traffic_capture
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Эндпоинты требуют заголовок X-Admin-Token, равный ADMIN_TOKEN.
+    Без ADMIN_TOKEN административных эндпоинтов нет (404)
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+GroupBy = Literal["filename", "lineno", "traceback"]
+
+
+@router.get("/memory", summary="RSS, размеры подсистем и состояние tracemalloc")
+async def memory_report():
+    return memory_profiler.report()
+
+
+@router.post("/memory/tracemalloc/start", summary="Включить tracemalloc и снять базовый снимок")
+async def memory_tracing_start(frames: int = Query(settings.MEMORY_TRACEMALLOC_FRAMES, ge=1, le=64)):
+    """Трассировка действует до /stop и замедляет аллокации"""
+    memory_profiler.start(frames)
+    memory_profiler.take_baseline()
+    return memory_profiler.report()
+
+
+@router.post("/memory/tracemalloc/stop", summary="Выключить tracemalloc")
+async def memory_tracing_stop():
+    memory_profiler.stop()
+    return memory_profiler.report()
+
+
+@router.post("/memory/snapshot", summary="Снять новый базовый снимок")
+async def memory_snapshot():
+    memory_profiler.take_baseline()
+    return memory_profiler.report()
+
+
+@router.get("/memory/top", summary="Крупнейшие места аллокаций")
+async def memory_top(
+    group_by: GroupBy = Query("lineno"),
+    limit: int = Query(20, ge=1, le=500),
+):
+    if not memory_profiler.tracing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc не включен")
+    return memory_profiler.top(group_by, limit)
+
+
+@router.get("/memory/diff", summary="Прирост памяти с базового снимка")
+async def memory_diff(
+    group_by: GroupBy = Query("lineno"),
+    limit: int = Query(20, ge=1, le=500),
+):
+    try:
+        return memory_profiler.diff(group_by, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/capture", summary="Состояние записи трафика")
+async def capture_status():
+    return traffic_capture.status()
+
+
+@router.post("/capture/start", summary="Начать запись трафика во всех воркерах")
+async def capture_start(sample_rate: float = Query(settings.TRAFFIC_CAPTURE_SAMPLE_RATE, gt=0, le=1)):
+    """
+    Каждый воркер пишет свой трейс <TRAFFIC_CAPTURE_PATH>.<pid>.
+    Остальные воркеры подхватывают флаг в течение TRAFFIC_CAPTURE_POLL_SECONDS
+    """
+    traffic_capture.enable(sample_rate)
+    return traffic_capture.status()
+
+
+@router.post("/capture/stop", summary="Остановить запись трафика во всех воркерах")
+async def capture_stop():
+    traffic_capture.disable()
+    return traffic_capture.status()
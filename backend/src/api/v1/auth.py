@@ -1,34 +1,76 @@
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from typing import Optional
 
-from src.services.security import validate_api_key, get_password_hash
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from src.services.hashing import password_hasher
 from src.utils.exception import UserAlreadyExistsError
 from src.services.auth import (
     authenticate_user,
     create_access_token,
     get_current_user,
-    verify_password,
 )
 from src.schemas.request import (
     UserCredentials,
-    TokenResponse,
-    UserWithRelationsResponse,
     UserRegister,
     emailAdd,
     emailUpdate,
     tokenAdd
 )
-from src.schemas.response import SuccessResponse
+from src.schemas.response import SuccessResponse, TokenResponse, UserWithRelationsResponse
+from src.services.token_cache import read_token_claims, token_cache
 
-from src.models.users import User
-from backend.src.db.clients.lite_client import PostgresUserDbClient
+from src.schemas.common import User
+from src.db.relations import parse_relations
+from src.db.clients.user_client import UserDbClient
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 logger = logging.getLogger(__name__)
 
+bearer_scheme = HTTPBearer()
+
+
+async def get_current_user_cached(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> User:
+    """
+    get_current_user с кэшем проверенных токенов.
+
+    Повторный запрос с тем же токеном не проверяет JWT и не загружает
+    пользователя, а только сверяет его версию (UserDbClient.get_version):
+    изменение или удаление пользователя в любом воркере сбрасывает запись
+    """
+    token = credentials.credentials
+    cached = token_cache.get(token, UserDbClient.get_version)
+    if cached is not None:
+        return cached.user
+
+    user = await get_current_user(token)
+    token_cache.put(token, read_token_claims(token), user)
+    return user
+
+
+async def rehash_password_if_needed(user: User, password: str):
+    """
+    Пересчитывает хеш пароля после успешного входа, если он создан
+    старым алгоритмом или с устаревшими параметрами стоимости
+    """
+    hashed = getattr(user, "hashed_password", None)
+    if not hashed or not password_hasher.needs_rehash(hashed):
+        return
+
+    try:
+        await UserDbClient.update(
+            {"id": user.id, "hashed_password": await password_hasher.hash(password)}
+        )
+    except Exception as e:
+        # Вход уже успешен, хеш пересчитается при следующем входе
+        logger.warning(f"Password rehash failed: {str(e)}")
+
 
 @router.post(
     "",
@@ -61,7 +103,7 @@ logger = logging.getLogger(__name__)
     },
 )
 async def login_for_access_token(
-    credentials: UserCredentials,  # api_key: str = Depends(validate_api_key)
+    credentials: UserCredentials,
 ) -> TokenResponse:
     """
     Аутентификация пользователя и выдача JWT токена.
@@ -75,7 +117,6 @@ async def login_for_access_token(
             - login: Логин или email в зависимости от method_auth
             - password: Пароль
             - method_auth: Метод аутентификации ("login" или "email")
-        api_key: Ключ API для защиты endpoint
 
     Returns:
         TokenResponse: Объект с JWT токеном доступа
@@ -99,6 +140,8 @@ async def login_for_access_token(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
         )
 
+    await rehash_password_if_needed(user, credentials.password)
+
     access_token = create_access_token(data={"sub": str(user.id)})
 
     return TokenResponse(access_token=access_token, token_type="bearer")
@@ -115,7 +158,11 @@ async def login_for_access_token(
     },
 )
 async def get_user(
-    current_user: User = Depends(get_current_user),  # api_key: str = Depends(validate_api_key)
+    current_user: User = Depends(get_current_user_cached),
+    fields: Optional[str] = Query(
+        None,
+        description="Связи через запятую: routes,trains,stations,notes,settings (по умолчанию все)",
+    ),
 ):
     """
     Получает полную информацию о текущем пользователе и его связанных данных.
@@ -125,13 +172,14 @@ async def get_user(
 
     Args:
         current_user: Авторизованный пользователь (из токена)
+        fields: Какие связи загрузить; каждая связь - один пакетный запрос
 
     Returns:
         UserWithRelationsResponse: Полный профиль пользователя
 
     Example:
         Запрос:
-        GET /me
+        GET /me?fields=routes,notes
         Authorization: Bearer eyJhbGciOi...
 
         Ответ:
@@ -142,7 +190,8 @@ async def get_user(
     """
 
     try:
-        user_data = await PostgresUserDbClient.get_by_id_with_relations(user_id=current_user.id)
+        relations = parse_relations(fields)
+        user_data = UserDbClient.get_by_id_with_relations(current_user.id, relations)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except HTTPException:
@@ -192,14 +241,14 @@ async def get_user(
 async def create_user(credentials: UserRegister = Body(...)):
 
 
-    hashed_password = get_password_hash(credentials.password)
+    hashed_password = await password_hasher.hash(credentials.password)
     try:
-        user = await PostgresUserDbClient.process(
-            user_data={
+        user = await UserDbClient.process(
+            {
                 "login": credentials.login,
                 "email": credentials.email,
                 "hashed_password": hashed_password,
-                "vkId": credentials.vkId,
+                "vk_id": credentials.vkId,
             }
         )
     except UserAlreadyExistsError as e:
@@ -226,7 +275,7 @@ async def create_user(credentials: UserRegister = Body(...)):
     },
 )
 async def remove_vkId(
-    current_user: User = Depends(get_current_user),  # api_key: str = Depends(validate_api_key)
+    current_user: User = Depends(get_current_user_cached),
 ):
     """
 
@@ -257,7 +306,7 @@ async def remove_vkId(
     current_user.vk_id = None
 
     try:
-        success = await PostgresUserDbClient.update(
+        success = await UserDbClient.update(
             {   
                 "id": current_user.id,
                 "vk_id": current_user.vk_id,
@@ -269,6 +318,7 @@ async def remove_vkId(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error"
         )
 
+    token_cache.invalidate_user(current_user.id)
     return {"status_code": 200, "content": "Токен успешно отвязан"}
 
 
@@ -282,7 +332,7 @@ async def remove_vkId(
         404: {"description": "Пользователь не найден"},
     },
 )
-async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user)):
+async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user_cached)):
     """
 
     Args:
@@ -310,7 +360,7 @@ async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user
         return {"status_code": 200, "content": "vkId уже привязан"}
 
     try:
-        success = await PostgresUserDbClient.update(
+        success = await UserDbClient.update(
             {
                 "id": current_user.id,
                 "vk_id": data.token,
@@ -318,7 +368,7 @@ async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user
         )
     except ValueError as e:
         raise HTTPException(
-            status_code=400, detail=e
+            status_code=400, detail=str(e)
         )
     
     except UserAlreadyExistsError as e:
@@ -328,6 +378,7 @@ async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user
         )
 
 
+    token_cache.invalidate_user(current_user.id)
     return {"status_code": 200, "content": "Токен успешно привязаны"}
 
 
@@ -341,7 +392,7 @@ async def add_vkId(data: tokenAdd, current_user: User = Depends(get_current_user
         404: {"description": "Пользователь не найден"},
     },
 )
-async def add_email(data: emailAdd, current_user: User = Depends(get_current_user) ):
+async def add_email(data: emailAdd, current_user: User = Depends(get_current_user_cached) ):
     """
 
     Args:
@@ -375,10 +426,10 @@ async def add_email(data: emailAdd, current_user: User = Depends(get_current_use
     if not data.password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Не указан пароль")
 
-    hashed_password = get_password_hash(data.password)
+    hashed_password = await password_hasher.hash(data.password)
     
     try:
-        success = await PostgresUserDbClient.update(
+        success = await UserDbClient.update(
             {
                 "id": current_user.id,
                 "email": data.email,
@@ -399,6 +450,7 @@ async def add_email(data: emailAdd, current_user: User = Depends(get_current_use
         )
 
 
+    token_cache.invalidate_user(current_user.id)
     return {"status_code": 200, "content": "Email успешно привязаны"}
 
 
@@ -413,7 +465,7 @@ async def add_email(data: emailAdd, current_user: User = Depends(get_current_use
         404: {"description": "Пользователь не найден"},
     },
 )
-async def update_email(data: emailUpdate, current_user: User = Depends(get_current_user)):
+async def update_email(data: emailUpdate, current_user: User = Depends(get_current_user_cached)):
     """
 
     Args:
@@ -442,7 +494,7 @@ async def update_email(data: emailUpdate, current_user: User = Depends(get_curre
 
 
     try:
-        success = await PostgresUserDbClient.update(
+        success = await UserDbClient.update(
             {
                 "id": current_user.id,
                 "email": data.email
@@ -451,7 +503,7 @@ async def update_email(data: emailUpdate, current_user: User = Depends(get_curre
     except ValueError as e:
         
         raise HTTPException(
-            status_code=400, detail=e
+            status_code=400, detail=str(e)
         )
     
     except UserAlreadyExistsError as e:
@@ -461,4 +513,5 @@ async def update_email(data: emailUpdate, current_user: User = Depends(get_curre
         )
 
 
+    token_cache.invalidate_user(current_user.id)
     return {"status_code": 200, "content": "Email успешно изменен"}
\ No newline at end of file
@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from src.api.v1.admin import require_admin
+from src.db.bulk_delete import BulkDelete, BulkDeleteError, DeleteCriteria
+from src.schemas.request import BulkDeleteRequest
+from src.schemas.response import BulkDeleteStatus
+from src.services.bulk_delete import bulk_delete_jobs
+
+
+router = APIRouter(prefix="/admin/links", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post(
+    "/delete",
+    response_model=BulkDeleteStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Массовое удаление ссылок",
+)
+async def bulk_delete(request: BulkDeleteRequest, response: Response):
+    """
+    dry_run=true только считает подходящие ссылки (200). Иначе удаление идет
+    в фоне пачками (202), состояние - GET /admin/links/delete/{job_id}
+    из любого воркера
+    """
+    criteria = DeleteCriteria(
+        domain=request.domain,
+        include_subdomains=request.include_subdomains,
+        url_prefix=request.url_prefix,
+        created_from=request.created_from,
+        created_to=request.created_to,
+    )
+    try:
+        if request.dry_run:
+            stats = await asyncio.to_thread(BulkDelete(criteria).count)
+            response.status_code = status.HTTP_200_OK
+            return BulkDeleteStatus(**asdict(stats))
+        job_id = await bulk_delete_jobs.start(criteria, restart=request.restart)
+    except BulkDeleteError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except sqlite3.OperationalError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="База недоступна")
+    return BulkDeleteStatus(**await asyncio.to_thread(bulk_delete_jobs.status, job_id))
+
+
+@router.get("/delete/{job_id}", response_model=BulkDeleteStatus, summary="Состояние массового удаления")
+async def bulk_delete_status(job_id: str):
+    job = await asyncio.to_thread(bulk_delete_jobs.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задание не найдено")
+    return BulkDeleteStatus(**job)
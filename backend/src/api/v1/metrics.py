@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from src.core.metrics import Metrics
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", tags=["health"])
+async def metrics():
+    """Счетчики и распределения процесса"""
+    return Metrics.snapshot()
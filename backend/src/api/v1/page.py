@@ -1,59 +1,62 @@
-from fastapi import HTTPException, APIRouter, Depends, Request, status
+import asyncio
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, APIRouter, Request, status
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from src.schemas.request import ShortenRequest
 from src.schemas.response import ErrorResponse, ShortenResponse
 from src.db.clients.lite_client import UrlInfoDbClient
-from src.utils.generators import generate_short_code, get_base_url
+from src.db.code_index import code_index
+from src.services.domain_stats import domain_stats
+from src.services.hot_links import hot_links
+from src.services.link_cache import link_cache
+from src.services.single_flight import lookup_flight, shorten_flight
+from src.services.traffic_capture import traffic_capture
+from src.utils.exception import ShortCodeTakenError
+from src.utils.generators import build_short_url, generate_short_code, get_base_url
+from src.utils.time import dt_to_sql
 from pathlib import Path
 
 from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
 
 
 router = APIRouter()
 
+# Сколько раз генерировать код, если случайный код уже занят
+SHORT_CODE_ATTEMPTS = 5
+
 
 parent_directory = Path(__file__).parent.parent
 templates_path = parent_directory.parent / "templates"
 templates = Jinja2Templates(directory=templates_path)
+Metrics.register_gauge("jinja.cached_templates", lambda: len(templates.env.cache or ()))
 
 
-@router.post(
-        "/shorten",
-        response_model=ShortenResponse,
-        summary="Сокращает полученную ссылку",
-        status_code= status.HTTP_201_CREATED,
-        responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
-        tags=["Shorten"]
-    )
-async def shorten_url(
-    payload: ShortenRequest, 
-    request: Request,
-):
-    LogManager.sync_log_network_info("/shorten", "Полученн запрос на сокращение", {"payload": payload})
-    original_url_str = str(payload.url)
-    exists_url = UrlInfoDbClient.get_by_id(original_url_str)
-    
-    if exists_url:
-        UrlInfoDbClient.increment_clicks(exists_url.original_url)
-        short_url = exists_url.short_url
-        short_code = exists_url.short_code
-
-    else:
-        base_url = get_base_url(request)
+async def _get_or_create(
+    original_url_str: str, expires_at: Optional[datetime], base_url: str
+) -> Tuple[str, str, Optional[datetime]]:
+    """Короткая ссылка для original_url_str: существующая или новая"""
+    for _ in range(SHORT_CODE_ATTEMPTS):
         short_code = generate_short_code()
-        short_url = base_url+"/"+short_code+"_byzil"
+        short_url = build_short_url(base_url, short_code)
         data = {
             'short_url': short_url,
             'short_code': short_code,
             'original_url': original_url_str,
             'clicks': 0,
+            'expires_at': dt_to_sql(expires_at) if expires_at else None,
         }
-       
 
         try:
-            result = UrlInfoDbClient.process(data)
+            record = await UrlInfoDbClient.process(data)
+            break
 
+        except ShortCodeTakenError:
+            # Код занят другой (в том числе архивной) ссылкой - берем другой
+            continue
         except ValueError as e:
             raise HTTPException(status_code=400, detail=f"{e}")
         except Exception as e:
@@ -61,11 +64,45 @@ async def shorten_url(
                 status_code=500,
                 detail=f"An unexpected error occurred. Report this message to support: {e}",
             )
-    
+    else:
+        raise HTTPException(status_code=500, detail="Не удалось подобрать свободный код")
+
+    if record.short_code == short_code:
+        domain_stats.record_link(original_url_str)
+    return record.short_url, record.short_code, record.expires_at
+
+
+@router.post(
+        "/shorten",
+        response_model=ShortenResponse,
+        summary="Сокращает полученную ссылку",
+        status_code= status.HTTP_201_CREATED,
+        responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+        tags=["Shorten"]
+    )
+async def shorten_url(
+    payload: ShortenRequest, 
+    request: Request,
+):
+    LogManager.sync_log_network_info("/shorten", "Полученн запрос на сокращение", {"payload": payload})
+    if code_index is not None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Инстанс работает только на чтение",
+        )
+    original_url_str = str(payload.url)
+    traffic_capture.record_shorten(original_url_str)
+    # Одновременные запросы одной ссылки получают один и тот же код
+    short_url, short_code, expires_at = await shorten_flight.do(
+        original_url_str,
+        lambda: _get_or_create(original_url_str, payload.resolve_expires_at(), get_base_url(request)),
+    )
+
     return ShortenResponse(
         shorten_url=short_url,
         code=short_code,
-        original_url=original_url_str
+        original_url=original_url_str,
+        expires_at=expires_at,
     )
 
 
@@ -75,16 +112,47 @@ async def show_link_stats(request: Request, short_code: str):
     Показывает простую HTML-страницу со статистикой кликов
     вместо автоматического редиректа
     """
-    record = UrlInfoDbClient.get_by_id(str(request.url), short_code)
-    
+    if code_index is not None:
+        # Только чтение: клики не считаются, показывается снимок из индекса
+        record = code_index.get(short_code)
+        traffic_capture.record_lookup(short_code, found=record is not None)
+        if not record:
+            raise HTTPException(status_code=404, detail="Ссылка не найдена")
+        return templates.TemplateResponse(
+            "link_stats.html",
+            {
+                "request": request,
+                "short_code": short_code,
+                "original_url": record.original_url,
+                "clicks": record.clicks,
+                "created_at": record.created_at,
+            }
+        )
+
+    record = link_cache.get(short_code)
+    if record is None:
+        # Всплеск запросов одного кода идет в базу одним запросом
+        record = await lookup_flight.do(
+            short_code,
+            lambda: asyncio.to_thread(UrlInfoDbClient.get_by_id, str(request.url), short_code),
+        )
+
+    traffic_capture.record_lookup(short_code, found=record is not None)
     if not record:
         raise HTTPException(status_code=404, detail="Ссылка не найдена")
 
-    UrlInfoDbClient.increment_clicks(record.original_url)
+    if not await UrlInfoDbClient.increment_clicks(record.id):
+        # Ссылку удалили (или перенесли в архив) после чтения
+        link_cache.discard([short_code])
+        raise HTTPException(status_code=404, detail="Ссылка не найдена")
+    link_cache.add_click(record)
+    domain_stats.record_click(record.original_url)
+    hot_links.hit(short_code)
 
-    # логируем просмотр статистики
+    # логируем просмотр статистики; эндпоинт - шаблон маршрута, чтобы правила
+    # семплирования "network:/{short_code}" действовали на все коды сразу
     await LogManager.log_network_info(
-        endpoint=f"/{short_code}",
+        endpoint="/{short_code}",
         message="Просмотр статистики ссылки",
         data={"short_code": short_code, "clicks": record.clicks+1}
     )
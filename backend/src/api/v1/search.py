@@ -0,0 +1,96 @@
+import asyncio
+import base64
+import json
+import sqlite3
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from src.core.config import settings
+from src.db.clients.lite_client import UrlInfoDbClient
+from src.schemas.response import SearchHit, SearchResponse
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+Substring = Query(..., min_length=3, max_length=2048, description="Подстрока ссылки, от 3 символов")
+
+
+def _encode_cursor(offset: int) -> str:
+    raw = json.dumps({"o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset = int(json.loads(raw)["o"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный cursor")
+    if offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный cursor")
+    return offset
+
+
+def _unavailable(e: sqlite3.OperationalError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Поиск недоступен: {e}"
+    )
+
+
+@router.get(
+    "/urls",
+    response_model=SearchResponse,
+    summary="Ссылки, в которых есть подстрока",
+    responses={400: {"description": "Некорректный cursor"}, 503: {"description": "Нет индекса FTS5"}},
+)
+async def search_urls(
+    q: str = Substring,
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Продолжение предыдущей страницы"),
+):
+    """
+    Поиск по триграммному индексу url_search: домен, путь или любая часть
+    ссылки. Результаты отсортированы по релевантности (bm25)
+    """
+    offset = _decode_cursor(cursor) if cursor else 0
+    try:
+        hits = await asyncio.to_thread(UrlInfoDbClient.search, q, limit + 1, offset)
+    except sqlite3.OperationalError as e:
+        raise _unavailable(e)
+
+    has_more = len(hits) > limit
+    return SearchResponse(
+        items=[SearchHit(**hit) for hit in hits[:limit]],
+        cursor=_encode_cursor(offset + limit) if has_more else None,
+        has_more=has_more,
+    )
+
+
+@router.get(
+    "/urls/stream",
+    summary="Все совпадения потоком (NDJSON)",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}, 503: {"description": "Нет индекса FTS5"}},
+)
+async def stream_search_urls(q: str = Substring):
+    """
+    Все найденные ссылки по одной JSON-строке в порядке релевантности.
+    Строки отдаются по мере чтения из курсора, память не зависит от числа совпадений
+    """
+    hits = UrlInfoDbClient.iter_search(q)
+    try:
+        # Первая строка читается до ответа: ошибка индекса превращается в 503, а не в оборванный поток
+        first = await asyncio.to_thread(next, hits, None)
+    except sqlite3.OperationalError as e:
+        raise _unavailable(e)
+
+    def lines():
+        if first is None:
+            return
+        yield json.dumps(first, ensure_ascii=False) + "\n"
+        for hit in hits:
+            yield json.dumps(hit, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,71 @@
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from src.schemas.response import (
+    DomainCount,
+    DomainEstimateResponse,
+    DomainTopResponse,
+    HotLink,
+    HotLinksResponse,
+)
+from src.services.domain_stats import domain_stats
+from src.services.hot_links import hot_links
+
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+Kind = Literal["links", "clicks"]
+Window = Literal["1m", "5m", "1h"]
+
+
+@router.get("/domains", response_model=DomainTopResponse, summary="Самые частые домены назначения")
+async def top_domains(
+    kind: Kind = Query("clicks", description="links - созданные ссылки, clicks - переходы"),
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Top-K доменов по алгоритму Space-Saving. Ответ строится из k счетчиков
+    в памяти, его стоимость не зависит от числа ссылок
+    """
+    return DomainTopResponse(
+        kind=kind,
+        items=[
+            DomainCount(host=host, count=count, error=error)
+            for host, count, error in domain_stats.top(kind, limit)
+        ],
+        bounds=domain_stats.bounds(kind),
+    )
+
+
+@router.get(
+    "/domains/{host}", response_model=DomainEstimateResponse, summary="Оценка числа событий домена"
+)
+async def domain_estimate(
+    host: str,
+    kind: Kind = Query("clicks", description="links - созданные ссылки, clicks - переходы"),
+):
+    """Оценка по Count-Min Sketch: не меньше истинного значения"""
+    return DomainEstimateResponse(
+        kind=kind,
+        host=host.lower(),
+        estimate=domain_stats.estimate(kind, host),
+        bounds=domain_stats.bounds(kind),
+    )
+
+
+@router.get("/hot", response_model=HotLinksResponse, summary="Самые просматриваемые ссылки за окно")
+async def hot_links_top(
+    window: Window = Query("5m", description="Скользящее окно"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """
+    Текущая популярность коротких ссылок, в отличие от накопленного clicks.
+    Считается в памяти процесса по просмотрам страницы статистики
+    """
+    items, total = hot_links.top(window, limit)
+    return HotLinksResponse(
+        window=window,
+        total=total,
+        items=[HotLink(short_code=code, hits=hits, error=error) for code, hits, error in items],
+    )
@@ -0,0 +1,97 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from src.core.config import settings
+from src.db.clients.lite_client import UrlInfoDbClient
+from src.schemas.response import SyncResponse, SyncTombstone
+from src.utils.time import now_ms
+
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Позиция "после всех строк с updated_at == since"
+_MAX_ID = 2**63 - 1
+
+
+Position = Tuple[int, int]
+
+
+def _encode_cursor(changes: Position, clicks: Position, deleted: Position) -> str:
+    raw = json.dumps({"u": list(changes), "c": list(clicks), "d": list(deleted)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[Position, Position, Position]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        changes = (int(data["u"][0]), int(data["u"][1]))
+        # Курсоры, выданные до появления url_clicks, продолжают ленту кликов с той же позиции
+        clicks = (int(data["c"][0]), int(data["c"][1])) if "c" in data else changes
+        deleted = (int(data["d"][0]), int(data["d"][1]))
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный cursor")
+    return changes, clicks, deleted
+
+
+@router.get(
+    "/urls",
+    response_model=SyncResponse,
+    summary="Изменения ссылок после отметки since",
+    responses={
+        400: {"description": "Некорректный cursor"},
+        410: {"description": "since старше хранения удалений, нужна полная синхронизация"},
+    },
+)
+async def sync_urls(
+    since: int = Query(0, ge=0, description="Отметка прошлой синхронизации, мс (0 - с начала)"),
+    cursor: Optional[str] = Query(None, description="Продолжение предыдущей страницы"),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=5000),
+):
+    """
+    Возвращает ссылки, измененные после since, и удаления (tombstones).
+
+    Выборки идут по индексам (updated_at, id), (clicked_at, link_id) и
+    (deleted_at, id), поэтому размер ответа пропорционален числу изменений,
+    а не размеру таблицы. Изменения ссылок и клики сливаются в одну
+    упорядоченную ленту, каждая ссылка попадает в нее один раз.
+    """
+    if cursor:
+        changes_pos, clicks_pos, deleted_pos = _decode_cursor(cursor)
+    else:
+        retention_ms = settings.SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 3600 * 1000
+        if since and since < now_ms() - retention_ms:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Отметка устарела, требуется полная синхронизация (since=0)",
+            )
+        changes_pos = clicks_pos = deleted_pos = (since, _MAX_ID)
+
+    changed = [(item, False) for item in UrlInfoDbClient.get_changes(changes_pos, limit)]
+    clicked = [(item, True) for item in UrlInfoDbClient.get_click_changes(clicks_pos, limit)]
+    page = sorted(changed + clicked, key=lambda entry: (entry[0].updated_at, entry[0].id))[:limit]
+    tombstones = UrlInfoDbClient.get_tombstones(deleted_pos, limit)
+
+    items = []
+    for item, from_clicks in page:
+        if from_clicks:
+            clicks_pos = (item.updated_at, item.id)
+        else:
+            changes_pos = (item.updated_at, item.id)
+        items.append(item)
+    if tombstones:
+        deleted_pos = (tombstones[-1]["deleted_at"], tombstones[-1]["id"])
+
+    return SyncResponse(
+        items=items,
+        deleted=[
+            SyncTombstone(id=t["link_id"], short_code=t["short_code"], deleted_at=t["deleted_at"])
+            for t in tombstones
+        ],
+        cursor=_encode_cursor(changes_pos, clicks_pos, deleted_pos),
+        has_more=len(items) == limit or len(tombstones) == limit,
+        watermark=max(changes_pos[0], clicks_pos[0], deleted_pos[0]),
+    )
@@ -0,0 +1,27 @@
+"""
+Консольные команды сервиса.
+
+Запуск из каталога backend:
+    python -m src.cli <команда> --help
+"""
+import argparse
+import sys
+
+from src.cli import backup, bulk_delete, code_index, compression, import_urls
+
+
+COMMANDS = [import_urls, compression, backup, code_index, bulk_delete]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in COMMANDS:
+        command.add_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
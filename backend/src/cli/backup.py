@@ -0,0 +1,87 @@
+"""
+Резервные копии базы.
+
+    python -m src.cli backup create
+    python -m src.cli backup list
+    python -m src.cli backup verify backups/boto-20250101T000000000000Z.db.gz
+    python -m src.cli backup restore backups/boto-20250101T000000000000Z.db.gz
+
+create и restore работают через sqlite3 backup API и не требуют
+остановки сервиса. restore сначала проверяет снимок (integrity_check).
+create снимает и архив холодных ссылок, если он есть (<имя>.db-*.db.gz);
+restore такого снимка восстанавливает архив, а не основную базу.
+"""
+import argparse
+import sys
+
+from src.core.config import settings
+from src.db.backup import (
+    create_snapshots,
+    list_snapshots,
+    prune_snapshots,
+    restore_snapshot,
+    restore_target,
+    snapshot_sources,
+    verify_snapshot,
+)
+
+
+class _Progress:
+    """Печатает долю скопированных страниц в stderr"""
+
+    def __call__(self, status: int, remaining: int, total: int):
+        done = total - remaining
+        print(f"\rpages {done}/{total}", end="", file=sys.stderr)
+        if not remaining:
+            print(file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> int:
+    if args.action == "create":
+        paths = create_snapshots(
+            args.db, args.dir, args.pages, args.pause, not args.no_compress, _Progress()
+        )
+        if args.keep:
+            for source in snapshot_sources(args.db):
+                prune_snapshots(source, args.dir, args.keep)
+        for path in paths:
+            print(path)
+    elif args.action == "list":
+        for source in snapshot_sources(args.db):
+            for path in list_snapshots(source, args.dir):
+                print(f"{path}\t{path.stat().st_size}")
+    else:
+        if not args.snapshot:
+            print(f"{args.action} requires a snapshot path", file=sys.stderr)
+            return 2
+        if args.action == "verify":
+            result = verify_snapshot(args.snapshot)
+        else:
+            try:
+                target = restore_target(args.snapshot, args.db)
+                result = restore_snapshot(args.snapshot, target, args.pages, args.pause, _Progress())
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+        print(f"integrity: {result.integrity}\nurls: {result.urls}")
+        return 0 if result.ok else 1
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("backup", help="Резервные копии базы")
+    parser.add_argument("action", choices=["create", "list", "verify", "restore"])
+    parser.add_argument("snapshot", nargs="?", help="Файл снимка для verify/restore")
+    parser.add_argument("--db", default=settings.DB_PATH, help="Путь к базе SQLite")
+    parser.add_argument("--dir", default=settings.BACKUP_DIR, help="Каталог снимков")
+    parser.add_argument(
+        "--pages", type=int, default=settings.BACKUP_PAGES_PER_STEP, help="Страниц за один шаг"
+    )
+    parser.add_argument(
+        "--pause", type=float, default=settings.BACKUP_STEP_PAUSE_SECONDS, help="Пауза между шагами, сек"
+    )
+    parser.add_argument("--no-compress", action="store_true", help="Не сжимать снимок gzip")
+    parser.add_argument(
+        "--keep", type=int, default=settings.BACKUP_RETENTION, help="Сколько снимков хранить (0 - все)"
+    )
+    parser.set_defaults(handler=run)
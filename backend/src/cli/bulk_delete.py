@@ -0,0 +1,144 @@
+"""
+Массовое удаление ссылок по домену, префиксу или дате создания.
+
+    python -m src.cli delete --domain spam.example --include-subdomains --dry-run
+    python -m src.cli delete --prefix https://example.com/promo/ --created-to 2025-01-01
+
+Ссылки удаляются пачками в отдельных транзакциях (см. src.db.bulk_delete).
+Прерванное удаление продолжается повторным запуском с теми же условиями.
+Работающий сервис увидит удаление не позже чем через LINK_CACHE_TTL_SECONDS;
+mmap-индекс кодов (src.cli code-index) после удаления нужно пересобрать.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import TextIO
+
+from src.core.config import settings
+from src.db.bulk_delete import BulkDelete, BulkDeleteError, BulkDeleteStats, DeleteCriteria
+from src.db.search import search_backfill
+from src.db.session import init_schema
+from src.db.writer import WriteOp
+
+
+class _Progress:
+    """Периодически печатает ход удаления в stderr"""
+
+    def __init__(self, interval: float, stream: TextIO = sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def update(self, stats: BulkDeleteStats, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"scanned={stats.scanned} matched={stats.matched} deleted={stats.deleted} "
+            f"position={stats.position} rate={stats.deleted / elapsed:,.0f} rows/s",
+            file=self.stream,
+        )
+
+
+def _utc(value: str) -> datetime:
+    """Дата или дата со временем в ISO 8601; без часового пояса - UTC"""
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _writer(conn: sqlite3.Connection):
+    """Операция записи в отдельной транзакции на соединении CLI"""
+    async def write(op: WriteOp):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = op(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    return write
+
+
+async def _delete(args: argparse.Namespace, deleter: BulkDelete) -> BulkDeleteStats:
+    unindexed = await asyncio.to_thread(deleter.unindexed)
+    if unindexed:
+        if os.path.abspath(args.db) == os.path.abspath(settings.DB_PATH):
+            await search_backfill.backfill()
+        else:
+            print(f"warning: {unindexed} links are not in the search index yet and are skipped", file=sys.stderr)
+    return await deleter.run(restart=args.restart)
+
+
+def run(args: argparse.Namespace) -> int:
+    criteria = DeleteCriteria(
+        domain=args.domain,
+        include_subdomains=args.include_subdomains,
+        url_prefix=args.prefix,
+        created_from=args.created_from,
+        created_to=args.created_to,
+    )
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    try:
+        init_schema(conn)
+        progress = _Progress(args.progress_interval)
+        deleter = BulkDelete(
+            criteria,
+            db_path=args.db,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            write=_writer(conn),
+            progress=progress.update,
+        )
+        if args.dry_run:
+            stats = deleter.count()
+            for url in stats.sample:
+                print(url)
+            print(f"matched {stats.matched} of {stats.scanned} candidates")
+            return 0
+
+        stats = asyncio.run(_delete(args, deleter))
+    except BulkDeleteError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+
+    progress.update(stats, force=True)
+    if stats.resumed_from:
+        print(f"resumed after id {stats.resumed_from}", file=sys.stderr)
+    print(f"deleted {stats.deleted} links")
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("delete", help="Массовое удаление ссылок")
+    parser.add_argument("--domain", help="Домен назначения")
+    parser.add_argument("--include-subdomains", action="store_true", help="Вместе с поддоменами --domain")
+    parser.add_argument("--prefix", help="Начало ссылки, например https://example.com/promo/")
+    parser.add_argument("--created-from", type=_utc, help="Созданы не раньше (ISO 8601, UTC)")
+    parser.add_argument("--created-to", type=_utc, help="Созданы раньше (ISO 8601, UTC)")
+    parser.add_argument("--dry-run", action="store_true", help="Только посчитать подходящие ссылки")
+    parser.add_argument("--db", default=settings.DB_PATH, help="Путь к базе SQLite")
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.BULK_DELETE_BATCH_SIZE, help="Ссылок в одной транзакции"
+    )
+    parser.add_argument(
+        "--pause", type=float, default=settings.BULK_DELETE_PAUSE_SECONDS, help="Пауза между пачками, сек"
+    )
+    parser.add_argument("--restart", action="store_true", help="Игнорировать сохраненную позицию")
+    parser.add_argument(
+        "--progress-interval", type=float, default=5.0, help="Период вывода прогресса, сек"
+    )
+    parser.set_defaults(handler=run)
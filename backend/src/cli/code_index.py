@@ -0,0 +1,68 @@
+"""
+Сборка mmap-индекса кодов для инстансов только на чтение.
+
+    python -m src.cli code-index build links.idx
+    python -m src.cli code-index lookup links.idx AbC123xyZ
+
+Собранный файл подключается через CODE_INDEX_PATH=links.idx.
+Индекс неизменяемый: после изменения ссылок его нужно пересобрать,
+новый файл подменяет старый атомарно.
+
+База открывается только на чтение (mode=ro), ее схема не проверяется
+и не мигрирует: индекс можно собрать из снимка, доступного только на
+чтение, не меняя его. Снимок должен быть со схемой текущей версии.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from src.core.config import settings
+from src.db.code_index import CodeIndex, build_code_index
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    """Подключение к существующей базе без права записи"""
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def run(args: argparse.Namespace) -> int:
+    if args.action == "build":
+        started = time.perf_counter()
+        try:
+            conn = connect_read_only(args.db)
+        except sqlite3.OperationalError as e:
+            print(f"cannot open {args.db}: {e}", file=sys.stderr)
+            return 1
+        try:
+            count = build_code_index(conn, args.index)
+        finally:
+            conn.close()
+        print(f"indexed {count} links in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+        return 0
+
+    if not args.code:
+        print("lookup requires a short code", file=sys.stderr)
+        return 2
+    index = CodeIndex(args.index)
+    try:
+        record = index.get(args.code)
+    finally:
+        index.close()
+    if record is None:
+        print("not found", file=sys.stderr)
+        return 1
+    print(record.original_url)
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("code-index", help="mmap-индекс кодов для режима только чтения")
+    parser.add_argument("action", choices=["build", "lookup"])
+    parser.add_argument("index", help="Файл индекса")
+    parser.add_argument("code", nargs="?", help="Код для lookup")
+    parser.add_argument("--db", default=settings.DB_PATH, help="Путь к базе SQLite")
+    parser.set_defaults(handler=run)
@@ -0,0 +1,145 @@
+"""
+Управление сжатием ссылок.
+
+    python -m src.cli compression train
+    python -m src.cli compression stats --sample 5000
+
+train обучает новую версию словаря на последних ссылках; пережатие
+старых строк выполняет фоновая задача сервиса (или --recompress).
+stats показывает коэффициент сжатия и среднее время распаковки.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from src.core.config import settings
+from src.db.compression import UrlCodec, zstd
+from src.db.session import init_schema
+
+
+def _codec(conn: sqlite3.Connection, db_path: str) -> UrlCodec:
+    codec = UrlCodec(db_path, level=settings.URL_COMPRESSION_LEVEL, enabled=True)
+    codec.reload(conn)
+    return codec
+
+
+def train(conn: sqlite3.Connection, codec: UrlCodec, sample_size: int, dict_size: int) -> int:
+    """Обучить и сохранить новую версию словаря, вернуть ее номер"""
+    rows = conn.execute(
+        "SELECT original_url, dict_version FROM urls ORDER BY id DESC LIMIT ?", (sample_size,)
+    )
+    samples = [codec.decode(value, version) for value, version in rows]
+    if not samples:
+        raise ValueError("В базе нет ссылок для обучения словаря")
+
+    data = codec.train(samples, dict_size)
+    version = UrlCodec.store_dictionary(conn, data, len(samples))
+    conn.commit()
+    codec.reload(conn)
+    return version
+
+
+def recompress(conn: sqlite3.Connection, codec: UrlCodec, batch_size: int) -> int:
+    """Пережать все строки текущим словарем, вернуть число обновленных"""
+    version = codec.current_version
+    total = 0
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT id, original_url, dict_version FROM urls
+            WHERE id > ? AND (dict_version IS NULL OR dict_version != ?)
+            ORDER BY id LIMIT ?
+            """,
+            (after_id, version, batch_size)
+        ).fetchall()
+        if not rows:
+            return total
+        after_id = rows[-1][0]
+        updates = []
+        for link_id, stored, old_version in rows:
+            value, new_version = codec.encode(codec.decode(stored, old_version))
+            if new_version != old_version:
+                updates.append((value, new_version, link_id))
+        conn.executemany(
+            "UPDATE urls SET original_url = ?, dict_version = ? WHERE id = ?", updates
+        )
+        conn.commit()
+        total += len(updates)
+
+
+def stats(conn: sqlite3.Connection, codec: UrlCodec, sample_size: int) -> dict:
+    """Размер хранения, коэффициент сжатия и стоимость распаковки"""
+    by_version = {
+        version: count
+        for version, count in conn.execute(
+            "SELECT dict_version, COUNT(*) FROM urls GROUP BY dict_version"
+        )
+    }
+    rows = conn.execute(
+        "SELECT original_url, dict_version FROM urls ORDER BY id DESC LIMIT ?", (sample_size,)
+    ).fetchall()
+
+    stored_bytes = raw_bytes = 0
+    decode_seconds = 0.0
+    for value, version in rows:
+        started = time.perf_counter()
+        url = codec.decode(value, version)
+        decode_seconds += time.perf_counter() - started
+        stored_bytes += len(value) if isinstance(value, bytes) else len(value.encode())
+        raw_bytes += len(url.encode())
+
+    return {
+        "current_version": codec.current_version,
+        "rows_by_version": by_version,
+        "sampled": len(rows),
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "ratio": raw_bytes / stored_bytes if stored_bytes else 1.0,
+        "avg_decode_us": decode_seconds / len(rows) * 1e6 if rows else 0.0,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    try:
+        init_schema(conn)
+        codec = _codec(conn, args.db)
+        if args.action == "train":
+            if not codec.available:
+                print("zstandard is not installed", file=sys.stderr)
+                return 1
+            try:
+                version = train(conn, codec, args.sample, args.dict_size)
+            except (ValueError, zstd.ZstdError) as e:
+                # Слишком маленькая выборка: zstd не может обучить словарь
+                print(f"training failed: {e}", file=sys.stderr)
+                return 1
+            print(f"dictionary version {version}")
+            if args.recompress:
+                print(f"recompressed {recompress(conn, codec, args.batch_size)} rows")
+        else:
+            for key, value in stats(conn, codec, args.sample).items():
+                print(f"{key}: {value}")
+    finally:
+        conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("compression", help="Словарное сжатие ссылок")
+    parser.add_argument("action", choices=["train", "stats"])
+    parser.add_argument("--db", default=settings.DB_PATH, help="Путь к базе SQLite")
+    parser.add_argument(
+        "--sample", type=int, default=settings.URL_COMPRESSION_SAMPLE_SIZE, help="Размер выборки"
+    )
+    parser.add_argument(
+        "--dict-size", type=int, default=settings.URL_COMPRESSION_DICT_SIZE, help="Размер словаря, байт"
+    )
+    parser.add_argument("--recompress", action="store_true", help="Сразу пережать старые строки")
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.RECOMPRESS_BATCH_SIZE, help="Строк в пачке пережатия"
+    )
+    parser.set_defaults(handler=run)
@@ -0,0 +1,321 @@
+"""
+Массовый импорт ссылок из CSV/NDJSON файлов или stdin.
+
+    python -m src.cli import links.csv --base-url https://sho.rt
+    zcat links.ndjson.gz | python -m src.cli import - --format ndjson --base-url https://sho.rt
+
+Строки читаются потоком и вставляются пачками в отдельных транзакциях,
+поэтому память не зависит от размера входа. Вместе с каждой пачкой
+в import_state сохраняется чекпоинт, и повторный запуск продолжает
+импорт с первой незакоммиченной строки.
+
+По умолчанию вторичные индексы удаляются на время импорта только для
+отдельной базы. В базе работающего сервиса (DB_PATH) они остаются:
+без них каждый переход и синхронизация читали бы всю таблицу. Удалить
+их и в ней (--defer-indexes) можно только при остановленном сервере.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from pydantic import HttpUrl, TypeAdapter, ValidationError
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.db.compression import UrlCodec
+from src.db.session import (
+    create_secondary_indexes, drop_secondary_indexes, init_schema, next_change_stamp,
+)
+from src.utils.generators import build_short_url, sequence_short_code, url_digest
+
+
+CODE_SEQUENCE_KEY = "code_seq"
+
+_url_adapter = TypeAdapter(HttpUrl)
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    resumed_from: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+
+def normalize_url(raw: Optional[str]) -> Optional[str]:
+    """Приводит ссылку к виду, в котором ее сохраняет POST /shorten"""
+    if not raw:
+        return None
+    try:
+        return str(_url_adapter.validate_python(raw.strip()))
+    except ValidationError:
+        return None
+
+
+def read_csv(stream: TextIO, url_column: str = "url") -> Iterator[Optional[str]]:
+    """Ссылки из CSV с заголовком; строка без ссылки дает None"""
+    for row in csv.DictReader(stream):
+        yield row.get(url_column)
+
+
+def read_ndjson(stream: TextIO) -> Iterator[Optional[str]]:
+    """Ссылки из NDJSON: объект с ключом url или просто строка"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+            continue
+        if isinstance(item, dict):
+            yield item.get("url")
+        else:
+            yield item if isinstance(item, str) else None
+
+
+def _reserve_codes(conn: sqlite3.Connection, count: int) -> int:
+    """Резервирует count номеров последовательности, возвращает первый"""
+    row = conn.execute(
+        """
+        INSERT INTO import_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+        RETURNING value
+        """,
+        (CODE_SEQUENCE_KEY, count)
+    ).fetchone()
+    return row[0] - count
+
+
+def _write_batch(
+    conn: sqlite3.Connection,
+    urls: List[str],
+    base_url: str,
+    checkpoint_key: str,
+    rows_done: int,
+    codec: UrlCodec,
+) -> int:
+    """Вставляет пачку и чекпоинт одной транзакцией, возвращает число новых строк"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        first_seq = _reserve_codes(conn, len(urls))
+        updated_at = next_change_stamp(conn)
+        rows = []
+        for seq, url in enumerate(urls, start=first_seq):
+            code = sequence_short_code(seq)
+            stored, version = codec.encode(url)
+            rows.append(
+                (build_short_url(base_url, code), stored, url_digest(url), version, code, updated_at)
+            )
+
+        before = conn.total_changes
+        # Ссылка из архива (src.db.archive) уже имеет код: она считается дублем
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO urls
+            (short_url, original_url, url_hash, dict_version, short_code, created_at, updated_at)
+            SELECT ?1, ?2, ?3, ?4, ?5, CURRENT_TIMESTAMP, ?6
+            WHERE NOT EXISTS (SELECT 1 FROM archived_codes WHERE url_hash = ?3)
+            """,
+            rows
+        )
+        inserted = conn.total_changes - before
+
+        conn.execute(
+            """
+            INSERT INTO import_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """,
+            (checkpoint_key, rows_done)
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return inserted
+
+
+class _Progress:
+    """Периодически печатает скорость импорта в stderr"""
+
+    def __init__(self, interval: float, stream: TextIO = sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def update(self, stats: ImportStats, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"read={stats.read} inserted={stats.inserted} duplicates={stats.duplicates} "
+            f"invalid={stats.invalid} rate={stats.read / elapsed:,.0f} rows/s",
+            file=self.stream,
+        )
+
+
+def import_urls(
+    conn: sqlite3.Connection,
+    source: Iterable[Optional[str]],
+    checkpoint_key: str,
+    base_url: str,
+    batch_size: int = 50_000,
+    defer_indexes: bool = False,
+    restart: bool = False,
+    progress: Optional[_Progress] = None,
+) -> ImportStats:
+    """
+    Импортирует ссылки из итератора source.
+
+    conn должен быть открыт с isolation_level=None: транзакциями
+    управляет сама функция
+    """
+    init_schema(conn)
+    # Ссылки сжимаются текущим словарем той базы, в которую идет импорт
+    codec = UrlCodec(
+        db_path=None, level=settings.URL_COMPRESSION_LEVEL, enabled=settings.URL_COMPRESSION_ENABLED
+    )
+    codec.reload(conn)
+    key = f"checkpoint:{checkpoint_key}"
+    stats = ImportStats()
+    if not restart:
+        row = conn.execute("SELECT value FROM import_state WHERE key = ?", (key,)).fetchone()
+        stats.resumed_from = row[0] if row else 0
+
+    if defer_indexes:
+        drop_secondary_indexes(conn)
+
+    rows_done = committed = stats.resumed_from
+    batch: List[str] = []
+
+    def flush():
+        nonlocal committed
+        inserted = _write_batch(conn, batch, base_url, key, rows_done, codec)
+        stats.inserted += inserted
+        stats.duplicates += len(batch) - inserted
+        committed = rows_done
+        batch.clear()
+
+    try:
+        for raw in itertools.islice(source, stats.resumed_from, None):
+            rows_done += 1
+            stats.read += 1
+            url = normalize_url(raw)
+            if url is None:
+                stats.invalid += 1
+            else:
+                batch.append(url)
+
+            if len(batch) >= batch_size:
+                flush()
+                if progress:
+                    progress.update(stats)
+
+        if rows_done != committed:
+            flush()
+    finally:
+        if defer_indexes:
+            create_secondary_indexes(conn)
+
+    if progress:
+        progress.update(stats, force=True)
+    LogManager.sync_log_database_info("Импорт ссылок завершен", stats.__dict__)
+    return stats
+
+
+def _open_source(path: str) -> TextIO:
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _detect_format(path: str) -> str:
+    if path.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+def _is_serving_db(path: str) -> bool:
+    return os.path.abspath(path) == os.path.abspath(settings.DB_PATH)
+
+
+def run(args: argparse.Namespace) -> int:
+    defer_indexes = args.defer_indexes
+    if defer_indexes is None:
+        defer_indexes = not _is_serving_db(args.db)
+
+    fmt = args.format or _detect_format(args.source)
+    checkpoint_key = args.checkpoint_key or (
+        "stdin" if args.source == "-" else os.path.abspath(args.source)
+    )
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    try:
+        with _open_source(args.source) as stream:
+            reader = read_ndjson(stream) if fmt == "ndjson" else read_csv(stream, args.url_column)
+            stats = import_urls(
+                conn,
+                reader,
+                checkpoint_key=checkpoint_key,
+                base_url=args.base_url.rstrip("/"),
+                batch_size=args.batch_size,
+                defer_indexes=defer_indexes,
+                restart=args.restart,
+                progress=_Progress(args.progress_interval),
+            )
+    finally:
+        conn.close()
+
+    if stats.resumed_from:
+        print(f"resumed after row {stats.resumed_from}", file=sys.stderr)
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("import", help="Массовый импорт ссылок")
+    parser.add_argument("source", help="Путь к CSV/NDJSON файлу или - для stdin")
+    parser.add_argument("--base-url", required=True, help="Базовый адрес коротких ссылок")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Формат входа (по расширению)")
+    parser.add_argument("--url-column", default="url", help="Колонка со ссылкой в CSV")
+    parser.add_argument("--db", default=settings.DB_PATH, help="Путь к базе SQLite")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Строк в одной транзакции")
+    parser.add_argument(
+        "--checkpoint-key", help="Ключ чекпоинта (по умолчанию путь к файлу или stdin)"
+    )
+    parser.add_argument("--restart", action="store_true", help="Игнорировать сохраненный чекпоинт")
+    indexes = parser.add_mutually_exclusive_group()
+    indexes.add_argument(
+        "--defer-indexes",
+        dest="defer_indexes",
+        action="store_true",
+        default=None,
+        help="Удалить вторичные индексы на время импорта (для DB_PATH - только при остановленном сервере)",
+    )
+    indexes.add_argument(
+        "--keep-indexes",
+        dest="defer_indexes",
+        action="store_false",
+        help="Не удалять вторичные индексы (по умолчанию для базы работающего сервиса, DB_PATH)",
+    )
+    parser.add_argument(
+        "--progress-interval", type=float, default=5.0, help="Период вывода прогресса, сек"
+    )
+    parser.set_defaults(handler=run)
@@ -1,4 +1,4 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import AnyHttpUrl, Field, PostgresDsn, ValidationInfo, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -17,6 +17,131 @@ class Settings(BaseSettings):
 
     DB_PATH: str = Field(default="boto.db", validation_alias="DB_PATH")
 
+    # Синхронизация мобильных клиентов
+    SYNC_PAGE_SIZE: int = Field(default=500, validation_alias="SYNC_PAGE_SIZE")
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = Field(
+        default=30, validation_alias="SYNC_TOMBSTONE_RETENTION_DAYS"
+    )
+
+    # Сжатие original_url словарем zstd (нужен пакет zstandard)
+    URL_COMPRESSION_ENABLED: bool = Field(default=True, validation_alias="URL_COMPRESSION_ENABLED")
+    URL_COMPRESSION_LEVEL: int = Field(default=3, validation_alias="URL_COMPRESSION_LEVEL")
+    URL_COMPRESSION_DICT_SIZE: int = Field(
+        default=16 * 1024, validation_alias="URL_COMPRESSION_DICT_SIZE"
+    )
+    URL_COMPRESSION_SAMPLE_SIZE: int = Field(
+        default=10_000, validation_alias="URL_COMPRESSION_SAMPLE_SIZE"
+    )
+    URL_COMPRESSION_MIN_SAMPLES: int = Field(
+        default=1_000, validation_alias="URL_COMPRESSION_MIN_SAMPLES"
+    )
+    RECOMPRESS_INTERVAL_SECONDS: float = Field(
+        default=3600.0, validation_alias="RECOMPRESS_INTERVAL_SECONDS"
+    )
+    RECOMPRESS_BATCH_SIZE: int = Field(default=500, validation_alias="RECOMPRESS_BATCH_SIZE")
+
+    # Статистика по доменам назначения (Count-Min Sketch + Space-Saving)
+    DOMAIN_STATS_ENABLED: bool = Field(default=True, validation_alias="DOMAIN_STATS_ENABLED")
+    DOMAIN_SKETCH_WIDTH: int = Field(default=2048, validation_alias="DOMAIN_SKETCH_WIDTH")
+    DOMAIN_SKETCH_DEPTH: int = Field(default=4, validation_alias="DOMAIN_SKETCH_DEPTH")
+    DOMAIN_TOP_K: int = Field(default=100, validation_alias="DOMAIN_TOP_K")
+    DOMAIN_STATS_PERSIST_SECONDS: float = Field(
+        default=60.0, validation_alias="DOMAIN_STATS_PERSIST_SECONDS"
+    )
+
+    # Счетчиков Space-Saving в каждой корзине окон популярных ссылок
+    HOT_LINKS_TOP_K: int = Field(default=200, validation_alias="HOT_LINKS_TOP_K")
+
+    # Резервные копии базы через sqlite3 backup API
+    BACKUP_ENABLED: bool = Field(default=False, validation_alias="BACKUP_ENABLED")
+    BACKUP_DIR: str = Field(default="backups", validation_alias="BACKUP_DIR")
+    BACKUP_INTERVAL_SECONDS: float = Field(default=6 * 3600.0, validation_alias="BACKUP_INTERVAL_SECONDS")
+    BACKUP_RETENTION: int = Field(default=7, validation_alias="BACKUP_RETENTION")
+    BACKUP_PAGES_PER_STEP: int = Field(default=256, validation_alias="BACKUP_PAGES_PER_STEP")
+    BACKUP_STEP_PAUSE_SECONDS: float = Field(default=0.01, validation_alias="BACKUP_STEP_PAUSE_SECONDS")
+    BACKUP_COMPRESS: bool = Field(default=True, validation_alias="BACKUP_COMPRESS")
+
+    # Логирование: text или json (JSON lines)
+    LOG_FORMAT: str = Field(default="text", validation_alias="LOG_FORMAT")
+    # Доля записываемых сообщений: {"network": 0.1, "network:/shorten": 0.01}
+    LOG_SAMPLE_RATES: Dict[str, float] = Field(default={}, validation_alias="LOG_SAMPLE_RATES")
+    # Не больше N сообщений в секунду: {"network": 100}; остальные подавляются.
+    # По умолчанию ограничений нет
+    LOG_RATE_LIMITS: Dict[str, int] = Field(default={}, validation_alias="LOG_RATE_LIMITS")
+
+    # LRU-кэш ссылок по short_code и его прогрев после перезапуска
+    LINK_CACHE_SIZE: int = Field(default=50_000, validation_alias="LINK_CACHE_SIZE")
+    LINK_CACHE_TTL_SECONDS: float = Field(default=60.0, validation_alias="LINK_CACHE_TTL_SECONDS")
+    LINK_CACHE_WARM_KEYS: int = Field(default=5000, validation_alias="LINK_CACHE_WARM_KEYS")
+    # Файл снимка горячих кодов (по умолчанию <DB_PATH>.warm)
+    LINK_CACHE_SNAPSHOT_PATH: str = Field(default="", validation_alias="LINK_CACHE_SNAPSHOT_PATH")
+
+    # Режим только чтения: ссылки из mmap-индекса (src.db.code_index) без SQLite
+    CODE_INDEX_PATH: str = Field(default="", validation_alias="CODE_INDEX_PATH")
+
+    # Токен эндпоинтов /admin (заголовок X-Admin-Token); без него они недоступны
+    ADMIN_TOKEN: str = Field(default="", validation_alias="ADMIN_TOKEN")
+    # Диагностика памяти (/admin/memory)
+    MEMORY_TRACEMALLOC_ENABLED: bool = Field(default=False, validation_alias="MEMORY_TRACEMALLOC_ENABLED")
+    MEMORY_TRACEMALLOC_FRAMES: int = Field(default=1, validation_alias="MEMORY_TRACEMALLOC_FRAMES")
+    MEMORY_WATCH_ENABLED: bool = Field(default=True, validation_alias="MEMORY_WATCH_ENABLED")
+    MEMORY_WATCH_INTERVAL_SECONDS: float = Field(default=300.0, validation_alias="MEMORY_WATCH_INTERVAL_SECONDS")
+    MEMORY_WATCH_WINDOW: int = Field(default=12, validation_alias="MEMORY_WATCH_WINDOW")
+    MEMORY_WATCH_GROWTH_RATIO: float = Field(default=0.1, validation_alias="MEMORY_WATCH_GROWTH_RATIO")
+
+    # Поиск по подстроке ссылки (FTS5, src.db.search)
+    SEARCH_PAGE_SIZE: int = Field(default=50, validation_alias="SEARCH_PAGE_SIZE")
+    SEARCH_BACKFILL_ENABLED: bool = Field(default=True, validation_alias="SEARCH_BACKFILL_ENABLED")
+    SEARCH_BACKFILL_INTERVAL_SECONDS: float = Field(
+        default=60.0, validation_alias="SEARCH_BACKFILL_INTERVAL_SECONDS"
+    )
+    SEARCH_BACKFILL_BATCH_SIZE: int = Field(default=1000, validation_alias="SEARCH_BACKFILL_BATCH_SIZE")
+    SEARCH_BACKFILL_PAUSE_SECONDS: float = Field(default=0.05, validation_alias="SEARCH_BACKFILL_PAUSE_SECONDS")
+
+    # Встроенный prefork-сервер (python -m src.server), воркеров - WEB_CONCURRENCY
+    SERVER_HOST: str = Field(default="0.0.0.0", validation_alias="SERVER_HOST")
+    SERVER_PORT: int = Field(default=8000, validation_alias="SERVER_PORT")
+    SERVER_REUSE_PORT: bool = Field(default=False, validation_alias="SERVER_REUSE_PORT")
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: float = Field(
+        default=30.0, validation_alias="SERVER_GRACEFUL_TIMEOUT_SECONDS"
+    )
+    SERVER_READY_TIMEOUT_SECONDS: float = Field(default=30.0, validation_alias="SERVER_READY_TIMEOUT_SECONDS")
+
+    # Массовое удаление ссылок (src.db.bulk_delete): строк в пачке и пауза между пачками
+    BULK_DELETE_BATCH_SIZE: int = Field(default=500, validation_alias="BULK_DELETE_BATCH_SIZE")
+    BULK_DELETE_PAUSE_SECONDS: float = Field(default=0.05, validation_alias="BULK_DELETE_PAUSE_SECONDS")
+
+    # Архив ссылок без переходов дольше ARCHIVE_IDLE_DAYS (src.db.archive)
+    ARCHIVE_ENABLED: bool = Field(default=False, validation_alias="ARCHIVE_ENABLED")
+    # Файл архива (по умолчанию <DB_PATH>.archive)
+    ARCHIVE_DB_PATH: str = Field(default="", validation_alias="ARCHIVE_DB_PATH")
+    ARCHIVE_IDLE_DAYS: float = Field(default=30.0, validation_alias="ARCHIVE_IDLE_DAYS")
+    ARCHIVE_INTERVAL_SECONDS: float = Field(default=3600.0, validation_alias="ARCHIVE_INTERVAL_SECONDS")
+    ARCHIVE_BATCH_SIZE: int = Field(default=500, validation_alias="ARCHIVE_BATCH_SIZE")
+    ARCHIVE_PAUSE_SECONDS: float = Field(default=0.05, validation_alias="ARCHIVE_PAUSE_SECONDS")
+
+    # Запись трафика для воспроизведения (benchmarks/replay.py)
+    TRAFFIC_CAPTURE_ENABLED: bool = Field(default=False, validation_alias="TRAFFIC_CAPTURE_ENABLED")
+    # Файл трейса (по умолчанию <DB_PATH>.trace), к имени добавляется pid процесса
+    TRAFFIC_CAPTURE_PATH: str = Field(default="", validation_alias="TRAFFIC_CAPTURE_PATH")
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = Field(default=1.0, validation_alias="TRAFFIC_CAPTURE_SAMPLE_RATE")
+    TRAFFIC_CAPTURE_MAX_BYTES: int = Field(
+        default=256 * 1024 * 1024, validation_alias="TRAFFIC_CAPTURE_MAX_BYTES"
+    )
+    # Как часто воркер проверяет флаг включения записи, сек
+    TRAFFIC_CAPTURE_POLL_SECONDS: float = Field(default=1.0, validation_alias="TRAFFIC_CAPTURE_POLL_SECONDS")
+
+    # Максимум операций записи в одной групповой транзакции
+    DB_WRITER_MAX_BATCH: int = Field(default=256, validation_alias="DB_WRITER_MAX_BATCH")
+
+    # Фоновое удаление просроченных ссылок
+    REAPER_ENABLED: bool = Field(default=True, validation_alias="REAPER_ENABLED")
+    REAPER_INTERVAL_SECONDS: float = Field(default=60.0, validation_alias="REAPER_INTERVAL_SECONDS")
+    REAPER_BATCH_SIZE: int = Field(default=500, validation_alias="REAPER_BATCH_SIZE")
+    REAPER_BATCH_PAUSE_SECONDS: float = Field(
+        default=0.05, validation_alias="REAPER_BATCH_PAUSE_SECONDS"
+    )
+
     WEB_CONCURRENCY: int = Field(default=9, validation_alias="WEB_CONCURRENCY")
     MAX_OVERFLOW: int = Field(default=64, validation_alias="MAX_OVERFLOW")
 
@@ -29,6 +154,19 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(default="", validation_alias="SECRET_KEY")
     ALGORITHM: str = Field(default="HS256", validation_alias="ALGORITHM")
 
+    # Кэш проверенных JWT
+    AUTH_TOKEN_CACHE_SIZE: int = Field(default=10_000, validation_alias="AUTH_TOKEN_CACHE_SIZE")
+    AUTH_TOKEN_CACHE_TTL_SECONDS: float = Field(
+        default=300.0, validation_alias="AUTH_TOKEN_CACHE_TTL_SECONDS"
+    )
+
+    # Хеширование паролей (scrypt) в пуле процессов
+    PASSWORD_HASH_N: int = Field(default=2**14, validation_alias="PASSWORD_HASH_N")
+    PASSWORD_HASH_R: int = Field(default=8, validation_alias="PASSWORD_HASH_R")
+    PASSWORD_HASH_P: int = Field(default=1, validation_alias="PASSWORD_HASH_P")
+    PASSWORD_HASH_WORKERS: int = Field(default=2, validation_alias="PASSWORD_HASH_WORKERS")
+    PASSWORD_HASH_CONCURRENCY: int = Field(default=8, validation_alias="PASSWORD_HASH_CONCURRENCY")
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -1,14 +1,120 @@
+import json
 import logging
+import threading
+import time
 from logging.handlers import RotatingFileHandler
 import gzip
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from src.core.config import settings
+from src.core.metrics import Metrics
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON; поля из extra={"fields": ...} идут как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _Budget:
+    __slots__ = ("credit", "window", "emitted", "suppressed")
+
+    def __init__(self):
+        self.credit = 0.0
+        self.window = -1
+        self.emitted = 0
+        self.suppressed = 0
+
+
+class LogLimiter:
+    """
+    Семплирование и ограничение частоты сообщений.
+
+    Правила задаются для логгера ("network") или для логгера и эндпоинта
+    ("network:/shorten"), более точное правило важнее. Из сообщений с
+    долей rate записывается каждое 1/rate-е, а сверх limit сообщений
+    в секунду остальные подавляются. Число подавленных сообщений
+    сообщается вместе со следующим записанным сообщением того же правила.
+    """
+
+    def __init__(
+        self,
+        sample_rates: Dict[str, float],
+        rate_limits: Dict[str, int],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self.clock = clock
+        self._budgets: Dict[str, _Budget] = {}
+        self._lock = threading.Lock()
+
+    def _rule(self, logger_name: str, endpoint: Optional[str]) -> Optional[str]:
+        if endpoint is not None:
+            key = f"{logger_name}:{endpoint}"
+            if key in self.sample_rates or key in self.rate_limits:
+                return key
+        if logger_name in self.sample_rates or logger_name in self.rate_limits:
+            return logger_name
+        return None
+
+    def check(self, logger_name: str, endpoint: Optional[str] = None) -> Tuple[bool, int]:
+        """(записывать ли сообщение, сколько подавлено с прошлой записи)"""
+        key = self._rule(logger_name, endpoint)
+        if key is None:
+            return True, 0
+        rate = self.sample_rates.get(key, 1.0)
+        limit = self.rate_limits.get(key)
+
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                budget = self._budgets[key] = _Budget()
+
+            budget.credit += rate
+            # Допуск на ошибку округления при сложении долей вроде 0.1
+            if budget.credit < 1 - 1e-9:
+                budget.suppressed += 1
+                return False, 0
+            budget.credit -= 1
+
+            if limit is not None:
+                window = int(self.clock())
+                if budget.window != window:
+                    budget.window = window
+                    budget.emitted = 0
+                if budget.emitted >= limit:
+                    budget.suppressed += 1
+                    return False, 0
+                budget.emitted += 1
+
+            suppressed, budget.suppressed = budget.suppressed, 0
+            return True, suppressed
+
+    def drain(self) -> Dict[str, int]:
+        """Подавленные и еще не отчитанные сообщения по правилам"""
+        with self._lock:
+            drained = {key: b.suppressed for key, b in self._budgets.items() if b.suppressed}
+            for key in drained:
+                self._budgets[key].suppressed = 0
+        return drained
+
 
 class LogManager:
     _loggers = {}
     LOG_BASE_DIR = Path(__file__).resolve().parent.parent.parent / "logs"
+    json_output = settings.LOG_FORMAT == "json"
+    limiter = LogLimiter(settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMITS)
 
     @staticmethod
     def _get_logger(name: str, log_level: int = logging.INFO) -> logging.Logger:
@@ -37,10 +143,13 @@ class LogManager:
         )
         handler.setLevel(level)
 
-        formatter = logging.Formatter(
-            "%(asctime)s | %(levelname)-7s | %(name)s | %(module)s | %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
+        if LogManager.json_output:
+            formatter = JsonLinesFormatter()
+        else:
+            formatter = logging.Formatter(
+                "%(asctime)s | %(levelname)-7s | %(name)s | %(module)s | %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S"
+            )
         handler.setFormatter(formatter)
 
         # Избегаем дублирования обработчиков
@@ -65,14 +174,60 @@ class LogManager:
         LogManager._add_file_handler(network_info_logger, "network_info", logging.INFO)
         LogManager._add_file_handler(network_error_logger, "network_errors", logging.ERROR)
 
+    @staticmethod
+    def _log(
+        logger_name: str,
+        level: int,
+        endpoint: Optional[str],
+        prefix: str,
+        text: Callable[[], str],
+        fields: Dict[str, Any],
+    ):
+        """
+        Запись сообщения с учетом семплирования и ограничения частоты.
+        Текст (с repr данных) строится, только если сообщение будет записано
+        """
+        logger = logging.getLogger(logger_name)
+        if not logger.isEnabledFor(level):
+            return
+        allowed, suppressed = LogManager.limiter.check(logger_name, endpoint)
+        if not allowed:
+            Metrics.inc("log.suppressed")
+            return
+        if suppressed:
+            LogManager._log_suppressed(logger, level, prefix, endpoint, suppressed)
+        if LogManager.json_output:
+            logger.log(level, fields.pop("message", ""), extra={"fields": fields})
+        else:
+            logger.log(level, text())
+
+    @staticmethod
+    def _log_suppressed(
+        logger: logging.Logger, level: int, prefix: str, endpoint: Optional[str], count: int
+    ):
+        message = f"{count} similar messages suppressed"
+        if LogManager.json_output:
+            logger.log(level, message, extra={"fields": {"endpoint": endpoint, "suppressed": count}})
+        else:
+            logger.log(level, f"{prefix}|{endpoint or '-'}| {message}")
+
+    @staticmethod
+    def flush_suppressed():
+        """Записать итоги подавленных сообщений, например при остановке"""
+        for key, count in LogManager.limiter.drain().items():
+            logger_name, _, endpoint = key.partition(":")
+            logger = logging.getLogger(logger_name)
+            LogManager._log_suppressed(
+                logger, logger.getEffectiveLevel(), logger_name.upper(), endpoint or None, count
+            )
+
     @staticmethod
     async def log_database_info(message: str, data: Dict = None):
         """
         Логирование информационных сообщений
         базы данных
         """
-        logger = logging.getLogger("database")
-        logger.info(f"DB_INFO|{message}|" f" DATA: {data}")
+        LogManager.sync_log_database_info(message, data)
     
     @staticmethod
     def sync_log_database_info(message: str, data: Dict = None):
@@ -80,50 +235,57 @@ class LogManager:
         Логирование информационных сообщений
         базы данных
         """
-        logger = logging.getLogger("database")
-        logger.info(f"DB_INFO|{message}|" f" DATA: {data}")
+        LogManager._log(
+            "database", logging.INFO, None, "DB_INFO",
+            lambda: f"DB_INFO|{message}|" f" DATA: {data}",
+            {"message": message, "data": data},
+        )
 
     @staticmethod
     async def log_database_error(error: str, query: str = None, params: Dict = None):
         """
         Логирование ошибок базы данных
         """
-        logger = logging.getLogger("database_errors")
-        logger.error(f"DB_ERROR|{error}|" f" QUERY: {query}|" f" PARAMS: {params}")
+        LogManager.sync_log_database_error(error, query, params)
     
     @staticmethod
     def sync_log_database_error(error: str, query: str = None, params: Dict = None):
         """
         Логирование ошибок базы данных
         """
-        logger = logging.getLogger("database_errors")
-        logger.error(f"DB_ERROR|{error}|" f" QUERY: {query}|" f" PARAMS: {params}")
+        LogManager._log(
+            "database_errors", logging.ERROR, None, "DB_ERROR",
+            lambda: f"DB_ERROR|{error}|" f" QUERY: {query}|" f" PARAMS: {params}",
+            {"message": error, "query": query, "params": params},
+        )
 
     @staticmethod
     async def log_network_info(endpoint: str, message: str, data: Dict = None):
         """Логирование сетевых операций"""
-        logger = logging.getLogger("network")
-        logger.info(f"NETWORK_INFO|{endpoint}|" f" MESSAGE: {message}|" f" DATA: {data}")
+        LogManager.sync_log_network_info(endpoint, message, data)
 
     @staticmethod
     async def log_network_error(endpoint: str, error: str, response: Dict = None):
         """Логирование сетевых ошибок"""
-
-        logger = logging.getLogger("network_errors")
-        logger.error(f"NETWORK_ERROR|{endpoint}|" f" ERROR: {error}|" f" RESPONSE: {response}")
+        LogManager.sync_log_network_error(endpoint, error, response)
     
     @staticmethod
     def sync_log_network_info(endpoint: str, message: str, data: Dict = None):
         """Логирование сетевых операций"""
-        logger = logging.getLogger("network")
-        logger.info(f"NETWORK_INFO|{endpoint}|" f" MESSAGE: {message}|" f" DATA: {data}")
+        LogManager._log(
+            "network", logging.INFO, endpoint, "NETWORK_INFO",
+            lambda: f"NETWORK_INFO|{endpoint}|" f" MESSAGE: {message}|" f" DATA: {data}",
+            {"message": message, "endpoint": endpoint, "data": data},
+        )
 
     @staticmethod
     def sync_log_network_error(endpoint: str, error: str, response: Dict = None):
         """Логирование сетевых ошибок"""
-
-        logger = logging.getLogger("network_errors")
-        logger.error(f"NETWORK_ERROR|{endpoint}|" f" ERROR: {error}|" f" RESPONSE: {response}")
+        LogManager._log(
+            "network_errors", logging.ERROR, endpoint, "NETWORK_ERROR",
+            lambda: f"NETWORK_ERROR|{endpoint}|" f" ERROR: {error}|" f" RESPONSE: {response}",
+            {"message": error, "endpoint": endpoint, "response": response},
+        )
 
     @staticmethod
     def compress_old_logs(logfile: Path):
@@ -169,3 +331,6 @@ class LogManager:
                     LogManager.compress_old_logs(logfile)
             except Exception as e:
                 print(f"Error processing log file {logfile}: {e}")
+
+
+Metrics.register_gauge("log.loggers", lambda: len(LogManager._loggers))
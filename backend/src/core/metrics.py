@@ -0,0 +1,78 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict
+
+
+class _Summary:
+    """Распределение значений: агрегаты и окно последних наблюдений для перцентилей"""
+
+    __slots__ = ("count", "total", "min", "max", "window")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.window: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.window.append(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = sorted(self.window)
+
+        def percentile(q: float) -> float:
+            return values[min(int(q * len(values)), len(values) - 1)]
+
+        return {
+            "count": self.count,
+            "avg": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": percentile(0.5),
+            "p99": percentile(0.99),
+        }
+
+
+class Metrics:
+    """Метрики процесса: счетчики и распределения, доступны через GET /metrics"""
+
+    _counters: Dict[str, float] = {}
+    _summaries: Dict[str, _Summary] = {}
+    _gauges: Dict[str, Callable[[], float]] = {}
+    WINDOW = 1024
+
+    @staticmethod
+    def inc(name: str, value: float = 1):
+        """Увеличить счетчик"""
+        Metrics._counters[name] = Metrics._counters.get(name, 0) + value
+
+    @staticmethod
+    def observe(name: str, value: float):
+        """Добавить наблюдение в распределение"""
+        summary = Metrics._summaries.get(name)
+        if summary is None:
+            summary = Metrics._summaries[name] = _Summary(Metrics.WINDOW)
+        summary.observe(value)
+
+    @staticmethod
+    def register_gauge(name: str, func: Callable[[], float]):
+        """Зарегистрировать показатель, вычисляемый в момент снятия метрик"""
+        Metrics._gauges[name] = func
+
+    @staticmethod
+    def snapshot() -> Dict[str, Any]:
+        """Текущие значения всех метрик"""
+        return {
+            "counters": dict(Metrics._counters),
+            "summaries": {name: s.snapshot() for name, s in Metrics._summaries.items()},
+            "gauges": {name: func() for name, func in Metrics._gauges.items()},
+        }
+
+    @staticmethod
+    def reset():
+        Metrics._counters.clear()
+        Metrics._summaries.clear()
@@ -0,0 +1,47 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.core.log_manager import LogManager
+
+
+class PeriodicTask(ABC):
+    """
+    Фоновая задача, которая вызывает run_once каждые interval секунд.
+    Запускается и останавливается обработчиками startup/shutdown приложения
+    """
+
+    name = "periodic"
+
+    def __init__(self, interval: float, enabled: bool = True):
+        self.interval = interval
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def run_once(self):
+        """Один проход задачи"""
+        pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                LogManager.sync_log_database_error(f"Ошибка фоновой задачи {self.name}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
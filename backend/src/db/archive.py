@@ -0,0 +1,465 @@
+"""
+Архив холодных ссылок в отдельной базе SQLite.
+
+Большинство ссылок после первых недель больше не открывают, но они
+раздувают urls и ее индексы. LinkArchiver пачками переносит бессрочные
+ссылки без переходов дольше ARCHIVE_IDLE_DAYS в архивную базу
+(по умолчанию <DB_PATH>.archive), чтобы горячая база помещалась
+в page cache и mmap.
+
+- строка архива неизменяема: JSON ссылки, сжатый zlib, дописывается
+  в конец таблицы и только удаляется;
+- порядок записи безопасен при падении: сначала строка коммитится в архив,
+  затем удаляется из urls; повтор после падения дает только дубль,
+  а горячая строка при поиске всегда важнее архивной;
+- промах get_by_id проверяет архив и возвращает ссылку в urls
+  (с тем же id, счетчиком и кодом), после чего строка архива удаляется;
+  если та же ссылка уже есть в urls под другим кодом, архивный код
+  записывается в code_aliases и дальше открывает ее без архива;
+- коды архивных ссылок записаны в archived_codes горячей базы в той же
+  транзакции, что и удаление из urls: новая ссылка такой код не получает
+  (UrlInfoDbClient.process), поэтому возвращенная ссылка не сталкивается
+  с чужой, а старая короткая ссылка не открывает новый адрес; по их
+  url_hash /shorten узнает, что ссылку нужно вернуть из архива;
+- перенос в архив не считается удалением для синхронизации: tombstone,
+  записанный триггером, удаляется в той же транзакции.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.periodic import PeriodicTask
+from src.db.compression import url_codec
+from src.db.search import index_link
+from src.db.session import get_db, next_change_stamp
+from src.db.writer import db_writer
+from src.schemas.common import LinkRecord
+from src.services.link_cache import link_cache
+from src.utils.generators import url_digest
+from src.utils.time import now_ms
+
+
+ARCHIVE_DDL = """
+    CREATE TABLE IF NOT EXISTS archived_urls (
+        seq INTEGER PRIMARY KEY,
+        link_id INTEGER NOT NULL,
+        short_code TEXT NOT NULL,
+        url_hash BLOB NOT NULL,
+        archived_at INTEGER NOT NULL,
+        payload BLOB NOT NULL
+    )
+"""
+
+# Ключ import_state: коды архива уже перенесены в archived_codes
+_RESERVED_KEY = "archive:codes_reserved"
+
+# Колонки кандидатов в архив: время создания и строкой (для возврата), и в мс
+_IDLE_COLUMNS = (
+    "urls.id, short_code, short_url, original_url, dict_version, url_hash, created_at, "
+    "CAST(strftime('%s', created_at) AS INTEGER) * 1000, urls.updated_at"
+)
+
+
+def default_archive_path(db_path: str) -> str:
+    """Архив базы db_path: ARCHIVE_DB_PATH для основной базы, иначе <db_path>.archive"""
+    if settings.ARCHIVE_DB_PATH and os.path.abspath(db_path) == os.path.abspath(settings.DB_PATH):
+        return settings.ARCHIVE_DB_PATH
+    return f"{db_path}.archive"
+
+
+@dataclass
+class ArchivedLink:
+    link_id: int
+    short_code: str
+    short_url: str
+    original_url: str
+    created_at: str
+    created_ms: Optional[int]
+    updated_at: int
+    clicks: int
+    clicked_at: int
+
+    def pack(self) -> bytes:
+        data = {
+            "u": self.short_url,
+            "o": self.original_url,
+            "c": self.created_at,
+            "cm": self.created_ms,
+            "m": self.updated_at,
+            "n": self.clicks,
+            "k": self.clicked_at,
+        }
+        return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+    @classmethod
+    def unpack(cls, link_id: int, short_code: str, payload: bytes) -> "ArchivedLink":
+        data = json.loads(zlib.decompress(payload))
+        return cls(
+            link_id, short_code, data["u"], data["o"], data["c"], data["cm"], data["m"], data["n"], data["k"]
+        )
+
+    def to_record(self, link_id: Optional[int] = None) -> LinkRecord:
+        return LinkRecord(
+            self.short_code, self.short_url, self.original_url, self.clicks, self.created_ms, None,
+            link_id if link_id is not None else self.link_id,
+        )
+
+
+class LinkArchive:
+    """Архивная база: дописывание, поиск по коду или url_hash, удаление"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    def active(self) -> bool:
+        """Архив есть на диске (до первого переноса промахи его не открывают)"""
+        return os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(ARCHIVE_DDL)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_urls_code ON archived_urls (short_code)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_urls_hash ON archived_urls (url_hash)")
+        return conn
+
+    def append(self, links: List[Tuple[ArchivedLink, bytes]]):
+        """Дописать пачку (ссылка, url_hash) одной транзакцией"""
+        archived_at = now_ms()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    """
+                    INSERT INTO archived_urls (link_id, short_code, url_hash, archived_at, payload)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [(link.link_id, link.short_code, url_hash, archived_at, link.pack()) for link, url_hash in links]
+                )
+        finally:
+            conn.close()
+
+    def get(self, short_code: Optional[str] = None, url_hash: Optional[bytes] = None) -> Optional[ArchivedLink]:
+        """Последняя архивная запись по коду или по url_hash"""
+        if not self.active:
+            return None
+        column, value = ("short_code", short_code) if short_code else ("url_hash", url_hash)
+        with get_db(self.path) as conn:
+            row = conn.execute(
+                f"""
+                SELECT link_id, short_code, payload FROM archived_urls
+                WHERE {column} = ? ORDER BY seq DESC LIMIT 1
+                """,
+                (value,)
+            ).fetchone()
+        return ArchivedLink.unpack(*row) if row else None
+
+    def codes(self) -> List[Tuple[int, str, bytes]]:
+        """Все (link_id, short_code, url_hash) архива"""
+        if not self.active:
+            return []
+        with get_db(self.path) as conn:
+            return [tuple(row) for row in conn.execute("SELECT link_id, short_code, url_hash FROM archived_urls")]
+
+    def remove(self, short_codes: Iterable[str]):
+        codes = list(short_codes)
+        if not codes or not self.active:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM archived_urls WHERE short_code IN (SELECT value FROM json_each(?))",
+                    (json.dumps(codes),)
+                )
+        finally:
+            conn.close()
+
+    def remove_hash(self, url_hash: bytes) -> List[Tuple[int, str]]:
+        """Удалить ссылку по url_hash, вернуть удаленные (link_id, short_code)"""
+        if not self.active:
+            return []
+        conn = self._connect()
+        try:
+            with conn:
+                return [
+                    tuple(row) for row in conn.execute(
+                        "DELETE FROM archived_urls WHERE url_hash = ? RETURNING link_id, short_code", (url_hash,)
+                    )
+                ]
+        finally:
+            conn.close()
+
+    def purge(
+        self, predicate: Callable[[ArchivedLink], bool], batch_size: int = 1000, dry_run: bool = False
+    ) -> List[Tuple[int, str]]:
+        """
+        Удалить записи, для которых predicate истинен (массовое удаление),
+        вернуть их (link_id, short_code). Архив просматривается пачками
+        по seq, каждая пачка - своя транзакция; dry_run только находит записи
+        """
+        removed: List[Tuple[int, str]] = []
+        if not self.active:
+            return removed
+        conn = self._connect()
+        try:
+            after = 0
+            while True:
+                rows = conn.execute(
+                    """
+                    SELECT seq, link_id, short_code, payload FROM archived_urls
+                    WHERE seq > ? ORDER BY seq LIMIT ?
+                    """,
+                    (after, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                after = rows[-1][0]
+                doomed = [row for row in rows if predicate(ArchivedLink.unpack(*row[1:]))]
+                if doomed and not dry_run:
+                    with conn:
+                        conn.execute(
+                            "DELETE FROM archived_urls WHERE seq IN (SELECT value FROM json_each(?))",
+                            (json.dumps([row[0] for row in doomed]),)
+                        )
+                removed += [(row[1], row[2]) for row in doomed]
+        finally:
+            conn.close()
+        return removed
+
+
+def add_tombstones(conn: sqlite3.Connection, links: List[Tuple[int, str]]):
+    """
+    Удаление архивных ссылок видно синхронизации так же, как удаление
+    из urls, и освобождает их коды
+    """
+    conn.executemany(
+        "INSERT INTO url_tombstones (link_id, short_code, deleted_at) VALUES (?, ?, ?)",
+        [(link_id, code, next_change_stamp(conn)) for link_id, code in links]
+    )
+    conn.executemany("DELETE FROM archived_codes WHERE short_code = ?", [(code,) for _, code in links])
+
+
+def _restore(conn: sqlite3.Connection, link: ArchivedLink, url_hash: bytes) -> Tuple[int, bool]:
+    """
+    Вернуть ссылку в urls (внутри транзакции записи). Возвращает (id, True),
+    или (id строки с той же ссылкой, False), если она уже есть в urls:
+    тогда архивный код записывается в code_aliases
+    """
+    stored, version = url_codec.encode(link.original_url)
+    row = conn.execute(
+        """
+        INSERT INTO urls
+        (id, short_url, original_url, short_code, created_at, expires_at, updated_at, url_hash, dict_version)
+        VALUES (
+            (SELECT CASE WHEN EXISTS (SELECT 1 FROM urls WHERE id = ?1) THEN NULL ELSE ?1 END),
+            ?2, ?3, ?4, ?5, NULL, ?6, ?7, ?8
+        )
+        ON CONFLICT(url_hash) DO NOTHING
+        RETURNING id
+        """,
+        (link.link_id, link.short_url, stored, link.short_code, link.created_at,
+         link.updated_at, url_hash, version)
+    ).fetchone()
+    if row is None:
+        existing = conn.execute("SELECT id FROM urls WHERE url_hash = ?", (url_hash,)).fetchone()
+        # Код остается зарезервированным и дальше открывает эту строку без архива
+        conn.execute(
+            "INSERT OR REPLACE INTO code_aliases (short_code, link_id) VALUES (?, ?)",
+            (link.short_code, existing[0])
+        )
+        conn.execute("UPDATE archived_codes SET url_hash = NULL WHERE short_code = ?", (link.short_code,))
+        return existing[0], False
+    # Время перехода - сейчас: только что возвращенная ссылка не уходит в архив снова
+    conn.execute(
+        "INSERT INTO url_clicks (link_id, clicks, clicked_at) VALUES (?, ?, ?)",
+        (row[0], link.clicks, next_change_stamp(conn))
+    )
+    conn.execute("DELETE FROM archived_codes WHERE short_code = ?", (link.short_code,))
+    index_link(conn, row[0], link.original_url)
+    return row[0], True
+
+
+class LinkArchiver(PeriodicTask):
+    """
+    Переносит в архив бессрочные ссылки без переходов дольше idle_days.
+    Ссылки с expires_at не архивируются: их удалит ExpiredUrlReaper
+    """
+
+    name = "archiver"
+
+    def __init__(
+        self,
+        archive: LinkArchive,
+        idle_days: float,
+        interval: float,
+        batch_size: int,
+        pause: float,
+        enabled: bool = True,
+    ):
+        super().__init__(interval, enabled)
+        self.archive = archive
+        self.idle_days = idle_days
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def _idle_batch(self, cutoff_ms: int, after: Tuple[str, int]) -> Tuple[List[Tuple[ArchivedLink, bytes]], Tuple[str, int]]:
+        """
+        Пачка холодных ссылок: сначала давно открытые (по индексу clicked_at),
+        затем ни разу не открытые (по индексу created_at, начиная с after)
+        """
+        cutoff_sql = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(cutoff_ms / 1000))
+        with get_db(settings.DB_PATH) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {_IDLE_COLUMNS}, clicks, clicked_at
+                FROM url_clicks JOIN urls ON urls.id = url_clicks.link_id
+                WHERE clicked_at < ? AND expires_at IS NULL
+                ORDER BY clicked_at
+                LIMIT ?
+                """,
+                (cutoff_ms, self.batch_size)
+            ).fetchall()
+            if len(rows) < self.batch_size:
+                unclicked = conn.execute(
+                    f"""
+                    SELECT {_IDLE_COLUMNS}, 0, 0
+                    FROM urls
+                    WHERE created_at < ? AND (created_at, id) > (?, ?) AND expires_at IS NULL
+                      AND NOT EXISTS (SELECT 1 FROM url_clicks WHERE link_id = urls.id)
+                    ORDER BY created_at, id
+                    LIMIT ?
+                    """,
+                    (cutoff_sql, *after, self.batch_size - len(rows))
+                ).fetchall()
+                if unclicked:
+                    after = (unclicked[-1]["created_at"], unclicked[-1]["id"])
+                rows += unclicked
+
+        links = []
+        for row in rows:
+            (link_id, code, short_url, stored, version, url_hash,
+             created_at, created_ms, updated_at, clicks, clicked_at) = row
+            link = ArchivedLink(
+                link_id, code, short_url, url_codec.decode(stored, version),
+                created_at, created_ms, updated_at, clicks, clicked_at,
+            )
+            links.append((link, url_hash))
+        return links, after
+
+    async def _evict(self, links: List[ArchivedLink], cutoff_ms: int) -> List[str]:
+        """Удалить из urls строки, которые все еще холодные; вернуть их коды"""
+        def op(conn: sqlite3.Connection) -> List[str]:
+            before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM url_tombstones").fetchone()[0]
+            moved = conn.execute(
+                """
+                DELETE FROM urls
+                WHERE (id, short_code) IN (
+                    SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+                )
+                  AND COALESCE((SELECT clicked_at FROM url_clicks WHERE link_id = urls.id), 0) < ?
+                RETURNING short_code, id, url_hash
+                """,
+                (json.dumps([(link.link_id, link.short_code) for link in links]), cutoff_ms)
+            ).fetchall()
+            # Ссылка не удалена, а перенесена: клиенты синхронизации ее не теряют
+            conn.execute("DELETE FROM url_tombstones WHERE id > ?", (before,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO archived_codes (short_code, link_id, url_hash) VALUES (?, ?, ?)",
+                [tuple(row) for row in moved]
+            )
+            return [row[0] for row in moved]
+
+        return await db_writer.submit(op)
+
+    async def archive_idle(self) -> int:
+        """Перенести все холодные ссылки, вернуть их число"""
+        cutoff_ms = now_ms() - int(self.idle_days * 24 * 3600 * 1000)
+        after: Tuple[str, int] = ("", 0)
+        total = 0
+        while True:
+            links, after = await asyncio.to_thread(self._idle_batch, cutoff_ms, after)
+            if not links:
+                break
+            await asyncio.to_thread(self.archive.append, links)
+            moved = set(await self._evict([link for link, _ in links], cutoff_ms))
+            # Открытые за время переноса остаются в urls, их архивная копия не нужна
+            stale = [link.short_code for link, _ in links if link.short_code not in moved]
+            if stale:
+                await asyncio.to_thread(self.archive.remove, stale)
+            link_cache.discard(moved)
+            total += len(moved)
+            if len(links) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+
+        if total:
+            LogManager.sync_log_database_info("Холодные ссылки перенесены в архив", {"count": total})
+        return total
+
+    async def run_once(self):
+        await self.archive_idle()
+
+
+link_archive = LinkArchive(default_archive_path(settings.DB_PATH))
+
+
+def reserve_archived_codes(conn: sqlite3.Connection):
+    """
+    Один раз заносит в archived_codes коды и хеши архива, который был создан
+    до появления этой таблицы или ее колонки url_hash (при старте, после init_schema)
+    """
+    if conn.execute("SELECT 1 FROM import_state WHERE key = ?", (_RESERVED_KEY,)).fetchone():
+        return
+    codes = link_archive.codes()
+    conn.executemany(
+        """
+        INSERT INTO archived_codes (short_code, link_id, url_hash) VALUES (?, ?, ?)
+        ON CONFLICT(short_code) DO UPDATE SET url_hash = excluded.url_hash
+        """,
+        [(code, link_id, url_hash) for link_id, code, url_hash in codes]
+    )
+    conn.execute("INSERT OR IGNORE INTO import_state (key, value) VALUES (?, 1)", (_RESERVED_KEY,))
+    conn.commit()
+    if codes:
+        LogManager.sync_log_database_info("Коды архивных ссылок зарезервированы", {"count": len(codes)})
+
+
+def promote(short_code: Optional[str] = None, url_hash: Optional[bytes] = None) -> Optional[LinkRecord]:
+    """
+    Найти ссылку в архиве и вернуть ее в urls (промах горячей базы).
+    Вызывается из потока: запись идет через db_writer.submit_sync
+    """
+    link = link_archive.get(short_code=short_code, url_hash=url_hash)
+    if link is None:
+        return None
+    digest = url_digest(link.original_url)
+    link_id, restored = db_writer.submit_sync(lambda conn: _restore(conn, link, digest))
+    link_archive.remove([link.short_code])
+    if restored:
+        LogManager.sync_log_database_info("Ссылка возвращена из архива", {"short_code": link.short_code})
+    else:
+        # Та же ссылка уже в urls: переходы по архивному коду считаются ей
+        LogManager.sync_log_database_info(
+            "Архивный код связан с действующей ссылкой", {"short_code": link.short_code, "link_id": link_id}
+        )
+    return link.to_record(link_id)
+
+
+link_archiver = LinkArchiver(
+    link_archive,
+    idle_days=settings.ARCHIVE_IDLE_DAYS,
+    interval=settings.ARCHIVE_INTERVAL_SECONDS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    pause=settings.ARCHIVE_PAUSE_SECONDS,
+    enabled=settings.ARCHIVE_ENABLED,
+)
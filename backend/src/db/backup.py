@@ -0,0 +1,269 @@
+"""
+Резервные копии базы без остановки сервиса.
+
+Копия снимается через sqlite3 Connection.backup(): за один шаг копируется
+pages страниц, между шагами поток спит pause секунд и отпускает
+блокировку, поэтому запись в базу не ждет окончания копирования.
+Если базу изменили во время копирования, SQLite сам перезапускает
+копирование, и в итоге получается согласованный снимок.
+
+Снимок пишется во временный файл и переименовывается только после
+завершения, при необходимости сжимается gzip. Старые снимки сверх
+BACKUP_RETENTION удаляются.
+
+Архив холодных ссылок (src.db.archive) - отдельный файл, и в резервную
+копию он входит своим снимком (create_snapshots). Основная база
+копируется первой: ссылка переносится в архив раньше, чем удаляется из
+urls, поэтому перенос во время копирования дает в худшем случае дубль
+в обоих снимках, но не потерю. Снимок архива восстанавливается в архив
+(restore_target).
+"""
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+from src.core.periodic import PeriodicTask
+from src.db.archive import default_archive_path
+
+
+SNAPSHOT_SUFFIXES = (".db", ".db.gz")
+
+Progress = Callable[[int, int, int], None]
+
+
+@dataclass
+class VerifyResult:
+    ok: bool
+    integrity: str
+    urls: int
+
+
+def _snapshot_name(db_path: str, compress: bool) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return f"{Path(db_path).stem}-{stamp}.db" + (".gz" if compress else "")
+
+
+def copy_database(
+    source: sqlite3.Connection,
+    target: sqlite3.Connection,
+    pages: int,
+    pause: float,
+    progress: Optional[Progress] = None,
+):
+    """Постраничное копирование source в target через backup API"""
+    source.backup(target, pages=pages, progress=progress, sleep=pause)
+
+
+def create_snapshot(
+    db_path: str,
+    backup_dir: str,
+    pages: int = 256,
+    pause: float = 0.01,
+    compress: bool = True,
+    progress: Optional[Progress] = None,
+) -> Path:
+    """Снять снимок db_path в backup_dir, вернуть путь к файлу снимка"""
+    started = time.perf_counter()
+    directory = Path(backup_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    final = directory / _snapshot_name(db_path, compress)
+
+    fd, tmp_db = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(tmp_db)
+        try:
+            copy_database(source, target, pages, pause, progress)
+        finally:
+            target.close()
+            source.close()
+
+        if compress:
+            tmp_gz = tmp_db + ".gz"
+            with open(tmp_db, "rb") as raw, gzip.open(tmp_gz, "wb", compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+            os.replace(tmp_gz, final)
+        else:
+            os.replace(tmp_db, final)
+    finally:
+        for leftover in (tmp_db, tmp_db + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    Metrics.observe("backup.seconds", time.perf_counter() - started)
+    LogManager.sync_log_database_info(
+        "Снята резервная копия базы", {"path": str(final), "bytes": final.stat().st_size}
+    )
+    return final
+
+
+def snapshot_sources(db_path: str) -> List[str]:
+    """Базы, входящие в резервную копию db_path: сама база и ее архив, если он создан"""
+    archive = default_archive_path(db_path)
+    return [db_path, archive] if os.path.exists(archive) else [db_path]
+
+
+def create_snapshots(
+    db_path: str,
+    backup_dir: str,
+    pages: int = 256,
+    pause: float = 0.01,
+    compress: bool = True,
+    progress: Optional[Progress] = None,
+) -> List[Path]:
+    """Снимки db_path и ее архива, основная база - первой"""
+    return [
+        create_snapshot(path, backup_dir, pages, pause, compress, progress)
+        for path in snapshot_sources(db_path)
+    ]
+
+
+def restore_target(snapshot: str, db_path: str) -> str:
+    """База, в которую восстанавливается снимок: архив db_path для снимков архива"""
+    archive = default_archive_path(db_path)
+    if Path(snapshot).name.startswith(f"{Path(archive).stem}-"):
+        return archive
+    return db_path
+
+
+def list_snapshots(db_path: str, backup_dir: str) -> List[Path]:
+    """Снимки базы db_path, от старых к новым"""
+    directory = Path(backup_dir)
+    if not directory.is_dir():
+        return []
+    prefix = f"{Path(db_path).stem}-"
+    return sorted(
+        path for path in directory.iterdir()
+        if path.name.startswith(prefix) and path.name.endswith(SNAPSHOT_SUFFIXES)
+    )
+
+
+def prune_snapshots(db_path: str, backup_dir: str, keep: int) -> List[Path]:
+    """Удалить снимки сверх keep последних, вернуть удаленные"""
+    snapshots = list_snapshots(db_path, backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+@contextmanager
+def _open_snapshot(path: str) -> Iterator[sqlite3.Connection]:
+    """Соединение со снимком; сжатый снимок распаковывается во временный файл"""
+    tmp_path = None
+    if str(path).endswith(".gz"):
+        fd, tmp_path = tempfile.mkstemp(suffix=".db")
+        with os.fdopen(fd, "wb") as raw, gzip.open(path, "rb") as packed:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+    conn = sqlite3.connect(tmp_path or path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+def verify_snapshot(path: str) -> VerifyResult:
+    """PRAGMA integrity_check и число ссылок в снимке (основной базы или архива)"""
+    with _open_snapshot(path) as conn:
+        try:
+            integrity = "; ".join(row[0] for row in conn.execute("PRAGMA integrity_check"))
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            table = "urls" if "urls" in tables else "archived_urls"
+            urls = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            return VerifyResult(ok=False, integrity=str(e), urls=0)
+    return VerifyResult(ok=integrity == "ok", integrity=integrity, urls=urls)
+
+
+def restore_snapshot(
+    path: str,
+    db_path: str,
+    pages: int = 256,
+    pause: float = 0.01,
+    progress: Optional[Progress] = None,
+) -> VerifyResult:
+    """
+    Проверить снимок и заменить им содержимое db_path.
+
+    Копирование идет через backup API в открытую базу, поэтому другие
+    соединения видят либо старое, либо полностью восстановленное содержимое
+    """
+    result = verify_snapshot(path)
+    if not result.ok:
+        raise ValueError(f"Снимок поврежден: {result.integrity}")
+
+    with _open_snapshot(path) as source:
+        target = sqlite3.connect(db_path)
+        try:
+            copy_database(source, target, pages, pause, progress)
+        finally:
+            target.close()
+
+    LogManager.sync_log_database_info(
+        "База восстановлена из резервной копии", {"path": str(path), "urls": result.urls}
+    )
+    return result
+
+
+class BackupScheduler(PeriodicTask):
+    """Снимок базы и архива раз в interval секунд с удалением старых снимков"""
+
+    name = "backup"
+
+    def __init__(
+        self,
+        db_path: str,
+        backup_dir: str,
+        interval: float,
+        keep: int,
+        pages: int,
+        pause: float,
+        compress: bool,
+        enabled: bool = True,
+    ):
+        super().__init__(interval, enabled)
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self.compress = compress
+
+    def snapshot(self) -> List[Path]:
+        paths = create_snapshots(
+            self.db_path, self.backup_dir, self.pages, self.pause, self.compress
+        )
+        for source in snapshot_sources(self.db_path):
+            prune_snapshots(source, self.backup_dir, self.keep)
+        return paths
+
+    async def run_once(self):
+        # Копирование и сжатие идут в отдельном потоке, цикл событий свободен
+        await asyncio.to_thread(self.snapshot)
+
+
+backup_scheduler = BackupScheduler(
+    db_path=settings.DB_PATH,
+    backup_dir=settings.BACKUP_DIR,
+    interval=settings.BACKUP_INTERVAL_SECONDS,
+    keep=settings.BACKUP_RETENTION,
+    pages=settings.BACKUP_PAGES_PER_STEP,
+    pause=settings.BACKUP_STEP_PAUSE_SECONDS,
+    compress=settings.BACKUP_COMPRESS,
+    enabled=settings.BACKUP_ENABLED,
+)
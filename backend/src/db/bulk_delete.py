@@ -0,0 +1,359 @@
+"""
+Массовое удаление ссылок по домену, префиксу ссылки или дате создания.
+
+Строки выбираются только через индексы и удаляются пачками, каждая
+в своей короткой транзакции, с паузой между пачками - писатель не занят
+дольше одной пачки, как и у ExpiredUrlReaper.
+
+- домен и префикс ищутся по поисковому индексу url_search (подстрока),
+  каждое совпадение затем проверяется точно: хост ссылки или startswith;
+- диапазон дат - по индексу idx_urls_created_at.
+
+Позиция прохода по url_search (последний просмотренный rowid) пишется
+в import_state в той же транзакции, что и удаление пачки, поэтому
+прерванное удаление с теми же условиями продолжается с места остановки.
+Проход только по датам позиции не требует: удаленные строки больше
+не находятся, и повторный запуск просто доделывает остаток.
+
+Архив холодных ссылок (src.db.archive) индексов по ссылке не имеет
+и после горячей базы просматривается целиком.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.db.archive import ArchivedLink, LinkArchive, add_tombstones, default_archive_path
+from src.db.compression import url_codec
+from src.db.search import fts_query, search_available
+from src.db.session import get_db
+from src.db.writer import WriteOp, db_writer
+from src.utils.time import dt_to_sql
+
+
+STATE_KEY_PREFIX = "bulk_delete:"
+
+# Сколько ссылок показывать в ответе пробного запуска
+SAMPLE_SIZE = 10
+
+
+class BulkDeleteError(ValueError):
+    """Условия удаления нельзя выполнить через индексы"""
+
+
+@dataclass(frozen=True)
+class DeleteCriteria:
+    """Условия отбора; заданные условия объединяются через AND"""
+    domain: Optional[str] = None
+    include_subdomains: bool = False
+    url_prefix: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    def validate(self):
+        if not (self.domain or self.url_prefix or self.created_from or self.created_to):
+            raise BulkDeleteError("Нужно хотя бы одно условие: domain, url_prefix или даты")
+        needle = self.needle
+        if needle is not None and len(needle) < 3:
+            raise BulkDeleteError("domain и url_prefix должны быть не короче трех символов")
+        if self.created_from and self.created_to and self.created_from >= self.created_to:
+            raise BulkDeleteError("created_from должен быть раньше created_to")
+
+    @property
+    def needle(self) -> Optional[str]:
+        """Подстрока для url_search или None, если отбор только по датам"""
+        if self.url_prefix:
+            return self.url_prefix
+        if self.domain:
+            return self.domain.lower().strip(".")
+        return None
+
+    @property
+    def key(self) -> str:
+        """Ключ чекпоинта в import_state: одинаковые условия - одна позиция"""
+        raw = json.dumps(
+            {name: str(value) for name, value in asdict(self).items() if value not in (None, False)},
+            sort_keys=True,
+        )
+        return STATE_KEY_PREFIX + hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    def matches(self, url: str) -> bool:
+        """Точная проверка кандидата, найденного по подстроке"""
+        if self.url_prefix and not url.startswith(self.url_prefix):
+            return False
+        if self.domain:
+            try:
+                host = urlsplit(url).hostname
+            except ValueError:
+                return False
+            domain = self.domain.lower().strip(".")
+            if host is None:
+                return False
+            if host != domain and not (self.include_subdomains and host.endswith("." + domain)):
+                return False
+        return True
+
+    def matches_archived(self, link: ArchivedLink) -> bool:
+        """Проверка ссылки из архива: там нет индексов, даты сравниваются здесь"""
+        if self.created_from and not link.created_at >= dt_to_sql(self.created_from):
+            return False
+        if self.created_to and not link.created_at < dt_to_sql(self.created_to):
+            return False
+        return self.matches(link.original_url)
+
+    def date_filter(self) -> Tuple[str, List[str]]:
+        """Условие по created_at и его параметры"""
+        clauses, params = [], []
+        if self.created_from:
+            clauses.append("urls.created_at >= ?")
+            params.append(dt_to_sql(self.created_from))
+        if self.created_to:
+            clauses.append("urls.created_at < ?")
+            params.append(dt_to_sql(self.created_to))
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+
+@dataclass
+class BulkDeleteStats:
+    scanned: int = 0
+    matched: int = 0
+    deleted: int = 0
+    chunks: int = 0
+    position: int = 0
+    resumed_from: int = 0
+    done: bool = False
+    sample: List[str] = field(default_factory=list)
+
+
+def _select_candidates(
+    conn: sqlite3.Connection, criteria: DeleteCriteria, after: int, limit: int
+) -> List[Tuple[int, str, str]]:
+    """
+    Следующие кандидаты (id, short_code, original_url) после позиции after.
+    По url_search - в порядке rowid, иначе - самые старые по created_at
+    """
+    dates, params = criteria.date_filter()
+    if criteria.needle is None:
+        rows = conn.execute(
+            f"""
+            SELECT id, short_code, original_url, dict_version
+            FROM urls
+            WHERE 1 = 1 {dates}
+            ORDER BY created_at, id
+            LIMIT ?
+            """,
+            (*params, limit)
+        ).fetchall()
+        return [(row[0], row[1], url_codec.decode(row[2], row[3])) for row in rows]
+
+    rows = conn.execute(
+        f"""
+        SELECT urls.id, urls.short_code, url_search.url
+        FROM url_search
+        JOIN urls ON urls.id = url_search.rowid
+        WHERE url_search MATCH ? AND url_search.rowid > ? {dates}
+        ORDER BY url_search.rowid
+        LIMIT ?
+        """,
+        (fts_query(criteria.needle), after, *params, limit)
+    ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def delete_chunk(
+    conn: sqlite3.Connection, links: List[Tuple[int, str]], state_key: Optional[str], position: int
+) -> List[str]:
+    """
+    Удалить пачку (id, short_code) и сохранить позицию (внутри транзакции).
+    Строка удаляется, только если ее код не изменился после отбора
+    """
+    codes = [
+        row[0] for row in conn.execute(
+            """
+            DELETE FROM urls
+            WHERE (id, short_code) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            )
+            RETURNING short_code
+            """,
+            (json.dumps(links),)
+        )
+    ]
+    if state_key is not None:
+        conn.execute(
+            """
+            INSERT INTO import_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """,
+            (state_key, position)
+        )
+    return codes
+
+
+class BulkDelete:
+    """
+    Одно массовое удаление. count() - пробный запуск без изменений,
+    run() - удаление пачками с чекпоинтом.
+
+    write выполняет операцию записи op(conn) в транзакции (по умолчанию
+    через db_writer), on_deleted получает коды каждой удаленной пачки
+    для сброса кэшей, progress - статистику после каждой пачки
+    """
+
+    def __init__(
+        self,
+        criteria: DeleteCriteria,
+        db_path: str = settings.DB_PATH,
+        batch_size: int = settings.BULK_DELETE_BATCH_SIZE,
+        pause: float = settings.BULK_DELETE_PAUSE_SECONDS,
+        write: Callable[[WriteOp], Awaitable[Any]] = db_writer.submit,
+        on_deleted: Optional[Callable[[List[str]], None]] = None,
+        progress: Optional[Callable[[BulkDeleteStats], None]] = None,
+    ):
+        criteria.validate()
+        self.criteria = criteria
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pause = pause
+        self.write = write
+        self.on_deleted = on_deleted
+        self.progress = progress
+        self.stats = BulkDeleteStats()
+
+    @property
+    def uses_search(self) -> bool:
+        return self.criteria.needle is not None
+
+    def check_index(self):
+        """Домен и префикс ищутся только по url_search, без него - ошибка"""
+        if not self.uses_search:
+            return
+        with get_db(self.db_path) as conn:
+            if not search_available(conn):
+                raise BulkDeleteError("Отбор по домену и префиксу требует индекса url_search (FTS5)")
+
+    def unindexed(self) -> int:
+        """Сколько ссылок еще не попало в url_search (их дописывает SearchBackfill)"""
+        self.check_index()
+        if not self.uses_search:
+            return 0
+        with get_db(self.db_path) as conn:
+            return conn.execute(
+                "SELECT count(*) FROM urls WHERE id NOT IN (SELECT rowid FROM url_search)"
+            ).fetchone()[0]
+
+    def _position(self) -> int:
+        with get_db(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT value FROM import_state WHERE key = ?", (self.criteria.key,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _next(self, after: int) -> List[Tuple[int, str, str]]:
+        with get_db(self.db_path) as conn:
+            return _select_candidates(conn, self.criteria, after, self.batch_size)
+
+    def _scan(self, after: int) -> Iterable[List[Tuple[int, str, str]]]:
+        """Пачки кандидатов по url_search начиная с позиции after (без удаления)"""
+        while True:
+            rows = self._next(after)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.batch_size:
+                return
+            after = rows[-1][0]
+
+    def count(self) -> BulkDeleteStats:
+        """Пробный запуск: сколько ссылок будет удалено, и несколько примеров"""
+        stats = BulkDeleteStats(done=True)
+        if not self.uses_search:
+            dates, params = self.criteria.date_filter()
+            with get_db(self.db_path) as conn:
+                stats.matched = stats.scanned = conn.execute(
+                    f"SELECT count(*) FROM urls WHERE 1 = 1 {dates}", params
+                ).fetchone()[0]
+            stats.sample = [url for _, _, url in self._next(0)[:SAMPLE_SIZE]]
+            stats.matched += len(self._archive.purge(self.criteria.matches_archived, dry_run=True))
+            return stats
+
+        self.check_index()
+        for rows in self._scan(0):
+            stats.scanned += len(rows)
+            for _, _, url in rows:
+                if self.criteria.matches(url):
+                    stats.matched += 1
+                    if len(stats.sample) < SAMPLE_SIZE:
+                        stats.sample.append(url)
+        stats.matched += len(self._archive.purge(self.criteria.matches_archived, dry_run=True))
+        return stats
+
+    async def _delete(self, links: List[Tuple[int, str]], position: int) -> List[str]:
+        state_key = self.criteria.key if self.uses_search else None
+        return await self.write(lambda conn: delete_chunk(conn, links, state_key, position))
+
+    @property
+    def _archive(self) -> LinkArchive:
+        return LinkArchive(default_archive_path(self.db_path))
+
+    async def _purge_archive(self):
+        """Удалить подходящие ссылки из архива; для синхронизации - tombstone"""
+        removed = await asyncio.to_thread(self._archive.purge, self.criteria.matches_archived, self.batch_size)
+        if not removed:
+            return
+        await self.write(lambda conn: add_tombstones(conn, removed))
+        self.stats.matched += len(removed)
+        self.stats.deleted += len(removed)
+        if self.on_deleted is not None:
+            self.on_deleted([code for _, code in removed])
+
+    async def _forget_position(self):
+        key = self.criteria.key
+        await self.write(lambda conn: conn.execute("DELETE FROM import_state WHERE key = ?", (key,)))
+
+    async def run(self, restart: bool = False) -> BulkDeleteStats:
+        """Удалить все подходящие ссылки, вернуть статистику"""
+        await asyncio.to_thread(self.check_index)
+        stats = self.stats
+        after = 0 if restart or not self.uses_search else await asyncio.to_thread(self._position)
+        stats.resumed_from = stats.position = after
+
+        while True:
+            rows = await asyncio.to_thread(self._next, after)
+            if not rows:
+                break
+            links = [(link_id, code) for link_id, code, url in rows if self.criteria.matches(url)]
+            if self.uses_search:
+                after = rows[-1][0]
+            codes = await self._delete(links, after)
+
+            stats.scanned += len(rows)
+            stats.matched += len(links)
+            stats.deleted += len(codes)
+            stats.chunks += 1
+            stats.position = after
+            if codes and self.on_deleted is not None:
+                self.on_deleted(codes)
+            if self.progress is not None:
+                self.progress(stats)
+            # По датам строки удаляются целиком: неполная пачка - последняя;
+            # пустое удаление значит, что строки меняются быстрее, чем удаляются
+            if len(rows) < self.batch_size or (not self.uses_search and not codes):
+                break
+            await asyncio.sleep(self.pause)
+
+        await self._purge_archive()
+        if self.uses_search:
+            await self._forget_position()
+        stats.done = True
+        LogManager.sync_log_database_info(
+            "Массовое удаление ссылок завершено",
+            {"criteria": self.criteria.key, "deleted": stats.deleted, "scanned": stats.scanned},
+        )
+        return stats
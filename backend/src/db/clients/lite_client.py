@@ -1,14 +1,68 @@
-from typing import TypeVar, Optional, Dict, Any, List
+import asyncio
+import json
+import sqlite3
+from typing import TypeVar, Optional, Dict, Any, Iterator, List, Tuple
 
-from src.db.session import get_db
+from src.db.session import get_db, next_change_stamp
+from src.db.writer import db_writer
 
 from src.db.base_client import AbstractDbClient
-from src.schemas.common import UrlInfo
+from src.schemas.common import LinkRecord, UrlInfo
 from src.core.config import settings
+from src.db.archive import add_tombstones, link_archive, promote
+from src.db.compression import url_codec
+from src.db.search import fts_query, index_link
+from src.utils.exception import ShortCodeTakenError
+from src.utils.generators import url_digest
 
 T = TypeVar("T")
 db_path = settings.DB_PATH
 
+# Существующая строка urls истекла (для ON CONFLICT DO UPDATE)
+_EXPIRED = "urls.expires_at IS NOT NULL AND urls.expires_at <= CURRENT_TIMESTAMP"
+
+# Код занят архивной ссылкой или действующей ссылкой на другой адрес
+_CODE_TAKEN = """
+    SELECT 1 FROM archived_codes WHERE short_code = ?1
+    UNION ALL
+    SELECT 1 FROM urls WHERE short_code = ?1 AND url_hash IS NOT ?2
+    LIMIT 1
+"""
+
+# Счетчик переходов хранится в узкой таблице url_clicks (нет строки - 0 кликов)
+URLS_WITH_CLICKS = "urls LEFT JOIN url_clicks ON url_clicks.link_id = urls.id"
+
+# Колонки самой urls (для RETURNING, где соединение недоступно)
+_URL_OWN_COLUMNS = (
+    "id, short_url, original_url, short_code, created_at, "
+    "expires_at, updated_at, dict_version"
+)
+
+# updated_at - последнее изменение ссылки, включая клики
+URL_COLUMNS = (
+    "id, short_url, original_url, short_code, created_at, COALESCE(clicks, 0) AS clicks, "
+    "expires_at, max(urls.updated_at, COALESCE(clicked_at, 0)) AS updated_at, dict_version"
+)
+
+# Колонки для LinkRecord: время сразу в миллисекундах, без разбора строк в Python
+LINK_COLUMNS = (
+    "id, short_code, short_url, original_url, dict_version, COALESCE(clicks, 0), "
+    "CAST(strftime('%s', created_at) AS INTEGER) * 1000, "
+    "CAST(strftime('%s', expires_at) AS INTEGER) * 1000"
+)
+
+_SEARCH_SQL = """
+    SELECT urls.id, short_code, short_url, url_search.url AS original_url,
+           COALESCE(clicks, 0) AS clicks, url_search.rank AS rank
+    FROM url_search
+    JOIN urls ON urls.id = url_search.rowid
+    LEFT JOIN url_clicks ON url_clicks.link_id = urls.id
+    WHERE url_search MATCH ?
+      AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+    ORDER BY url_search.rank, urls.id
+"""
+
+
 class UrlInfoDbClient(AbstractDbClient[Dict[str, Any], UrlInfo]):
     """
     Клиент для работы со станциями в PostgreSQL.
@@ -18,43 +72,92 @@ class UrlInfoDbClient(AbstractDbClient[Dict[str, Any], UrlInfo]):
     table_name = "urls"
     schema: UrlInfo = UrlInfo
 
+    @classmethod
+    def _from_row(cls, row: sqlite3.Row) -> UrlInfo:
+        """Строка urls -> UrlInfo с распакованной original_url"""
+        data = dict(row)
+        data["original_url"] = url_codec.decode(data["original_url"], data.pop("dict_version"))
+        return cls.schema.model_validate(data)
+
+    @staticmethod
+    def _record_from_row(row: sqlite3.Row) -> LinkRecord:
+        """Строка LINK_COLUMNS -> LinkRecord с распакованной original_url"""
+        id, short_code, short_url, stored, version, clicks, created_ms, expires_ms = row
+        return LinkRecord(
+            short_code, short_url, url_codec.decode(stored, version), clicks, created_ms, expires_ms, id
+        )
 
     @classmethod
-    def get_by_id(cls, original_url: str, short_code: str = None) -> Optional[UrlInfo]:
+    def get_by_id(cls, original_url: str, short_code: str = None) -> Optional[LinkRecord]:
         """Получить запись об сокращенной ссылки по коду"""
         with get_db(db_path) as session:
             if not short_code:
 
                 cursor = session.execute(
-                    """
-                    SELECT short_url, original_url, short_code, created_at, clicks 
-                    FROM urls
-                    WHERE original_url = ?
+                    f"""
+                    SELECT {LINK_COLUMNS}
+                    FROM {URLS_WITH_CLICKS}
+                    WHERE url_hash = ?
+                      AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
                     """,
-                    (original_url,)
+                    (url_digest(original_url),)
                 )
             else:
                 cursor = session.execute(
-                    """
-                    SELECT short_url, original_url, short_code, created_at, clicks 
-                    FROM urls
+                    f"""
+                    SELECT {LINK_COLUMNS}
+                    FROM {URLS_WITH_CLICKS}
                     WHERE short_code = ?
+                      AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
                     """,
                     (short_code,)
                 )
             row = cursor.fetchone()
+            if row is None and short_code:
+                # Архивный код ссылки, которая уже была в urls под другим кодом
+                row = session.execute(
+                    f"""
+                    SELECT {LINK_COLUMNS}
+                    FROM {URLS_WITH_CLICKS}
+                    WHERE urls.id = (SELECT link_id FROM code_aliases WHERE short_code = ?)
+                      AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+                    """,
+                    (short_code,)
+                ).fetchone()
             if row:
-                return cls.schema.model_validate(dict(row))
-    
+                return cls._record_from_row(row)
+        if link_archive.active:
+            # Промах горячей базы: ссылка могла уйти в архив, тогда она возвращается в urls
+            if short_code:
+                return promote(short_code=short_code)
+            return promote(url_hash=url_digest(original_url))
+        return None
+
+
+    @classmethod
+    def get_many_by_code(cls, short_codes: List[str]) -> List[LinkRecord]:
+        """Действующие ссылки по списку кодов одним запросом, в порядке short_codes"""
+        with get_db(db_path) as session:
+            cursor = session.execute(
+                f"""
+                SELECT {LINK_COLUMNS}
+                FROM {URLS_WITH_CLICKS}
+                WHERE short_code IN (SELECT value FROM json_each(?))
+                  AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+                """,
+                (json.dumps(short_codes),)
+            )
+            found = {record.short_code: record for record in map(cls._record_from_row, cursor.fetchall())}
+        return [found[code] for code in short_codes if code in found]
 
     @classmethod
     def get_all(cls, skip: int = 0, limit: int = 100) -> List[UrlInfo | None ]:
         """Получить все сокращенные ссылки """
         with get_db(db_path) as session:
             cursor = session.execute(
-                """
-                SELECT short_url, original_url, short_code, created_at, clicks
-                FROM urls
+                f"""
+                SELECT {URL_COLUMNS}
+                FROM {URLS_WITH_CLICKS}
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
                 """,
@@ -63,63 +166,292 @@ class UrlInfoDbClient(AbstractDbClient[Dict[str, Any], UrlInfo]):
 
             rows = cursor.fetchall()
 
-            return [cls.schema.model_validate(dict(row) for row in rows)]
+            return [cls._from_row(row) for row in rows]
             
     @classmethod
-    def delete_by_id(cls, original_url: str) -> bool:
-        """Удлаить сокращенную ссылку по полной ссылке"""
-        with get_db(db_path) as conn:
-            cursor = conn.execute(
-                "DELETE FROM urls WHERE original_url = ?",
-                (original_url,)
+    def get_changes(cls, after: Tuple[int, int], limit: int) -> List[UrlInfo]:
+        """
+        Ссылки, измененные после позиции after = (updated_at, id),
+        в порядке индекса idx_urls_updated_at. Ссылки, по которым кликали
+        позже изменения, отдает get_click_changes
+        """
+        with get_db(db_path) as session:
+            cursor = session.execute(
+                f"""
+                SELECT {URL_COLUMNS}
+                FROM {URLS_WITH_CLICKS}
+                WHERE (urls.updated_at, id) > (?, ?)
+                  AND urls.updated_at >= COALESCE(clicked_at, 0)
+                ORDER BY urls.updated_at, id
+                LIMIT ?
+                """,
+                (*after, limit)
             )
-            conn.commit()
-            return cursor.rowcount > 0
-        
+            return [cls._from_row(row) for row in cursor.fetchall()]
+
     @classmethod
-    def process(cls, data: Dict[str, Any]) -> UrlInfo:
+    def get_click_changes(cls, after: Tuple[int, int], limit: int) -> List[UrlInfo]:
         """
-        Создать или обновить сокращенную ссылку и
-        data должен содержать как минимум:
-        short_code, original_url
+        Ссылки, последним изменением которых был клик, после позиции
+        after = (clicked_at, id), в порядке индекса idx_url_clicks_clicked_at
         """
-        required = {"short_url", "original_url", "short_code"}
-        if not required.issubset(data.keys()):
-            raise ValueError(f"Пропущены обязательные поля: {required - set(data.keys())}")
+        with get_db(db_path) as session:
+            cursor = session.execute(
+                f"""
+                SELECT {URL_COLUMNS}
+                FROM url_clicks CROSS JOIN urls ON urls.id = url_clicks.link_id
+                WHERE (clicked_at, link_id) > (?, ?)
+                  AND clicked_at > urls.updated_at
+                ORDER BY clicked_at, link_id
+                LIMIT ?
+                """,
+                (*after, limit)
+            )
+            return [cls._from_row(row) for row in cursor.fetchall()]
+
+    @classmethod
+    def search(cls, text: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Действующие ссылки, в original_url которых есть подстрока text,
+        по убыванию релевантности (bm25). Ищется по индексу url_search
+        """
+        with get_db(db_path) as session:
+            cursor = session.execute(
+                _SEARCH_SQL + " LIMIT ? OFFSET ?",
+                (fts_query(text), limit, offset)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    @classmethod
+    def iter_search(cls, text: str, batch: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Все совпадения search по мере чтения из курсора, без загрузки в память.
+        Соединение не привязано к потоку: следующую пачку может читать
+        другой поток пула (StreamingResponse)
+        """
+        with get_db(db_path, check_same_thread=False) as session:
+            cursor = session.execute(_SEARCH_SQL, (fts_query(text),))
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
 
+    @classmethod
+    def get_tombstones(cls, after: Tuple[int, int], limit: int) -> List[Dict[str, Any]]:
+        """Удаленные ссылки после позиции after = (deleted_at, id)"""
         with get_db(db_path) as session:
-            session.execute(
+            cursor = session.execute(
                 """
-                INSERT OR REPLACE INTO urls
-                (short_url, original_url, short_code, created_at, clicks)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+                SELECT id, link_id, short_code, deleted_at
+                FROM url_tombstones
+                WHERE (deleted_at, id) > (?, ?)
+                ORDER BY deleted_at, id
+                LIMIT ?
                 """,
-                (
-                    data.get('short_url'),
-                    data.get('original_url'),
-                    data.get('short_code'),
-                    data.get('clicks')
+                (*after, limit)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    @classmethod
+    async def delete_tombstones_before(cls, deleted_before: int, limit: int) -> int:
+        """Удалить не более limit tombstone-записей старше deleted_before (мс)"""
+        def op(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute(
+                """
+                DELETE FROM url_tombstones
+                WHERE id IN (
+                    SELECT id FROM url_tombstones
+                    WHERE deleted_at < ?
+                    ORDER BY deleted_at
+                    LIMIT ?
                 )
+                """,
+                (deleted_before, limit)
             )
-            session.commit()
-        
-        row = cls.get_by_id(data.get('short_url'))
-        if row:
-            raise RuntimeError("Ошибка создания или обновления ссылки")
+            return cursor.rowcount
 
+        return await db_writer.submit(op)
 
+    @classmethod
+    def sample_urls(cls, limit: int) -> List[str]:
+        """Последние limit ссылок: выборка для обучения словаря сжатия"""
+        with get_db(db_path) as session:
+            cursor = session.execute(
+                "SELECT original_url, dict_version FROM urls ORDER BY id DESC LIMIT ?",
+                (limit,)
+            )
+            return [url_codec.decode(row[0], row[1]) for row in cursor.fetchall()]
 
     @classmethod
-    def increment_clicks(cls, original_url: str) -> Optional[UrlInfo]:
-        """Получить запись об сокращенной ссылки по коду"""
+    def get_recompress_batch(
+        cls, after_id: int, version: int, limit: int
+    ) -> List[Tuple[int, Any, Optional[int]]]:
+        """Строки после after_id, сжатые не словарем version: (id, original_url, dict_version)"""
         with get_db(db_path) as session:
             cursor = session.execute(
                 """
-                UPDATE urls
-                SET clicks = clicks + 1
-                WHERE original_url = ?
+                SELECT id, original_url, dict_version
+                FROM urls
+                WHERE id > ? AND (dict_version IS NULL OR dict_version != ?)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (after_id, version, limit)
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+
+    @classmethod
+    async def update_stored_urls(cls, rows: List[Tuple[Any, Optional[int], int, Optional[int]]]) -> int:
+        """
+        Перезаписать сжатое представление ссылок.
+        rows: (original_url, dict_version, id, прежний dict_version);
+        строка пропускается, если ее успели изменить
+        """
+        def op(conn: sqlite3.Connection) -> int:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                UPDATE urls SET original_url = ?, dict_version = ?
+                WHERE id = ? AND dict_version IS ?
                 """,
-                (original_url, )
+                rows
             )
-            session.commit()
-            return cursor.rowcount > 0
\ No newline at end of file
+            return conn.total_changes - before
+
+        return await db_writer.submit(op)
+
+    @classmethod
+    async def delete_by_id(cls, original_url: str) -> bool:
+        """Удлаить сокращенную ссылку по полной ссылке"""
+        url_hash = url_digest(original_url)
+        archived = await asyncio.to_thread(link_archive.remove_hash, url_hash)
+
+        def op(conn: sqlite3.Connection) -> bool:
+            cursor = conn.execute("DELETE FROM urls WHERE url_hash = ?", (url_hash,))
+            add_tombstones(conn, archived)
+            return cursor.rowcount > 0 or bool(archived)
+
+        return await db_writer.submit(op)
+
+    @classmethod
+    async def delete_expired(cls, limit: int) -> int:
+        """
+        Удалить не более limit просроченных ссылок.
+        Строки выбираются через индекс idx_urls_expires_at,
+        поэтому короткая транзакция не сканирует всю таблицу
+        """
+        def op(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute(
+                """
+                DELETE FROM urls
+                WHERE id IN (
+                    SELECT id FROM urls
+                    WHERE expires_at <= CURRENT_TIMESTAMP
+                    ORDER BY expires_at
+                    LIMIT ?
+                )
+                """,
+                (limit,)
+            )
+            return cursor.rowcount
+
+        return await db_writer.submit(op)
+
+    @classmethod
+    async def process(cls, data: Dict[str, Any]) -> UrlInfo:
+        """
+        Создать сокращенную ссылку или вернуть существующую одним запросом.
+        data должен содержать как минимум:
+        short_url, short_code, original_url
+
+        Если ссылка с таким original_url уже есть и не истекла, она
+        возвращается без изменений. Истекшая ссылка заменяется новой
+        (новый код, срок жизни и 0 переходов) с тем же id.
+
+        ShortCodeTakenError - код уже принадлежит другой ссылке, в том числе
+        архивной; вызывающий повторяет запрос с новым кодом.
+
+        Архив читается, только если url_hash ссылки есть в archived_codes:
+        тогда ссылка возвращается из архива, и upsert выполняется второй раз
+        """
+        required = {"short_url", "original_url", "short_code"}
+        if not required.issubset(data.keys()):
+            raise ValueError(f"Пропущены обязательные поля: {required - set(data.keys())}")
+
+        url_hash = url_digest(data['original_url'])
+        stored_url, dict_version = url_codec.encode(data['original_url'])
+        def op(conn: sqlite3.Connection, check_archive: bool = True) -> Optional[Dict[str, Any]]:
+            # Существующая ссылка возвращается, даже если новый код оказался занят
+            live = conn.execute(f"SELECT 1 FROM urls WHERE url_hash = ? AND NOT ({_EXPIRED})", (url_hash,)).fetchone()
+            if live is None:
+                if check_archive and conn.execute(
+                    "SELECT 1 FROM archived_codes WHERE url_hash = ?", (url_hash,)
+                ).fetchone():
+                    # Ссылка в архиве: сначала она возвращается в urls
+                    return None
+                if conn.execute(_CODE_TAKEN, (data['short_code'], url_hash)).fetchone():
+                    raise ShortCodeTakenError(data['short_code'])
+            # updated_at - отметка часов изменений в этой же транзакции
+            params = (
+                data['short_url'],
+                stored_url,
+                data['short_code'],
+                data.get('expires_at'),
+                next_change_stamp(conn),
+                url_hash,
+                dict_version,
+            )
+            row = conn.execute(
+                f"""
+                INSERT INTO urls
+                (short_url, original_url, short_code, created_at, expires_at,
+                 updated_at, url_hash, dict_version)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+                ON CONFLICT(url_hash) DO UPDATE SET
+                    short_url = iif({_EXPIRED}, excluded.short_url, short_url),
+                    original_url = iif({_EXPIRED}, excluded.original_url, original_url),
+                    short_code = iif({_EXPIRED}, excluded.short_code, short_code),
+                    created_at = iif({_EXPIRED}, excluded.created_at, created_at),
+                    dict_version = iif({_EXPIRED}, excluded.dict_version, dict_version),
+                    updated_at = iif({_EXPIRED}, excluded.updated_at, updated_at),
+                    expires_at = iif({_EXPIRED}, excluded.expires_at, expires_at)
+                RETURNING {_URL_OWN_COLUMNS}
+                """,
+                params
+            ).fetchone()
+            index_link(conn, row["id"], data['original_url'])
+            # Замена истекшей ссылки сбрасывает счетчик триггером trg_urls_clicks_reset
+            clicks = conn.execute(
+                "SELECT clicks FROM url_clicks WHERE link_id = ?", (row["id"],)
+            ).fetchone()
+            return {**dict(row), "clicks": clicks[0] if clicks else 0}
+
+        row = await db_writer.submit(op)
+        if row is None:
+            # Ссылка из архива возвращается в urls, и повторный upsert отдает ее прежний код
+            await asyncio.to_thread(promote, url_hash=url_hash)
+            row = await db_writer.submit(lambda conn: op(conn, check_archive=False))
+        return cls._from_row(row)
+
+    @classmethod
+    async def increment_clicks(cls, link_id: int) -> bool:
+        """
+        Увеличить счетчик переходов по id ссылки.
+        Меняется только узкая строка url_clicks, широкая строка urls
+        не переписывается. Для синхронизации клик виден по clicked_at
+        """
+        def op(conn: sqlite3.Connection) -> bool:
+            cursor = conn.execute(
+                """
+                INSERT INTO url_clicks (link_id, clicks, clicked_at)
+                SELECT ?, 1, ? WHERE EXISTS (SELECT 1 FROM urls WHERE id = ?)
+                ON CONFLICT(link_id) DO UPDATE SET
+                    clicks = clicks + 1, clicked_at = excluded.clicked_at
+                """,
+                (link_id, next_change_stamp(conn), link_id)
+            )
+            return cursor.rowcount > 0
+
+        return await db_writer.submit(op)
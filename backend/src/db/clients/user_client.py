@@ -0,0 +1,158 @@
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.db.base_client import AbstractDbClient
+from src.db.relations import USER_RELATIONS, load_relations
+from src.db.session import get_db
+from src.db.writer import db_writer
+from src.schemas.common import User
+from src.utils.exception import UserAlreadyExistsError
+
+
+db_path = settings.DB_PATH
+
+USER_COLUMNS = "id, login, email, vk_id, hashed_password, version"
+
+# Поля профиля в ответе (без хеша пароля)
+_PUBLIC = {"id", "login", "email", "vk_id"}
+
+# Поля, которые можно менять через update
+_UPDATABLE = {"login", "email", "vk_id", "hashed_password"}
+
+
+def _already_exists(e: sqlite3.IntegrityError, data: Dict[str, Any]) -> UserAlreadyExistsError:
+    """Нарушение UNIQUE -> ошибка с тем полем, которое уже занято"""
+    message = str(e)
+    if "users.vk_id" in message:
+        return UserAlreadyExistsError("Этот vkId уже привязан к другому пользователю")
+    if "users.email" in message:
+        return UserAlreadyExistsError(email=data.get("email"))
+    return UserAlreadyExistsError(login=data.get("login"))
+
+
+class UserDbClient(AbstractDbClient[Dict[str, Any], User]):
+    """
+    Клиент для работы с пользователями в SQLite.
+    """
+
+    table_name = "users"
+    schema: User = User
+
+    @classmethod
+    def _get_one(cls, column: str, value: Any) -> Optional[User]:
+        with get_db(db_path) as session:
+            row = session.execute(
+                f"SELECT {USER_COLUMNS} FROM users WHERE {column} = ?", (value,)
+            ).fetchone()
+        return cls.schema.model_validate(dict(row)) if row else None
+
+    @classmethod
+    def get_by_id(cls, id: int) -> Optional[User]:
+        """Получить пользователя по id"""
+        return cls._get_one("id", id)
+
+    @classmethod
+    def get_by_login(cls, login: str) -> Optional[User]:
+        return cls._get_one("login", login)
+
+    @classmethod
+    def get_by_email(cls, email: str) -> Optional[User]:
+        return cls._get_one("email", email)
+
+    @classmethod
+    def get_version(cls, id: Any) -> Optional[int]:
+        """Текущая версия строки пользователя, None - пользователя больше нет"""
+        with get_db(db_path) as session:
+            row = session.execute("SELECT version FROM users WHERE id = ?", (int(id),)).fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def get_many_with_relations(
+        cls, user_ids: List[int], relations: Tuple[str, ...] = USER_RELATIONS
+    ) -> List[Dict[str, Any]]:
+        """
+        Профили пользователей со связями relations в порядке user_ids:
+        1 + len(relations) запросов на всех пользователей сразу
+        """
+        with get_db(db_path) as session:
+            rows = session.execute(
+                f"""
+                SELECT {USER_COLUMNS} FROM users
+                WHERE id IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps(user_ids),)
+            ).fetchall()
+            users = {row["id"]: cls.schema.model_validate(dict(row)) for row in rows}
+            loaded = load_relations(session, users, relations)
+        return [
+            {"user": users[user_id].model_dump(include=_PUBLIC), **loaded[user_id]}
+            for user_id in user_ids if user_id in users
+        ]
+
+    @classmethod
+    def get_by_id_with_relations(
+        cls, user_id: int, relations: Tuple[str, ...] = USER_RELATIONS
+    ) -> Optional[Dict[str, Any]]:
+        """Профиль пользователя со связями relations или None"""
+        found = cls.get_many_with_relations([user_id], relations)
+        return found[0] if found else None
+
+    @classmethod
+    def get_existing_ids(cls) -> List[int]:
+        with get_db(db_path) as session:
+            return [row[0] for row in session.execute("SELECT id FROM users ORDER BY id")]
+
+    @classmethod
+    async def process(cls, data: Dict[str, Any]) -> User:
+        """
+        Создать пользователя. data: login, hashed_password,
+        необязательно email и vk_id
+        """
+        if not data.get("login"):
+            raise ValueError("Пропущено обязательное поле: login")
+
+        def op(conn: sqlite3.Connection) -> Dict[str, Any]:
+            try:
+                row = conn.execute(
+                    f"""
+                    INSERT INTO users (login, email, vk_id, hashed_password)
+                    VALUES (?, ?, ?, ?)
+                    RETURNING {USER_COLUMNS}
+                    """,
+                    (data["login"], data.get("email"), data.get("vk_id"), data.get("hashed_password"))
+                ).fetchone()
+            except sqlite3.IntegrityError as e:
+                raise _already_exists(e, data) from e
+            return dict(row)
+
+        return cls.schema.model_validate(await db_writer.submit(op))
+
+    @classmethod
+    async def update(cls, data: Dict[str, Any]) -> bool:
+        """
+        Изменить поля пользователя data["id"]. Каждое изменение
+        увеличивает version, и снимки пользователя в кэшах токенов
+        всех воркеров перестают считаться актуальными
+        """
+        fields = {key: value for key, value in data.items() if key != "id"}
+        unknown = set(fields) - _UPDATABLE
+        if unknown:
+            raise ValueError(f"Нельзя изменить поля: {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+
+        def op(conn: sqlite3.Connection) -> bool:
+            try:
+                cursor = conn.execute(
+                    f"UPDATE users SET {assignments}, version = version + 1 WHERE id = ?",
+                    (*fields.values(), data["id"])
+                )
+            except sqlite3.IntegrityError as e:
+                raise _already_exists(e, fields) from e
+            return cursor.rowcount > 0
+
+        return await db_writer.submit(op)
@@ -0,0 +1,160 @@
+"""
+Неизменяемый индекс short_code -> ссылка в файле, отображаемом в память.
+
+Для инстансов, которые только показывают ссылки из почти статичного
+набора: индекс собирается из urls заранее (python -m src.cli code-index
+build), а сервис в режиме только чтения (CODE_INDEX_PATH) ищет коды
+прямо в mmap без SQLite. Файл открывается мгновенно, а страницы файла
+в page cache общие для всех процессов-воркеров.
+
+Формат (little-endian):
+
+    заголовок   magic "BZCI", version u32, records u32, slots u32, slots_offset u64
+    записи      clicks i64, created_at i64, expires_at i64 (мс, 0 - нет),
+                len(code) u16, len(short_url) u16, len(url) u32, code, short_url, url
+    слоты       slots пар (hash u64, offset u64), offset 0 - пустой слот
+
+Хеш-таблица с открытой адресацией и линейным пробированием,
+заполнена не больше чем наполовину.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import time
+from typing import Optional
+
+from src.core.config import settings
+from src.db.compression import UrlCodec
+from src.schemas.common import LinkRecord
+
+
+MAGIC = b"BZCI"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIQ")
+_RECORD = struct.Struct("<qqqHHI")
+_SLOT = struct.Struct("<QQ")
+
+
+def _code_hash(code: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(code, digest_size=8).digest(), "little")
+
+
+def _slot_count(records: int) -> int:
+    slots = 8
+    while slots < records * 2:
+        slots *= 2
+    return slots
+
+
+def build_code_index(conn: sqlite3.Connection, path: str, codec: Optional[UrlCodec] = None) -> int:
+    """
+    Собрать индекс действующих ссылок из conn в файл path, вернуть число записей.
+    Файл пишется рядом и подменяется атомарно
+    """
+    if codec is None:
+        codec = UrlCodec(None, level=settings.URL_COMPRESSION_LEVEL, enabled=True)
+        codec.reload(conn)
+
+    rows = conn.execute(
+        """
+        SELECT short_code, short_url, original_url, dict_version, COALESCE(clicks, 0),
+               CAST(strftime('%s', created_at) AS INTEGER) * 1000,
+               CAST(strftime('%s', expires_at) AS INTEGER) * 1000
+        FROM urls LEFT JOIN url_clicks ON url_clicks.link_id = urls.id
+        WHERE expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP
+        ORDER BY id
+        """
+    )
+
+    tmp_path = f"{path}.tmp"
+    entries = []
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        offset = _HEADER.size
+        for code, short_url, stored, version, clicks, created_at, expires_at in rows:
+            code_b = code.encode()
+            short_b = short_url.encode()
+            url_b = codec.decode(stored, version).encode()
+            record = _RECORD.pack(
+                clicks or 0, created_at or 0, expires_at or 0, len(code_b), len(short_b), len(url_b)
+            )
+            f.write(record + code_b + short_b + url_b)
+            entries.append((_code_hash(code_b), offset))
+            offset += len(record) + len(code_b) + len(short_b) + len(url_b)
+
+        slots = _slot_count(len(entries))
+        table = [(0, 0)] * slots
+        for code_hash, record_offset in entries:
+            slot = code_hash & (slots - 1)
+            while table[slot][1]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = (code_hash, record_offset)
+
+        slots_offset = offset
+        for code_hash, record_offset in table:
+            f.write(_SLOT.pack(code_hash, record_offset))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, len(entries), slots, slots_offset))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class CodeIndex:
+    """Поиск ссылки по short_code в mmap-файле индекса"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, self.records, self.slots, self._slots_offset = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: не индекс кодов версии {VERSION}")
+        self._mask = self.slots - 1
+
+    def _find(self, code: bytes) -> Optional[int]:
+        code_hash = _code_hash(code)
+        slot = code_hash & self._mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(self._mmap, self._slots_offset + slot * _SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == code_hash:
+                code_len = _RECORD.unpack_from(self._mmap, offset)[3]
+                start = offset + _RECORD.size
+                # Сравнение по memoryview, без копирования из mmap
+                if self._view[start:start + code_len] == code:
+                    return offset
+            slot = (slot + 1) & self._mask
+
+    def get(self, short_code: str) -> Optional[LinkRecord]:
+        """Ссылка по коду или None, если кода нет или ссылка истекла"""
+        offset = self._find(short_code.encode())
+        if offset is None:
+            return None
+        clicks, created_at, expires_at, code_len, short_len, url_len = _RECORD.unpack_from(
+            self._mmap, offset
+        )
+        if expires_at and expires_at <= time.time() * 1000:
+            return None
+        start = offset + _RECORD.size + code_len
+        short_url = str(self._view[start:start + short_len], "utf-8")
+        start += short_len
+        original_url = str(self._view[start:start + url_len], "utf-8")
+        return LinkRecord(short_code, short_url, original_url, clicks, created_at or None, expires_at or None)
+
+    def __len__(self) -> int:
+        return self.records
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+
+code_index: Optional[CodeIndex] = CodeIndex(settings.CODE_INDEX_PATH) if settings.CODE_INDEX_PATH else None
@@ -0,0 +1,179 @@
+"""
+Сжатие original_url словарем zstd.
+
+Словарь обучается на выборке сохраненных ссылок и хранится в таблице
+url_dictionaries с номером версии. В urls.original_url лежит либо текст
+(dict_version IS NULL), либо сжатые байты, а urls.dict_version указывает
+словарь для распаковки. Поиск по ссылке идет через urls.url_hash,
+поэтому сжатое значение никогда не сравнивается с исходным текстом.
+
+Пакет zstandard необязателен (extra "compression"): без него ссылки
+хранятся без сжатия. Если же в базе уже есть сжатые строки, запуск без
+пакета останавливается с ошибкой (check_stored), а не падает на переходе.
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+from src.db.session import get_db
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+
+StoredUrl = Union[str, bytes]
+
+MISSING_ZSTD = (
+    "В базе есть ссылки, сжатые словарем zstd, а пакет zstandard не установлен. "
+    "Установите его: poetry install -E compression"
+)
+
+
+class UrlCodec:
+    """Прозрачное сжатие ссылок на границе UrlInfoDbClient"""
+
+    def __init__(self, db_path: Optional[str], level: int, enabled: bool):
+        self.db_path = db_path
+        self.level = level
+        self.enabled = enabled
+        self.current_version: Optional[int] = None
+        self._dicts: Dict[int, "zstd.ZstdCompressionDict"] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Компрессоры zstd не потокобезопасны: свои экземпляры у каждого потока
+        self._local = threading.local()
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and zstd is not None
+
+    def reload(self, conn: Optional[sqlite3.Connection] = None):
+        """Перечитать словари из url_dictionaries"""
+        if zstd is None:
+            return
+        if conn is None:
+            with get_db(self.db_path) as own_conn:
+                return self.reload(own_conn)
+
+        rows = conn.execute("SELECT version, dictionary FROM url_dictionaries ORDER BY version")
+        dicts = {}
+        for version, data in rows:
+            dictionary = self._dicts.get(version)
+            if dictionary is None:
+                dictionary = zstd.ZstdCompressionDict(data)
+                dictionary.precompute_compress(level=self.level)
+            dicts[version] = dictionary
+        with self._lock:
+            self._dicts = dicts
+            self.current_version = max(dicts) if dicts else None
+            self._local = threading.local()
+            self._loaded = True
+
+    def check_stored(self, conn: sqlite3.Connection):
+        """RuntimeError при запуске, если сжатые ссылки нечем распаковать"""
+        if zstd is not None:
+            return
+        if conn.execute("SELECT 1 FROM url_dictionaries LIMIT 1").fetchone() is None:
+            return
+        if conn.execute("SELECT 1 FROM urls WHERE dict_version IS NOT NULL LIMIT 1").fetchone():
+            raise RuntimeError(MISSING_ZSTD)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def _compressor(self, version: int) -> "zstd.ZstdCompressor":
+        compressors = self._local.__dict__.setdefault("compressors", {})
+        compressor = compressors.get(version)
+        if compressor is None:
+            compressor = compressors[version] = zstd.ZstdCompressor(
+                level=self.level,
+                dict_data=self._dicts[version],
+                write_checksum=False,
+                write_dict_id=False,
+            )
+        return compressor
+
+    def _decompressor(self, version: int) -> "zstd.ZstdDecompressor":
+        decompressors = self._local.__dict__.setdefault("decompressors", {})
+        decompressor = decompressors.get(version)
+        if decompressor is None:
+            decompressor = decompressors[version] = zstd.ZstdDecompressor(
+                dict_data=self._dicts[version]
+            )
+        return decompressor
+
+    def encode(self, url: str) -> Tuple[StoredUrl, Optional[int]]:
+        """Значение для urls.original_url и версия словаря (None - без сжатия)"""
+        if not self.available:
+            return url, None
+        self._ensure_loaded()
+        version = self.current_version
+        if version is None:
+            return url, None
+
+        raw = url.encode()
+        compressed = self._compressor(version).compress(raw)
+        self.raw_bytes += len(raw)
+        if len(compressed) >= len(raw):
+            self.stored_bytes += len(raw)
+            return url, None
+        self.stored_bytes += len(compressed)
+        return compressed, version
+
+    def decode(self, value: StoredUrl, version: Optional[int]) -> str:
+        """Исходная ссылка из urls.original_url"""
+        if version is None:
+            return value
+        if zstd is None:
+            raise RuntimeError(MISSING_ZSTD)
+        started = time.perf_counter()
+        if version not in self._dicts:
+            # Словарь мог быть обучен другим процессом
+            self.reload()
+        url = self._decompressor(version).decompress(value).decode()
+        Metrics.observe("url_codec.decode_seconds", time.perf_counter() - started)
+        return url
+
+    def compression_ratio(self) -> float:
+        """Отношение исходного размера к сохраненному для ссылок, сжатых процессом"""
+        return self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+    def train(self, samples: List[str], dict_size: int) -> bytes:
+        """Обучить словарь на выборке ссылок (CPU, без обращения к базе)"""
+        if zstd is None:
+            raise RuntimeError("Пакет zstandard не установлен")
+        dictionary = zstd.train_dictionary(dict_size, [s.encode() for s in samples])
+        return dictionary.as_bytes()
+
+    @staticmethod
+    def store_dictionary(conn: sqlite3.Connection, data: bytes, sample_size: int) -> int:
+        """Сохранить словарь новой версией, вернуть номер версии"""
+        cursor = conn.execute(
+            """
+            INSERT INTO url_dictionaries (dictionary, sample_size, created_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            """,
+            (data, sample_size)
+        )
+        LogManager.sync_log_database_info(
+            "Сохранен словарь сжатия ссылок", {"version": cursor.lastrowid, "size": len(data)}
+        )
+        return cursor.lastrowid
+
+
+url_codec = UrlCodec(
+    settings.DB_PATH,
+    level=settings.URL_COMPRESSION_LEVEL,
+    enabled=settings.URL_COMPRESSION_ENABLED,
+)
+
+Metrics.register_gauge("url_codec.compression_ratio", url_codec.compression_ratio)
@@ -0,0 +1,63 @@
+import asyncio
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.periodic import PeriodicTask
+from src.db.clients.lite_client import UrlInfoDbClient
+from src.utils.time import now_ms
+
+
+class ExpiredUrlReaper(PeriodicTask):
+    """
+    Фоновая задача удаления просроченных ссылок.
+
+    Удаляет строки небольшими пачками через индекс по expires_at
+    и делает паузу между пачками, чтобы не держать блокировку
+    записи дольше одной короткой транзакции.
+    """
+
+    name = "reaper"
+
+    def __init__(self, interval: float, batch_size: int, pause: float, enabled: bool = True):
+        super().__init__(interval, enabled)
+        self.batch_size = batch_size
+        self.pause = pause
+
+    async def run_once(self):
+        await self.reap()
+
+    async def reap(self) -> int:
+        """Удалить все просроченные ссылки, вернуть количество удаленных"""
+        total = 0
+        while True:
+            deleted = await UrlInfoDbClient.delete_expired(self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+
+        if total:
+            LogManager.sync_log_database_info("Удалены просроченные ссылки", {"count": total})
+
+        await self.prune_tombstones()
+        return total
+
+    async def prune_tombstones(self) -> int:
+        """Удалить tombstone-записи старше срока хранения синхронизации"""
+        retention_ms = settings.SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 3600 * 1000
+        deleted_before = now_ms() - retention_ms
+        total = 0
+        while True:
+            deleted = await UrlInfoDbClient.delete_tombstones_before(deleted_before, self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                return total
+            await asyncio.sleep(self.pause)
+
+
+url_reaper = ExpiredUrlReaper(
+    interval=settings.REAPER_INTERVAL_SECONDS,
+    batch_size=settings.REAPER_BATCH_SIZE,
+    pause=settings.REAPER_BATCH_PAUSE_SECONDS,
+    enabled=settings.REAPER_ENABLED,
+)
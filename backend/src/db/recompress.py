@@ -0,0 +1,91 @@
+import asyncio
+from typing import Optional
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.periodic import PeriodicTask
+from src.db.clients.lite_client import UrlInfoDbClient
+from src.db.compression import UrlCodec, url_codec
+from src.db.writer import db_writer
+
+
+class RecompressionJob(PeriodicTask):
+    """
+    Фоновое сжатие ссылок.
+
+    Обучает первый словарь, когда в базе набирается достаточно ссылок,
+    и пачками пережимает строки без сжатия или со старым словарем
+    текущей версией словаря
+    """
+
+    name = "recompress"
+
+    def __init__(self, interval: float, batch_size: int, pause: float, enabled: bool = True):
+        super().__init__(interval, enabled)
+        self.batch_size = batch_size
+        self.pause = pause
+
+    async def run_once(self):
+        if not url_codec.available:
+            return
+        await asyncio.to_thread(url_codec.reload)
+        if url_codec.current_version is None:
+            await self.train(min_samples=settings.URL_COMPRESSION_MIN_SAMPLES)
+        await self.recompress()
+
+    async def train(self, min_samples: int = 1) -> Optional[int]:
+        """Обучить новый словарь на последних ссылках и сделать его текущим"""
+        samples = await asyncio.to_thread(
+            UrlInfoDbClient.sample_urls, settings.URL_COMPRESSION_SAMPLE_SIZE
+        )
+        if len(samples) < min_samples:
+            return None
+
+        data = await asyncio.to_thread(
+            url_codec.train, samples, settings.URL_COMPRESSION_DICT_SIZE
+        )
+        version = await db_writer.submit(
+            lambda conn: UrlCodec.store_dictionary(conn, data, len(samples))
+        )
+        await asyncio.to_thread(url_codec.reload)
+        return version
+
+    async def recompress(self) -> int:
+        """Пережать все строки текущим словарем, вернуть число обновленных"""
+        version = url_codec.current_version
+        if version is None:
+            return 0
+
+        total = 0
+        after_id = 0
+        while True:
+            rows = await asyncio.to_thread(
+                UrlInfoDbClient.get_recompress_batch, after_id, version, self.batch_size
+            )
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            updates = []
+            for link_id, stored, old_version in rows:
+                value, new_version = url_codec.encode(url_codec.decode(stored, old_version))
+                if new_version != old_version:
+                    updates.append((value, new_version, link_id, old_version))
+            if updates:
+                total += await UrlInfoDbClient.update_stored_urls(updates)
+            await asyncio.sleep(self.pause)
+
+        if total:
+            LogManager.sync_log_database_info(
+                "Ссылки пережаты словарем",
+                {"version": version, "count": total, "ratio": url_codec.compression_ratio()},
+            )
+        return total
+
+
+recompression_job = RecompressionJob(
+    interval=settings.RECOMPRESS_INTERVAL_SECONDS,
+    batch_size=settings.RECOMPRESS_BATCH_SIZE,
+    pause=settings.REAPER_BATCH_PAUSE_SECONDS,
+    enabled=settings.URL_COMPRESSION_ENABLED,
+)
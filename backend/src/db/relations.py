@@ -0,0 +1,79 @@
+"""
+Выборочная загрузка связей пользователя для GET /auth.
+
+Каждая связь грузится одним запросом WHERE user_id IN (...) сразу для всех
+запрошенных пользователей, поэтому число запросов равно 1 + числу
+запрошенных связей и не зависит ни от числа пользователей, ни от
+количества связанных строк.
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Связь -> таблица ее строк. Поля записи хранятся в data (JSON)
+RELATION_TABLES: Dict[str, str] = {
+    "routes": "user_routes",
+    "trains": "user_trains",
+    "stations": "user_stations",
+    "notes": "user_notes",
+    "settings": "user_settings",
+}
+
+USER_RELATIONS: Tuple[str, ...] = tuple(RELATION_TABLES)
+
+
+def parse_relations(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Разбирает параметр fields=routes,notes.
+    Пустое значение означает все связи, неизвестное имя - ValueError
+    """
+    if not fields:
+        return USER_RELATIONS
+
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in USER_RELATIONS]
+    if unknown:
+        raise ValueError(
+            f"Неизвестные связи: {', '.join(unknown)}. Доступны: {', '.join(USER_RELATIONS)}"
+        )
+    return requested
+
+
+def create_relation_tables(conn: sqlite3.Connection):
+    """Таблицы связей с индексом (user_id, id) для выборки по списку пользователей"""
+    for table in RELATION_TABLES.values():
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                data TEXT NOT NULL DEFAULT '{{}}',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id, id)")
+
+
+def load_relations(
+    conn: sqlite3.Connection, user_ids: Iterable[int], relations: Tuple[str, ...]
+) -> Dict[int, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Связи relations для всех user_ids: по одному запросу на связь.
+    У пользователя без строк связь - пустой список
+    """
+    ids = list(user_ids)
+    loaded = {user_id: {name: [] for name in relations} for user_id in ids}
+    for name in relations:
+        cursor = conn.execute(
+            f"""
+            SELECT id, user_id, data FROM {RELATION_TABLES[name]}
+            WHERE user_id IN (SELECT value FROM json_each(?))
+            ORDER BY user_id, id
+            """,
+            (json.dumps(ids),)
+        )
+        for id, user_id, data in cursor:
+            loaded[user_id][name].append({**json.loads(data), "id": id})
+    return loaded
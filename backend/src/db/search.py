@@ -0,0 +1,150 @@
+"""
+Поиск коротких ссылок по подстроке original_url.
+
+Индекс url_search - таблица FTS5 с токенизатором trigram (rowid = urls.id),
+поэтому запрос "example.com/path" ищет подстроку по индексу триграмм,
+а не LIKE '%...%' по всей таблице. Подстрока должна быть не короче
+трех символов, регистр не важен.
+
+- новые ссылки индексирует process в той же транзакции, что и вставку;
+- удаление ссылки убирает ее из индекса триггером trg_urls_search_delete;
+- ссылки, записанные в обход process (массовый импорт, база до появления
+  индекса), дописывает фоновая задача SearchBackfill небольшими пачками.
+"""
+import asyncio
+import sqlite3
+from typing import List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.periodic import PeriodicTask
+from src.db.compression import url_codec
+from src.db.session import get_db
+from src.db.writer import db_writer
+
+
+BACKFILL_STATE_KEY = "search_backfill"
+
+_available: Optional[bool] = None
+
+
+def search_available(conn: sqlite3.Connection) -> bool:
+    """Есть ли в базе индекс url_search (нет, если SQLite без FTS5)"""
+    global _available
+    if _available is None:
+        _available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'url_search'"
+        ).fetchone() is not None
+    return _available
+
+
+def fts_query(text: str) -> str:
+    """Подстрока -> фраза FTS5: кавычки экранируются, операторы не работают"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def index_link(conn: sqlite3.Connection, link_id: int, url: str):
+    """Добавить ссылку в индекс, если ее там еще нет (внутри транзакции записи)"""
+    if not search_available(conn):
+        return
+    conn.execute(
+        """
+        INSERT INTO url_search (rowid, url)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM url_search WHERE rowid = ?)
+        """,
+        (link_id, url, link_id)
+    )
+
+
+class SearchBackfill(PeriodicTask):
+    """
+    Дописывает в индекс ссылки, которых в нем нет. Позиция (максимальный
+    проверенный id) хранится в import_state, поэтому после догоняющего
+    прохода каждый запуск смотрит только новые строки
+    """
+
+    name = "search_backfill"
+
+    def __init__(self, interval: float, batch_size: int, pause: float, enabled: bool = True):
+        super().__init__(interval, enabled)
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def _pending(self) -> Tuple[int, List[tuple], int]:
+        """(позиция, пачка непроиндексированных строк, max(urls.id))"""
+        with get_db(settings.DB_PATH) as conn:
+            if not search_available(conn):
+                return 0, [], 0
+            state = conn.execute(
+                "SELECT value FROM import_state WHERE key = ?", (BACKFILL_STATE_KEY,)
+            ).fetchone()
+            after = state[0] if state else 0
+            # Граница читается первой: строки, вставленные позже, попадут в следующий проход
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM urls").fetchone()[0]
+            rows = conn.execute(
+                """
+                SELECT id, original_url, dict_version
+                FROM urls
+                WHERE id > ? AND id <= ?
+                  AND id NOT IN (SELECT rowid FROM url_search WHERE rowid > ?)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (after, max_id, after, self.batch_size)
+            ).fetchall()
+        return after, [tuple(row) for row in rows], max_id
+
+    async def _write(self, rows: List[Tuple[int, str]], position: int):
+        def op(conn: sqlite3.Connection):
+            # Строка могла быть удалена после чтения: ее триггер уже отработал
+            conn.executemany(
+                """
+                INSERT INTO url_search (rowid, url)
+                SELECT ?1, ?2
+                WHERE EXISTS (SELECT 1 FROM urls WHERE id = ?1)
+                  AND NOT EXISTS (SELECT 1 FROM url_search WHERE rowid = ?1)
+                """,
+                rows
+            )
+            conn.execute(
+                """
+                INSERT INTO import_state (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = max(value, excluded.value)
+                """,
+                (BACKFILL_STATE_KEY, position)
+            )
+
+        await db_writer.submit(op)
+
+    async def backfill(self) -> int:
+        """Проиндексировать все пропущенные ссылки, вернуть их число"""
+        total = 0
+        while True:
+            after, rows, max_id = await asyncio.to_thread(self._pending)
+            if not rows:
+                if max_id > after:
+                    await self._write([], max_id)
+                break
+            decoded = [(link_id, url_codec.decode(stored, version)) for link_id, stored, version in rows]
+            # Неполная пачка - проверены все строки до max_id
+            position = rows[-1][0] if len(rows) == self.batch_size else max_id
+            await self._write(decoded, position)
+            total += len(rows)
+            if len(rows) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+
+        if total:
+            LogManager.sync_log_database_info("Ссылки добавлены в поисковый индекс", {"count": total})
+        return total
+
+    async def run_once(self):
+        await self.backfill()
+
+
+search_backfill = SearchBackfill(
+    interval=settings.SEARCH_BACKFILL_INTERVAL_SECONDS,
+    batch_size=settings.SEARCH_BACKFILL_BATCH_SIZE,
+    pause=settings.SEARCH_BACKFILL_PAUSE_SECONDS,
+    enabled=settings.SEARCH_BACKFILL_ENABLED,
+)
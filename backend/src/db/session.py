@@ -1,34 +1,520 @@
 import sqlite3
+import threading
 from src.core.log_manager import LogManager
 from src.core.config import settings
+from src.core.metrics import Metrics
+from src.db.relations import create_relation_tables
+from src.utils.generators import url_digest
 from contextlib import contextmanager
 
 
+# Число открытых через get_db соединений (для /admin/memory)
+_open_connections = 0
+_open_connections_lock = threading.Lock()
+
+
+def _track_connection(delta: int):
+    global _open_connections
+    with _open_connections_lock:
+        _open_connections += delta
+
 
 @contextmanager
-def get_db(db_path: str):
-    conn = sqlite3.connect(db_path)
+def get_db(db_path: str, check_same_thread: bool = True):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
+    _track_connection(1)
     try:
         yield conn
     finally:
         LogManager.sync_log_database_error("Соединенние с бд закрыто")
         conn.close()
+        _track_connection(-1)
 
-async def on_startup():
-    LogManager.sync_log_database_info("Инициализация базы данных")
-    db_path = settings.DB_PATH
-    with get_db(db_path) as conn:
+
+Metrics.register_gauge("sqlite.open_connections", lambda: _open_connections)
+
+
+# Вторичные индексы urls. Массовый импорт удаляет их и строит заново
+# после вставки, init_schema восстанавливает их при старте приложения
+SECONDARY_INDEXES = {
+    "idx_urls_short_code": "CREATE INDEX IF NOT EXISTS idx_urls_short_code ON urls (short_code)",
+    # Порядок выдачи изменений для синхронизации
+    "idx_urls_updated_at": "CREATE INDEX IF NOT EXISTS idx_urls_updated_at ON urls (updated_at, id)",
+    # Отбор по дате создания (массовое удаление, выдача по created_at)
+    "idx_urls_created_at": "CREATE INDEX IF NOT EXISTS idx_urls_created_at ON urls (created_at)",
+    # Частичный индекс: бессрочные ссылки в него не попадают
+    "idx_urls_expires_at": """
+        CREATE INDEX IF NOT EXISTS idx_urls_expires_at
+        ON urls (expires_at)
+        WHERE expires_at IS NOT NULL
+    """,
+}
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set:
+    """Возвращает множество имен колонок таблицы"""
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+# Текущее время в миллисекундах (как dt_to_ms) средствами SQLite
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Счетчики переходов отдельно от широкой строки urls: клик переписывает
+# одну короткую запись, а не страницу с длинными ссылками.
+# clicked_at (мс) - время последнего клика для ленты изменений синхронизации
+URL_CLICKS_DDL = """
+    CREATE TABLE IF NOT EXISTS url_clicks (
+        link_id INTEGER PRIMARY KEY,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        clicked_at INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+# AUTOINCREMENT: id удаленной ссылки никогда не достается новой, иначе клиент
+# синхронизации получил бы tombstone и другую ссылку с тем же id.
+# original_url без UNIQUE: уникальность держит idx_urls_url_hash, а второй
+# уникальный индекс по широкой (возможно, сжатой) колонке только занимал место
+URLS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        original_url TEXT NOT NULL,
+        short_code TEXT NOT NULL,
+        short_url TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        expires_at DATETIME DEFAULT NULL,
+        updated_at INTEGER NOT NULL DEFAULT 0,
+        url_hash BLOB,
+        dict_version INTEGER DEFAULT NULL
+    )
+"""
+
+
+URL_TOMBSTONES_DDL = """
+    CREATE TABLE IF NOT EXISTS url_tombstones (
+        id INTEGER PRIMARY KEY,
+        link_id INTEGER NOT NULL,
+        short_code TEXT NOT NULL,
+        deleted_at INTEGER NOT NULL
+    )
+"""
+
+# Часы изменений для синхронизации: строго возрастающая отметка, близкая
+# к текущему времени в мс (updated_at, clicked_at, deleted_at). Отметка
+# берется внутри транзакции записи, а пишущие транзакции SQLite идут
+# по одной во всех процессах, поэтому отметки растут в порядке коммитов
+# и строка не может появиться ниже уже выданного клиенту watermark
+SYNC_CLOCK_DDL = """
+    CREATE TABLE IF NOT EXISTS sync_clock (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last INTEGER NOT NULL
+    )
+"""
+NEXT_STAMP_SQL = f"UPDATE sync_clock SET last = max(last + 1, {NOW_MS_SQL}) WHERE id = 1"
+
+
+def next_change_stamp(conn: sqlite3.Connection) -> int:
+    """Следующая отметка часов изменений (только внутри транзакции записи)"""
+    return conn.execute(NEXT_STAMP_SQL + " RETURNING last").fetchone()[0]
+
+
+# Пользователи (src.api.v1.auth). version растет при каждом изменении строки:
+# по нему воркеры замечают, что закэшированный снимок пользователя устарел
+USERS_DDL = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        login TEXT NOT NULL UNIQUE,
+        email TEXT UNIQUE,
+        vk_id TEXT UNIQUE,
+        hashed_password TEXT,
+        version INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def _migrate_urls_to_integer_id(conn: sqlite3.Connection):
+    """
+    Пересоздает urls со стабильным целочисленным id и updated_at (мс).
+    Старая схема использовала original_url как первичный ключ
+    """
+    columns = _column_names(conn, "urls")
+    if "expires_at" not in columns:
+        conn.execute("ALTER TABLE urls ADD COLUMN expires_at DATETIME DEFAULT NULL")
+
+    LogManager.sync_log_database_info("Миграция urls: целочисленный id и updated_at")
+    conn.execute("SAVEPOINT migrate_urls")
+    try:
+        conn.execute(URLS_DDL.format(name="urls_new"))
+        conn.execute(
+            """
+            INSERT INTO urls_new
+            (original_url, short_code, short_url, created_at, expires_at, updated_at)
+            SELECT original_url, short_code, short_url, created_at, expires_at,
+                   COALESCE(CAST(strftime('%s', created_at) AS INTEGER) * 1000, 0)
+            FROM urls
+            ORDER BY created_at
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO url_clicks (link_id, clicks)
+            SELECT urls_new.id, urls.clicks
+            FROM urls JOIN urls_new ON urls_new.original_url = urls.original_url
+            WHERE urls.clicks > 0
+            """
+        )
+        conn.execute("DROP TABLE urls")
+        conn.execute("ALTER TABLE urls_new RENAME TO urls")
+    except BaseException:
+        conn.execute("ROLLBACK TO migrate_urls")
+        conn.execute("RELEASE migrate_urls")
+        raise
+    conn.execute("RELEASE migrate_urls")
+
+
+def _migrate_urls_compression(conn: sqlite3.Connection):
+    """
+    Колонки для сжатия ссылок: url_hash (ключ поиска) и dict_version.
+    Заполняет url_hash для строк, сохраненных до появления колонки
+    """
+    columns = _column_names(conn, "urls")
+    if "url_hash" not in columns:
+        conn.execute("ALTER TABLE urls ADD COLUMN url_hash BLOB")
+    if "dict_version" not in columns:
+        conn.execute("ALTER TABLE urls ADD COLUMN dict_version INTEGER DEFAULT NULL")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS url_dictionaries (
+            version INTEGER PRIMARY KEY,
+            dictionary BLOB NOT NULL,
+            sample_size INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+    while True:
+        rows = conn.execute(
+            "SELECT id, original_url FROM urls WHERE url_hash IS NULL LIMIT 10000"
+        ).fetchall()
+        if not rows:
+            break
+        # До появления url_hash ссылки хранились только текстом
+        conn.executemany(
+            "UPDATE urls SET url_hash = ? WHERE id = ?",
+            [(url_digest(row[1]), row[0]) for row in rows]
+        )
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_urls_url_hash ON urls (url_hash)")
+
+
+def _rebuild_urls(conn: sqlite3.Connection):
+    """
+    Пересоздает urls по текущему URLS_DDL с теми же id и данными.
+    Триггеры и индексы таблицы удаляются вместе с ней, init_schema
+    создает их заново. Счетчик AUTOINCREMENT начинается выше всех id,
+    которые уже были выданы, включая удаленные (url_tombstones)
+    """
+    LogManager.sync_log_database_info("Миграция urls: пересоздание таблицы по текущей схеме")
+    columns = ", ".join(sorted(_column_names(conn, "urls")))
+    triggers = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'urls'"
+        )
+    ]
+    conn.execute("SAVEPOINT rebuild_urls")
+    try:
+        for trigger in triggers:
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute(URLS_DDL.format(name="urls_new"))
+        conn.execute(f"INSERT INTO urls_new ({columns}) SELECT {columns} FROM urls")
+        conn.execute("DROP TABLE urls")
+        conn.execute("ALTER TABLE urls_new RENAME TO urls")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_urls_url_hash ON urls (url_hash)")
+        conn.execute(
+            """
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'urls', 0 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'urls')
+            """
+        )
+        conn.execute(
+            """
+            UPDATE sqlite_sequence
+            SET seq = max(seq, COALESCE((SELECT MAX(link_id) FROM url_tombstones), 0))
+            WHERE name = 'urls'
+            """
+        )
+    except BaseException:
+        conn.execute("ROLLBACK TO rebuild_urls")
+        conn.execute("RELEASE rebuild_urls")
+        raise
+    conn.execute("RELEASE rebuild_urls")
+
+
+def _urls_needs_rebuild(conn: sqlite3.Connection) -> bool:
+    """Таблица urls создана старой схемой: без AUTOINCREMENT или с UNIQUE на original_url"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'urls'").fetchone()
+    if "AUTOINCREMENT" not in row[0].upper():
+        return True
+    # origin = 'u' - индекс ограничения UNIQUE из CREATE TABLE
+    return conn.execute(
+        "SELECT 1 FROM pragma_index_list('urls') WHERE origin = 'u'"
+    ).fetchone() is not None
+
+
+def _migrate_urls_clicks(conn: sqlite3.Connection):
+    """Переносит счетчики из колонки urls.clicks в url_clicks и удаляет колонку"""
+    if "clicks" not in _column_names(conn, "urls"):
+        return
+
+    LogManager.sync_log_database_info("Миграция urls: счетчики переходов в url_clicks")
+    conn.execute("SAVEPOINT migrate_clicks")
+    try:
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS urls (
-                original_url TEXT PRIMARY KEY,
-                short_code TEXT NOT NULL,
-                short_url TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                clicks INT NOT NULL DEFAULT 0
-            )
+            INSERT OR IGNORE INTO url_clicks (link_id, clicks)
+            SELECT id, clicks FROM urls WHERE clicks > 0
+            """
+        )
+        conn.execute("ALTER TABLE urls DROP COLUMN clicks")
+    except BaseException:
+        conn.execute("ROLLBACK TO migrate_clicks")
+        conn.execute("RELEASE migrate_clicks")
+        raise
+    conn.execute("RELEASE migrate_clicks")
+
+
+def init_schema(conn: sqlite3.Connection):
+    """Создает таблицы и индексы, докатывает миграции"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.execute(URL_CLICKS_DDL)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_url_clicks_clicked_at ON url_clicks (clicked_at, link_id)"
+    )
+    # Удаленные ссылки для синхронизации мобильных клиентов
+    conn.execute(URL_TOMBSTONES_DDL)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_url_tombstones_deleted_at "
+        "ON url_tombstones (deleted_at, id)"
+    )
+    if "urls" in tables and "id" not in _column_names(conn, "urls"):
+        _migrate_urls_to_integer_id(conn)
+    conn.execute(URLS_DDL.format(name="urls"))
+    _migrate_urls_compression(conn)
+    _migrate_urls_clicks(conn)
+    if _urls_needs_rebuild(conn):
+        _rebuild_urls(conn)
+
+    conn.execute(SYNC_CLOCK_DDL)
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO sync_clock (id, last)
+        SELECT 1, max(
+            COALESCE((SELECT MAX(updated_at) FROM urls), 0),
+            COALESCE((SELECT MAX(clicked_at) FROM url_clicks), 0),
+            COALESCE((SELECT MAX(deleted_at) FROM url_tombstones), 0)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_urls_clicks_delete
+        AFTER DELETE ON urls
+        BEGIN
+            DELETE FROM url_clicks WHERE link_id = OLD.id;
+        END
+        """
+    )
+    # Истекшая ссылка, замененная новой (process), начинает счет заново
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_urls_clicks_reset
+        AFTER UPDATE OF short_code ON urls
+        WHEN NEW.short_code IS NOT OLD.short_code
+        BEGIN
+            DELETE FROM url_clicks WHERE link_id = NEW.id;
+        END
+        """
+    )
+
+    # Отметка удаления - из часов изменений; прежняя версия триггера брала время
+    trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_urls_tombstone'"
+    ).fetchone()
+    if trigger and "sync_clock" not in trigger[0]:
+        conn.execute("DROP TRIGGER trg_urls_tombstone")
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_urls_tombstone
+        AFTER DELETE ON urls
+        BEGIN
+            {NEXT_STAMP_SQL};
+            INSERT INTO url_tombstones (link_id, short_code, deleted_at)
+            VALUES (OLD.id, OLD.short_code, (SELECT last FROM sync_clock WHERE id = 1));
+        END
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+
+    # Коды ссылок, перенесенных в архив (src.db.archive): новая ссылка не получает
+    # такой код, иначе старая короткая ссылка открывала бы чужой адрес.
+    # url_hash - ссылка лежит в архиве: /shorten и импорт проверяют архив только тогда
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_codes (
+            short_code TEXT PRIMARY KEY,
+            link_id INTEGER NOT NULL,
+            url_hash BLOB
+        ) WITHOUT ROWID
+        """
+    )
+    if "url_hash" not in _column_names(conn, "archived_codes"):
+        conn.execute("ALTER TABLE archived_codes ADD COLUMN url_hash BLOB")
+        # Коды уже зарезервированы без хешей: reserve_archived_codes дополнит их
+        conn.execute("DELETE FROM import_state WHERE key = 'archive:codes_reserved'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_codes_hash ON archived_codes (url_hash)")
+
+    # Архивный код, ссылка которого уже была в urls под другим кодом: код
+    # открывает ту ссылку без обращения к архиву. Удаление ссылки или замена
+    # ее кода освобождает такие коды
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS code_aliases (
+            short_code TEXT PRIMARY KEY,
+            link_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_code_aliases_link ON code_aliases (link_id)")
+    for name, event in (
+        ("trg_urls_aliases_delete", "AFTER DELETE ON urls"),
+        ("trg_urls_aliases_reset", "AFTER UPDATE OF short_code ON urls WHEN NEW.short_code IS NOT OLD.short_code"),
+    ):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name}
+            {event}
+            BEGIN
+                DELETE FROM archived_codes
+                WHERE short_code IN (SELECT short_code FROM code_aliases WHERE link_id = OLD.id);
+                DELETE FROM code_aliases WHERE link_id = OLD.id;
+            END
             """
         )
-        conn.commit()
-    LogManager.sync_log_database_info("Успех")
\ No newline at end of file
+
+    # Задания массового удаления (src.services.bulk_delete): состояние видно
+    # всем воркерам, pid - процесс, который выполняет задание
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bulk_delete_jobs (
+            id TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            running INTEGER NOT NULL,
+            error TEXT,
+            stats TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL
+        )
+        """
+    )
+
+    # Снимки статистики по доменам (src.services.domain_stats)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS domain_stats (
+            kind TEXT PRIMARY KEY,
+            width INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            sketch BLOB NOT NULL,
+            top TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(USERS_DDL)
+    create_relation_tables(conn)
+    create_search_index(conn)
+    create_secondary_indexes(conn)
+    conn.commit()
+
+
+def create_search_index(conn: sqlite3.Connection) -> bool:
+    """
+    Полнотекстовый индекс ссылок (src.db.search): FTS5 с триграммами,
+    rowid = urls.id. Текст хранится в индексе несжатым, потому что
+    original_url в urls может быть сжата словарем. Возвращает False,
+    если SQLite собран без FTS5 или старше 3.34 (нет trigram)
+    """
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS url_search USING fts5(url, tokenize = 'trigram')"
+        )
+    except sqlite3.OperationalError as e:
+        LogManager.sync_log_database_error(f"Поиск по ссылкам недоступен: {e}")
+        return False
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_urls_search_delete
+        AFTER DELETE ON urls
+        BEGIN
+            DELETE FROM url_search WHERE rowid = OLD.id;
+        END
+        """
+    )
+    return True
+
+
+def create_secondary_indexes(conn: sqlite3.Connection):
+    """Создает вторичные индексы таблицы urls"""
+    for ddl in SECONDARY_INDEXES.values():
+        conn.execute(ddl)
+
+
+def drop_secondary_indexes(conn: sqlite3.Connection):
+    """Удаляет вторичные индексы (перед массовой вставкой)"""
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+async def on_startup():
+    LogManager.sync_log_database_info("Инициализация базы данных")
+    db_path = settings.DB_PATH
+    # Импорт здесь: архив и модуль сжатия сами зависят от этого модуля
+    from src.db.archive import reserve_archived_codes
+    from src.db.compression import url_codec
+
+    with get_db(db_path) as conn:
+        init_schema(conn)
+        url_codec.check_stored(conn)
+        reserve_archived_codes(conn)
+    LogManager.sync_log_database_info("Успех")
+    warm_link_cache()
+
+
+def warm_link_cache():
+    """Загрузить в кэш ссылки из снимка, сохраненного при прошлой остановке"""
+    # Импорт здесь: клиенты и кэш сами зависят от этого модуля
+    from src.db.clients.lite_client import UrlInfoDbClient
+    from src.services.link_cache import link_cache
+
+    if len(link_cache):
+        # Уже прогрет в мастере prefork-сервера (src.server) и унаследован воркером
+        return
+    codes = link_cache.load_snapshot()
+    if not codes:
+        return
+    records = UrlInfoDbClient.get_many_by_code(codes)
+    link_cache.warm(records)
+    LogManager.sync_log_database_info(
+        "Кэш ссылок прогрет", {"requested": len(codes), "loaded": len(records)}
+    )
@@ -0,0 +1,179 @@
+import asyncio
+import sqlite3
+import time
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+
+
+R = TypeVar("R")
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+
+class DbWriter:
+    """
+    Единственный писатель базы в процессе.
+
+    Все изменения ставятся в очередь в виде функций op(conn). Фоновая задача
+    забирает все накопившиеся операции, выполняет их в одной транзакции
+    (group commit) и после COMMIT возвращает каждому вызывающему его результат.
+    Каждая операция выполняется внутри SAVEPOINT, поэтому ошибка одной
+    операции не откатывает остальные операции пачки.
+
+    Операции не должны сами вызывать commit/rollback.
+    """
+
+    def __init__(self, db_path: str, max_batch: int):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE удаляет старую строку: триггер должен записать tombstone
+        conn.execute("PRAGMA recursive_triggers=ON")
+        return conn
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._conn = self._connect()
+        self._queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Дописывает уже поставленные операции и закрывает соединение"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._conn.close()
+        self._conn = None
+
+    async def submit(self, op: Callable[[sqlite3.Connection], R]) -> R:
+        """Выполнить операцию записи и дождаться ее коммита"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if not self.running or loop is not self._loop:
+            # Писатель не запущен в этом цикле событий (CLI, скрипты, тесты)
+            return await asyncio.to_thread(self._execute_single, op)
+
+        future = loop.create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    def submit_sync(self, op: Callable[[sqlite3.Connection], R]) -> R:
+        """
+        Синхронный submit для кода в других потоках (asyncio.to_thread):
+        операция попадает в общую очередь писателя и ждет коммита
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self.running and loop is not self._loop:
+            return asyncio.run_coroutine_threadsafe(self.submit(op), self._loop).result()
+        return self._execute_single(op)
+
+    def _execute_single(self, op: Callable[[sqlite3.Connection], R]) -> R:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = op(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+        finally:
+            conn.close()
+
+    def _commit_batch(self, ops: List[WriteOp]) -> List[Tuple[bool, Any]]:
+        """Выполняет пачку операций в одной транзакции (в отдельном потоке)"""
+        conn = self._conn
+        results: List[Tuple[bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in ops:
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    value = op(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    results.append((False, e))
+                else:
+                    conn.execute("RELEASE write_op")
+                    results.append((True, value))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            LogManager.sync_log_database_error(f"Ошибка групповой записи: {e}")
+            return [(False, e)] * len(ops)
+        return results
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            started = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(self._commit_batch, [op for op, _ in batch])
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            Metrics.observe("db_writer.batch_size", len(batch))
+            Metrics.observe("db_writer.commit_seconds", time.perf_counter() - started)
+            Metrics.inc("db_writer.commits")
+
+            for (_, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+        # Операции, попавшие в очередь после сигнала остановки
+        while not self._queue.empty():
+            op, future = self._queue.get_nowait()
+            try:
+                future.set_result(await asyncio.to_thread(self._execute_single, op))
+            except Exception as e:
+                future.set_exception(e)
+
+
+db_writer = DbWriter(settings.DB_PATH, settings.DB_WRITER_MAX_BATCH)
+Metrics.register_gauge("db_writer.connections", lambda: int(db_writer._conn is not None))
@@ -5,6 +5,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from src.api import routers
 from src.core.config import settings
 from src.db.session import on_startup
+from src.db.archive import link_archiver
+from src.db.reaper import url_reaper
+from src.db.backup import backup_scheduler
+from src.db.recompress import recompression_job
+from src.db.search import search_backfill
+from src.services.bulk_delete import bulk_delete_jobs
+from src.services.domain_stats import domain_stats_persister
+from src.services.hashing import password_hasher
+from src.services.link_cache import dump_link_cache
+from src.services.memory import memory_watch, start_memory_tracing
+from src.services.traffic_capture import start_traffic_capture, stop_traffic_capture
+from src.db.writer import db_writer
 from src.core.log_manager import LogManager
 
 from src.api.exception_handlers import setup_exception_handlers
@@ -30,7 +42,33 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"])
 
 setup_exception_handlers(app)
 
-app.add_event_handler("startup", on_startup)
+if not settings.CODE_INDEX_PATH:
+    # В режиме только чтения (CODE_INDEX_PATH) SQLite и фоновые задачи не запускаются
+    app.add_event_handler("startup", on_startup)
+    app.add_event_handler("startup", db_writer.start)
+    app.add_event_handler("startup", url_reaper.start)
+    app.add_event_handler("startup", recompression_job.start)
+    app.add_event_handler("startup", domain_stats_persister.start)
+    app.add_event_handler("startup", backup_scheduler.start)
+    app.add_event_handler("startup", search_backfill.start)
+    app.add_event_handler("startup", link_archiver.start)
+    app.add_event_handler("shutdown", dump_link_cache)
+    app.add_event_handler("shutdown", bulk_delete_jobs.stop)
+    app.add_event_handler("shutdown", link_archiver.stop)
+    app.add_event_handler("shutdown", search_backfill.stop)
+    app.add_event_handler("shutdown", backup_scheduler.stop)
+    app.add_event_handler("shutdown", domain_stats_persister.stop)
+    app.add_event_handler("shutdown", recompression_job.stop)
+    app.add_event_handler("shutdown", url_reaper.stop)
+    app.add_event_handler("shutdown", db_writer.stop)
+
+app.add_event_handler("startup", start_memory_tracing)
+app.add_event_handler("startup", memory_watch.start)
+app.add_event_handler("shutdown", memory_watch.stop)
+app.add_event_handler("startup", start_traffic_capture)
+app.add_event_handler("shutdown", stop_traffic_capture)
+app.add_event_handler("shutdown", password_hasher.shutdown)
+app.add_event_handler("shutdown", LogManager.flush_suppressed)
 
 
 app.include_router(routers.api_router)
\ No newline at end of file
@@ -1,8 +1,12 @@
+import sys
 from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel
 from pydantic.generics import GenericModel
 from datetime import datetime
 
+from src.utils.generators import SHORT_URL_SUFFIX, build_short_url
+from src.utils.time import ms_to_datetime, now_ms
+
 
 DataType = TypeVar("DataType")
 
@@ -27,11 +31,92 @@ class RawDocument(BaseModel):
 
 
 class UrlInfo(BaseModel):
+    id: int | None = None
     short_url: str
     short_code: str
     original_url: str
     created_at: datetime | None = None
     clicks: int = 0
+    expires_at: datetime | None = None
+    updated_at: int | None = None
 
     class Config: 
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class User(BaseModel):
+    """Пользователь из таблицы users"""
+    id: int
+    login: str
+    email: str | None = None
+    vk_id: str | None = None
+    hashed_password: str | None = None
+    version: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class LinkRecord:
+    """
+    Компактная запись ссылки для пути база -> кэш -> обработчик.
+
+    Без __dict__ и валидации pydantic: время хранится в миллисекундах UTC,
+    а short_url вида build_short_url(base_url, код) не хранится - только
+    общий для всех ссылок хоста (интернированный) base_url
+    """
+
+    __slots__ = ("id", "short_code", "original_url", "clicks", "created_ms", "expires_ms", "_base_url", "_short_url")
+
+    def __init__(
+        self,
+        short_code: str,
+        short_url: str,
+        original_url: str,
+        clicks: int = 0,
+        created_ms: Optional[int] = None,
+        expires_ms: Optional[int] = None,
+        id: Optional[int] = None,
+    ):
+        self.id = id
+        self.short_code = short_code
+        self.original_url = original_url
+        self.clicks = clicks
+        self.created_ms = created_ms
+        self.expires_ms = expires_ms
+        base_url = short_url[:len(short_url) - len(short_code) - 1 - len(SHORT_URL_SUFFIX)]
+        if short_url == build_short_url(base_url, short_code):
+            # У всех ссылок одного хоста base_url - один и тот же объект строки
+            self._base_url = sys.intern(base_url)
+            self._short_url = None
+        else:
+            self._base_url = None
+            self._short_url = short_url
+
+    @property
+    def short_url(self) -> str:
+        if self._base_url is None:
+            return self._short_url
+        return build_short_url(self._base_url, self.short_code)
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        return ms_to_datetime(self.created_ms)
+
+    @property
+    def expires_at(self) -> Optional[datetime]:
+        return ms_to_datetime(self.expires_ms)
+
+    def is_expired(self, now: Optional[int] = None) -> bool:
+        return self.expires_ms is not None and self.expires_ms <= (now if now is not None else now_ms())
+
+    def with_clicks(self, clicks: int) -> "LinkRecord":
+        """Копия записи с другим числом кликов"""
+        record = LinkRecord.__new__(LinkRecord)
+        for name in LinkRecord.__slots__:
+            setattr(record, name, getattr(self, name))
+        record.clicks = clicks
+        return record
+
+    def __repr__(self) -> str:
+        return f"LinkRecord(short_code={self.short_code!r}, original_url={self.original_url!r}, clicks={self.clicks})"
@@ -1,5 +1,6 @@
 import uuid as uuid_pkg
-from pydantic import BaseModel, Field, HttpUrl, Field
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel, Field, HttpUrl, Field, model_validator
 from typing import Literal, List, Optional
 
 
@@ -12,4 +13,78 @@ class ShortenRequest(BaseModel):
         ...,
         description="Полная ссылка для сокращения", 
         example="https://example.com/very/long/path?query=param"
-        )
\ No newline at end of file
+        )
+    ttl_seconds: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Время жизни ссылки в секундах",
+    )
+    expires_at: Optional[datetime] = Field(
+        None,
+        description="Момент истечения ссылки; без часового пояса считается UTC",
+    )
+
+    @model_validator(mode="after")
+    def check_expiry(self) -> "ShortenRequest":
+        if self.ttl_seconds is not None and self.expires_at is not None:
+            raise ValueError("Укажите либо ttl_seconds, либо expires_at")
+        expires_at = self.resolve_expires_at()
+        if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+            raise ValueError("expires_at должен быть в будущем")
+        return self
+
+    def resolve_expires_at(self) -> Optional[datetime]:
+        """Абсолютный момент истечения в UTC или None для бессрочной ссылки"""
+        if self.ttl_seconds is not None:
+            return datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        if self.expires_at is not None and self.expires_at.tzinfo is None:
+            return self.expires_at.replace(tzinfo=timezone.utc)
+        return self.expires_at
+
+
+class BulkDeleteRequest(BaseModel):
+    """
+    Условия массового удаления ссылок; заданные условия объединяются через AND
+    """
+
+    domain: Optional[str] = Field(
+        None, min_length=3, description="Домен назначения", example="spam.example"
+    )
+    include_subdomains: bool = Field(False, description="Вместе с поддоменами domain")
+    url_prefix: Optional[str] = Field(
+        None, min_length=3, description="Начало ссылки", example="https://example.com/promo/"
+    )
+    created_from: Optional[datetime] = Field(None, description="Созданы не раньше (UTC)")
+    created_to: Optional[datetime] = Field(None, description="Созданы раньше (UTC)")
+    dry_run: bool = Field(False, description="Только посчитать подходящие ссылки")
+    restart: bool = Field(False, description="Игнорировать сохраненную позицию")
+
+
+class UserCredentials(BaseModel):
+    """Учетные данные для входа"""
+
+    auth_param: str = Field(..., description="Логин или email, в зависимости от methodAuth")
+    password: str = Field(..., min_length=1)
+    methodAuth: str = Field("login", description="Метод аутентификации: login или email")
+
+
+class UserRegister(BaseModel):
+    """Данные для регистрации"""
+
+    login: str = Field(..., min_length=3, max_length=64)
+    password: str = Field(..., min_length=8)
+    email: Optional[str] = Field(None, min_length=3, max_length=254)
+    vkId: Optional[str] = Field(None, description="Токен vkId для привязки")
+
+
+class emailAdd(BaseModel):
+    email: str = Field(..., min_length=3, max_length=254)
+    password: Optional[str] = Field(None, description="Пароль для входа по email")
+
+
+class emailUpdate(BaseModel):
+    email: str = Field(..., min_length=3, max_length=254)
+
+
+class tokenAdd(BaseModel):
+    token: str = Field(..., min_length=1, description="Токен vkId")
@@ -4,6 +4,8 @@ from typing import Optional, List, Dict, Union, Any
 import uuid as uuid_pkg
 import json
 
+from src.schemas.common import UrlInfo
+
 
 
 class ShortenResponse(BaseModel):
@@ -24,8 +26,139 @@ class ShortenResponse(BaseModel):
         ...,
         decription="Оригинальная ссылка как пришла"
     )
+    expires_at: Optional[datetime] = Field(
+        None,
+        description="Момент истечения ссылки (UTC), если задан срок жизни"
+    )
+
+
+class TokenResponse(BaseModel):
+    success: bool = True
+    access_token: str
+    token_type: str = "bearer"
+
+
+class SuccessResponse(BaseModel):
+    status_code: int = 200
+    content: str
+
+
+class UserResponse(BaseModel):
+    """Публичные поля пользователя"""
+    id: int
+    login: str
+    email: Optional[str] = None
+    vk_id: Optional[str] = None
+
+
+class UserWithRelationsResponse(BaseModel):
+    """Профиль пользователя; связи, которые не запрашивали, равны None"""
+    user: UserResponse
+    routes: Optional[List[Dict[str, Any]]] = None
+    trains: Optional[List[Dict[str, Any]]] = None
+    stations: Optional[List[Dict[str, Any]]] = None
+    notes: Optional[List[Dict[str, Any]]] = None
+    settings: Optional[List[Dict[str, Any]]] = None
 
 
 class ErrorResponse(BaseModel):
     detail: str
-    error_code: str | None = None
\ No newline at end of file
+    error_code: str | None = None
+
+
+class SyncTombstone(BaseModel):
+    """Удаленная ссылка"""
+    id: int = Field(..., description="id удаленной ссылки")
+    short_code: str
+    deleted_at: int = Field(..., description="Момент удаления, мс")
+
+
+class SyncResponse(BaseModel):
+    """
+    Страница изменений для синхронизации.
+    Пока has_more=true, следующая страница запрашивается с cursor,
+    после последней страницы watermark передается как since
+    """
+    items: List[UrlInfo] = []
+    deleted: List[SyncTombstone] = []
+    cursor: Optional[str] = None
+    has_more: bool = False
+    watermark: int = Field(..., description="Позиция синхронизации, мс")
+
+
+
+class DomainCount(BaseModel):
+    """Домен из top-K: истинное значение лежит в [count - error, count]"""
+    host: str
+    count: int
+    error: int
+
+
+class DomainStatsBounds(BaseModel):
+    """Гарантии точности для текущего числа событий"""
+    total: int = Field(..., description="Всего событий этого вида")
+    sketch_epsilon: float = Field(..., description="e / ширина скетча")
+    sketch_delta: float = Field(..., description="Вероятность превысить границу оценки")
+    sketch_max_overestimate: float = Field(
+        ..., description="С вероятностью 1 - delta оценка завышена не больше чем на epsilon * total"
+    )
+    top_k: int
+    top_max_error: float = Field(..., description="Максимальная ошибка счетчика top-K: total / k")
+
+
+class DomainTopResponse(BaseModel):
+    kind: str
+    items: List[DomainCount] = []
+    bounds: DomainStatsBounds
+
+
+class DomainEstimateResponse(BaseModel):
+    kind: str
+    host: str
+    estimate: int = Field(..., description="Оценка сверху числа событий домена")
+    bounds: DomainStatsBounds
+
+
+class HotLink(BaseModel):
+    """Ссылка из top-N окна: истинное число просмотров в [hits - error, hits]"""
+    short_code: str
+    hits: int
+    error: int
+
+
+class HotLinksResponse(BaseModel):
+    window: str
+    total: int = Field(..., description="Всего просмотров за окно")
+    items: List[HotLink] = []
+
+
+class SearchHit(BaseModel):
+    """Ссылка, найденная по подстроке original_url"""
+    id: int
+    short_code: str
+    short_url: str
+    original_url: str
+    clicks: int = 0
+    rank: float = Field(..., description="bm25: чем меньше, тем релевантнее")
+
+
+class SearchResponse(BaseModel):
+    """Страница результатов поиска; следующая запрашивается с cursor, пока has_more=true"""
+    items: List[SearchHit] = []
+    cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class BulkDeleteStatus(BaseModel):
+    """Состояние массового удаления; для dry_run - только подсчет"""
+    job_id: Optional[str] = None
+    running: bool = False
+    done: bool = False
+    error: Optional[str] = None
+    scanned: int = Field(0, description="Просмотрено кандидатов")
+    matched: int = Field(0, description="Подошло под условия")
+    deleted: int = 0
+    chunks: int = 0
+    position: int = Field(0, description="Чекпоинт: последний просмотренный id")
+    resumed_from: int = 0
+    sample: List[str] = Field([], description="Примеры подходящих ссылок (dry_run)")
@@ -0,0 +1,330 @@
+"""
+Prefork-сервер: приложение загружается один раз, воркеры получают его fork'ом.
+
+    python -m src.server --workers 4 --port 8000
+
+Мастер импортирует src.main, проверяет схему базы, загружает словари
+сжатия, шаблоны Jinja и прогревает кэш ссылок, затем замораживает кучу
+(gc.freeze) и запускает WEB_CONCURRENCY воркеров uvicorn. Все, что
+загружено до fork, воркеры делят с мастером по copy-on-write, поэтому
+общая память растет медленнее, чем при N независимых процессах.
+
+Воркеры слушают один сокет, открытый мастером. С --reuse-port
+(SERVER_REUSE_PORT) каждый воркер открывает свой сокет с SO_REUSEPORT,
+и соединения между воркерами распределяет ядро.
+
+Сигналы мастеру:
+    SIGHUP          поочередный перезапуск воркеров: новый воркер
+                    запускается, и только когда он готов, старый получает
+                    SIGTERM. Новый воркер - fork того же мастера с уже
+                    загруженным приложением, поэтому SIGHUP лечит утечки и
+                    зависшие воркеры, но не подхватывает новый код и
+                    переменные окружения: для них сервер перезапускается
+                    целиком (SIGTERM и новый запуск);
+    SIGTERM/SIGINT  плавная остановка: воркеры дообрабатывают запросы и
+                    выполняют shutdown-обработчики (снимок кэша ссылок,
+                    статистика доменов, подавленные логи, writer), по
+                    истечении SERVER_GRACEFUL_TIMEOUT_SECONDS - SIGKILL.
+
+Упавший воркер перезапускается. Если новый воркер не поднялся, его номер
+остается в списке недостающих, и мастер повторяет запуск с растущей
+паузой (до RESPAWN_MAX_DELAY секунд), пока воркер не поднимется.
+Периодические задачи обслуживания
+(reaper, пересжатие, резервные копии, индексация для поиска, архив)
+работают только в воркере 0, остальные задачи и буферы у каждого воркера
+свои. Статистику доменов сохраняет каждый воркер: он прибавляет к общему
+итогу в базе свое приращение (src.services.domain_stats).
+"""
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional, Set
+
+import uvicorn
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+
+
+ENDPOINT = "server"
+# Пауза перед повторным запуском не поднявшегося воркера, удваивается до RESPAWN_MAX_DELAY
+RESPAWN_MIN_DELAY = 1.0
+RESPAWN_MAX_DELAY = 30.0
+
+
+def preload():
+    """Импорт и прогрев приложения в мастере, до fork"""
+    from src.api.v1.page import templates
+    from src.db.compression import url_codec
+    from src.db.session import get_db, init_schema, warm_link_cache
+    from src.main import app
+
+    if not settings.CODE_INDEX_PATH:
+        with get_db(settings.DB_PATH) as conn:
+            init_schema(conn)
+            url_codec.check_stored(conn)
+        if url_codec.available:
+            url_codec.reload()
+        warm_link_cache()
+    templates.get_template("link_stats.html")
+    # Загруженные объекты больше не трогает сборщик мусора, и их страницы
+    # не копируются в воркерах из-за обновления заголовков объектов
+    gc.freeze()
+    return app
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn.Server, сообщающий мастеру о готовности через pipe"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class Arbiter:
+    """Мастер-процесс: запуск, перезапуск и остановка воркеров"""
+
+    def __init__(
+        self,
+        app,
+        host: str,
+        port: int,
+        workers: int,
+        reuse_port: bool = False,
+        graceful_timeout: float = 30.0,
+        ready_timeout: float = 30.0,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.sock: Optional[socket.socket] = None
+        # pid -> номер воркера
+        self.children: Dict[int, int] = {}
+        # Номера воркеров, которые нужно запустить заново
+        self.missing: Set[int] = set()
+        self._respawn_delay = 0.0
+        self._respawn_at = 0.0
+        self._signal_r = self._signal_w = -1
+
+    def spawn(self, index: int) -> Optional[int]:
+        """Запустить воркер и дождаться его готовности; None, если он не поднялся"""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self._run_worker(index, ready_w)
+        os.close(ready_w)
+        try:
+            readable, _, _ = select.select([ready_r], [], [], self.ready_timeout)
+            ready = bool(readable) and os.read(ready_r, 1) == b"1"
+        finally:
+            os.close(ready_r)
+        if not ready:
+            LogManager.sync_log_network_error(
+                ENDPOINT, "Воркер не запустился", {"pid": pid, "index": index}
+            )
+            self._terminate(pid)
+            return None
+        self.children[pid] = index
+        LogManager.sync_log_network_info(ENDPOINT, "Воркер запущен", {"pid": pid, "index": index})
+        return pid
+
+    def _run_worker(self, index: int, ready_fd: int):
+        """Тело дочернего процесса; из функции не возвращается"""
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            os.close(self._signal_r)
+            os.close(self._signal_w)
+            if index:
+                disable_maintenance()
+            sock = self.sock or bind_socket(self.host, self.port, reuse_port=True)
+            config = uvicorn.Config(
+                self.app, lifespan="on", log_config=None,
+                timeout_graceful_shutdown=self.graceful_timeout,
+            )
+            _WorkerServer(config, ready_fd).run(sockets=[sock])
+        except BaseException as e:
+            code = 1
+            LogManager.sync_log_network_error(
+                ENDPOINT, f"Воркер завершился с ошибкой: {e}", {"pid": os.getpid()}
+            )
+        finally:
+            # Буферы логов сбрасываются до _exit, atexit в дочернем процессе не вызывается
+            logging.shutdown()
+            os._exit(code)
+
+    def _terminate(self, pid: int) -> int:
+        """SIGTERM воркеру и ожидание его выхода, по таймауту - SIGKILL"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                return os.waitstatus_to_exitcode(status)
+            time.sleep(0.05)
+        LogManager.sync_log_network_error(ENDPOINT, "Воркер не остановился вовремя", {"pid": pid})
+        os.kill(pid, signal.SIGKILL)
+        return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+    def reload(self):
+        """
+        Поочередный перезапуск: в каждый момент работает не меньше workers
+        воркеров. Код приложения не перезагружается (см. описание модуля)
+        """
+        LogManager.sync_log_network_info(ENDPOINT, "Поочередный перезапуск воркеров")
+        for old_pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+            if old_pid not in self.children:
+                continue
+            if self.spawn(index) is None:
+                LogManager.sync_log_network_error(ENDPOINT, "Перезапуск прерван, старые воркеры оставлены")
+                return
+            del self.children[old_pid]
+            self._terminate(old_pid)
+
+    def stop(self):
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.children):
+            self._terminate(pid)
+        self.children.clear()
+        LogManager.sync_log_network_info(ENDPOINT, "Сервер остановлен")
+
+    def _reap(self, stopping: bool):
+        """Подобрать завершившиеся воркеры; их номера перезапускает _respawn"""
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            index = self.children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            LogManager.sync_log_network_error(
+                ENDPOINT, "Воркер завершился",
+                {"pid": pid, "index": index, "code": os.waitstatus_to_exitcode(status)},
+            )
+            self.missing.add(index)
+
+    def _respawn(self):
+        """Запустить недостающие воркеры; после неудачи следующая попытка - с удвоенной паузой"""
+        if not self.missing or time.monotonic() < self._respawn_at:
+            return
+        for index in sorted(self.missing):
+            if self.spawn(index) is None:
+                self._respawn_delay = min(max(self._respawn_delay * 2, RESPAWN_MIN_DELAY), RESPAWN_MAX_DELAY)
+                self._respawn_at = time.monotonic() + self._respawn_delay
+                return
+            self.missing.discard(index)
+        self._respawn_delay = 0.0
+
+    def run(self) -> int:
+        self._signal_r, self._signal_w = os.pipe()
+        os.set_blocking(self._signal_r, False)
+        os.set_blocking(self._signal_w, False)
+        signal.set_wakeup_fd(self._signal_w)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, lambda *_: None)
+
+        if not self.reuse_port:
+            self.sock = bind_socket(self.host, self.port, reuse_port=False)
+        LogManager.sync_log_network_info(
+            ENDPOINT, "Запуск сервера",
+            {"pid": os.getpid(), "address": f"{self.host}:{self.port}", "workers": self.workers},
+        )
+        for index in range(self.workers):
+            if self.spawn(index) is None:
+                self.stop()
+                return 1
+
+        while True:
+            select.select([self._signal_r], [], [], 1.0)
+            try:
+                received = set(os.read(self._signal_r, 64))
+            except BlockingIOError:
+                received = set()
+            if received & {signal.SIGTERM, signal.SIGINT}:
+                self.stop()
+                return 0
+            self._reap(stopping=False)
+            self._respawn()
+            if signal.SIGHUP in received:
+                self.reload()
+
+
+def disable_maintenance():
+    """
+    Задачи обслуживания базы нужны в одном экземпляре, а не в каждом воркере.
+    domain_stats_persister сюда не входит намеренно: он сохраняет приращение
+    своего воркера, и без него события воркера терялись бы
+    """
+    from src.db.archive import link_archiver
+    from src.db.backup import backup_scheduler
+    from src.db.reaper import url_reaper
+    from src.db.recompress import recompression_job
+    from src.db.search import search_backfill
+
+    for task in (url_reaper, recompression_job, backup_scheduler, search_backfill, link_archiver):
+        task.enabled = False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.server", description="Prefork-сервер приложения")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    parser.add_argument(
+        "--reuse-port", action="store_true", default=settings.SERVER_REUSE_PORT,
+        help="Отдельный сокет с SO_REUSEPORT у каждого воркера",
+    )
+    args = parser.parse_args(argv)
+
+    arbiter = Arbiter(
+        preload(),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reuse_port=args.reuse_port,
+        graceful_timeout=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        ready_timeout=settings.SERVER_READY_TIMEOUT_SECONDS,
+    )
+    return arbiter.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+JWT доступа (HMAC, алгоритм settings.ALGORITHM) и проверка учетных данных.
+
+Токен подписывается SECRET_KEY; без ключа роутер /auth не подключается
+(src.api.routers). В sub лежит id пользователя из таблицы users.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from src.core.config import settings
+from src.db.clients.user_client import UserDbClient
+from src.schemas.common import User
+from src.services.hashing import password_hasher, verify_legacy_password_sync
+
+
+_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: str) -> bytes:
+    digest = _DIGESTS.get(settings.ALGORITHM)
+    if digest is None:
+        raise RuntimeError(f"Неподдерживаемый алгоритм JWT: {settings.ALGORITHM}")
+    if not settings.SECRET_KEY:
+        raise RuntimeError("SECRET_KEY не задан")
+    return hmac.new(settings.SECRET_KEY.encode(), signing_input.encode(), digest).digest()
+
+
+def _unauthorized(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def create_access_token(data: Dict[str, Any], expires_in: Optional[float] = None) -> str:
+    """JWT с claims data и сроком действия (по умолчанию ACCESS_TOKEN_EXPIRE_MINUTES)"""
+    if expires_in is None:
+        expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    header = {"alg": settings.ALGORITHM, "typ": "JWT"}
+    claims = {**data, "exp": int(time.time() + expires_in)}
+    signing_input = ".".join(
+        _b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims)
+    )
+    return f"{signing_input}.{_b64encode(_sign(signing_input))}"
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Claims токена после проверки подписи и срока действия, иначе 401"""
+    try:
+        header_part, claims_part, signature = token.split(".")
+        header = json.loads(_b64decode(header_part))
+        claims = json.loads(_b64decode(claims_part))
+        valid = header.get("alg") == settings.ALGORITHM and hmac.compare_digest(
+            _b64decode(signature), _sign(f"{header_part}.{claims_part}")
+        )
+    except (ValueError, AttributeError):
+        raise _unauthorized() from None
+    if not valid or not isinstance(claims, dict):
+        raise _unauthorized()
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] <= time.time():
+        raise _unauthorized("Token expired")
+    return claims
+
+
+async def get_current_user(token: str) -> User:
+    """Пользователь из проверенного токена; 401, если токен невалиден или пользователя нет"""
+    claims = decode_access_token(token)
+    try:
+        user_id = int(claims.get("sub"))
+    except (TypeError, ValueError):
+        raise _unauthorized() from None
+    user = UserDbClient.get_by_id(user_id)
+    if user is None:
+        raise _unauthorized()
+    return user
+
+
+async def verify_password(password: str, hashed: Optional[str]) -> bool:
+    """
+    Проверка пароля в пуле процессов password_hasher, вне цикла событий.
+    Хеши bcrypt старой схемы проверяются там же
+    """
+    if not hashed:
+        return False
+    return await password_hasher.verify(password, hashed, legacy_verify=verify_legacy_password_sync)
+
+
+async def authenticate_user(auth_param: str, password: str, method_auth: str) -> User:
+    """
+    Пользователь по логину (method_auth="login") или email ("email") и паролю.
+    ValueError - неизвестный метод, 401 - неверные учетные данные
+    """
+    if method_auth == "login":
+        user = UserDbClient.get_by_login(auth_param)
+    elif method_auth == "email":
+        user = UserDbClient.get_by_email(auth_param)
+    else:
+        raise ValueError("Invalid authentication method")
+
+    if user is None or not await verify_password(password, user.hashed_password):
+        raise _unauthorized("Incorrect login or password")
+    return user
@@ -0,0 +1,196 @@
+"""
+Фоновые массовые удаления, запущенные через /admin/links/delete.
+
+Задание идентифицируется ключом условий (DeleteCriteria.key), поэтому
+повторный запуск с теми же условиями возвращает уже идущее задание,
+а после перезапуска процесса продолжает удаление с чекпоинта.
+
+Задание выполняется в том воркере, который принял запрос, а его
+состояние пишется в таблицу bulk_delete_jobs при запуске, после каждой
+пачки и по завершении. Поэтому GET /admin/links/delete/{job_id} отвечает
+из любого воркера, а запуск тех же условий в другом воркере не создает
+второе задание. Задание, процесс которого завершился (pid), считается
+прерванным: повторный запрос продолжает его с чекпоинта.
+
+Коды удаленных ссылок сбрасываются из link_cache этого процесса.
+В других воркерах запись кэша истекает через LINK_CACHE_TTL_SECONDS
+(переходы ее не продлевают), а просмотр удаленной ссылки отвечает 404
+сразу: клик не засчитывается, и запись сбрасывается.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Set
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.db.bulk_delete import BulkDelete, BulkDeleteStats, DeleteCriteria
+from src.db.search import search_backfill
+from src.db.session import get_db
+from src.db.writer import db_writer
+from src.services.link_cache import link_cache
+from src.utils.time import now_ms
+
+
+INTERRUPTED = "Задание прервано вместе с процессом; повторите запрос с теми же условиями"
+
+
+@dataclass
+class BulkDeleteJob:
+    id: str
+    deleter: BulkDelete
+    task: Optional[asyncio.Task] = None
+    error: Optional[str] = None
+    # Номер последнего сохраненного состояния: запись не затирается более старой
+    version: int = 0
+    saving: Set[asyncio.Task] = field(default_factory=set)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+def _alive(pid: int) -> bool:
+    """Процесс pid на этом хосте еще работает"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _stats(stats: BulkDeleteStats) -> Dict[str, Any]:
+    data = asdict(stats)
+    data.pop("sample")
+    return data
+
+
+class BulkDeleteJobs:
+    """Задания массового удаления: выполняемые этим процессом и сохраненные в базе"""
+
+    def __init__(self, db_path: str = settings.DB_PATH):
+        self.db_path = db_path
+        self._jobs: Dict[str, BulkDeleteJob] = {}
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Состояние задания (поля BulkDeleteStatus) или None"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return {"job_id": job.id, "running": job.running, "error": job.error, **_stats(job.deleter.stats)}
+
+        with get_db(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT pid, running, error, stats FROM bulk_delete_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        stats = json.loads(row["stats"])
+        running = bool(row["running"]) and _alive(row["pid"])
+        error = row["error"]
+        if row["running"] and not running and error is None:
+            error = INTERRUPTED
+        return {"job_id": job_id, **stats, "running": running, "error": error}
+
+    async def start(self, criteria: DeleteCriteria, restart: bool = False) -> str:
+        """Запустить удаление или вернуть id уже идущего с теми же условиями"""
+        job_id = criteria.key.split(":", 1)[1]
+        job = self._jobs.get(job_id)
+        if job is not None and job.running:
+            return job_id
+
+        deleter = BulkDelete(criteria, on_deleted=link_cache.discard)
+        job = BulkDeleteJob(job_id, deleter)
+        pid = os.getpid()
+        initial = json.dumps(_stats(deleter.stats))
+
+        def claim(conn: sqlite3.Connection) -> bool:
+            row = conn.execute(
+                "SELECT pid, running FROM bulk_delete_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is not None and row["running"] and row["pid"] != pid and _alive(row["pid"]):
+                # Те же условия уже удаляет другой воркер
+                return False
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO bulk_delete_jobs (id, pid, running, error, stats, version, updated_at)
+                VALUES (?, ?, 1, NULL, ?, 0, ?)
+                """,
+                (job_id, pid, initial, now_ms())
+            )
+            return True
+
+        if not await db_writer.submit(claim):
+            return job_id
+        deleter.progress = lambda stats: self._save_soon(job)
+        self._jobs[job_id] = job
+        job.task = asyncio.create_task(self._run(job, restart))
+        return job_id
+
+    def _save_op(self, job: BulkDeleteJob):
+        job.version += 1
+        params = (
+            int(job.running), job.error, json.dumps(_stats(job.deleter.stats)), job.version, now_ms(),
+            job.id, os.getpid(), job.version,
+        )
+
+        def op(conn: sqlite3.Connection):
+            conn.execute(
+                """
+                UPDATE bulk_delete_jobs
+                SET running = ?, error = ?, stats = ?, version = ?, updated_at = ?
+                WHERE id = ? AND pid = ? AND version < ?
+                """,
+                params
+            )
+
+        return op
+
+    def _save_soon(self, job: BulkDeleteJob):
+        """Сохранить состояние после пачки, не задерживая удаление"""
+        task = asyncio.create_task(db_writer.submit(self._save_op(job)))
+        job.saving.add(task)
+        task.add_done_callback(job.saving.discard)
+
+    async def _run(self, job: BulkDeleteJob, restart: bool):
+        try:
+            if job.deleter.uses_search:
+                # Ссылки, вставленные в обход process, должны попасть в индекс до отбора
+                await search_backfill.backfill()
+            await job.deleter.run(restart=restart)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.error = str(e)
+            LogManager.sync_log_database_error(f"Ошибка массового удаления ссылок: {e}", params={"job": job.id})
+        finally:
+            await self._save_final(job)
+
+    async def _save_final(self, job: BulkDeleteJob):
+        # Задача еще не завершена, поэтому running здесь сохранился бы как 1
+        op = self._save_op(job)
+
+        def final(conn: sqlite3.Connection):
+            op(conn)
+            conn.execute("UPDATE bulk_delete_jobs SET running = 0 WHERE id = ? AND pid = ?", (job.id, os.getpid()))
+
+        try:
+            await asyncio.gather(*job.saving, return_exceptions=True)
+            await db_writer.submit(final)
+        except Exception as e:
+            LogManager.sync_log_database_error(
+                f"Не удалось сохранить состояние массового удаления: {e}", params={"job": job.id}
+            )
+
+    async def stop(self):
+        """Прервать идущие задания: позиция уже сохранена, удаление продолжится при следующем запуске"""
+        tasks = [job.task for job in self._jobs.values() if job.running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+bulk_delete_jobs = BulkDeleteJobs()
@@ -0,0 +1,404 @@
+"""
+Статистика по доменам назначения без GROUP BY по urls.
+
+Для каждого вида событий (links - созданные ссылки, clicks - переходы
+и просмотры статистики) хранятся:
+
+- Count-Min Sketch ширины w и глубины d: оценка числа событий любого
+  домена. Оценка никогда не меньше истинного значения и с вероятностью
+  не ниже 1 - e^-d превышает его не больше чем на e / w * N,
+  где N - общее число событий;
+- Space-Saving на k счетчиков: k самых частых доменов. Для каждого
+  хранится count и error, истинное значение лежит в [count - error, count],
+  а error не больше N / k. Любой домен с долей больше 1 / k гарантированно
+  попадает в список.
+
+Обновление стоит O(d) для скетча, O(1) для известного домена в
+Space-Saving и амортизированно O(log k) при вытеснении; ответ не зависит
+от числа ссылок.
+
+Обе структуры складываются: скетчи - построчно, Space-Saving - с учетом
+минимального счетчика каждой стороны (SpaceSaving.merge). Поэтому каждый
+воркер копит только приращение с прошлого сохранения и раз в
+DOMAIN_STATS_PERSIST_SECONDS прибавляет его к таблице domain_stats
+внутри транзакции записи, а затем перечитывает общий итог. Ответы
+воркера - итог из таблицы плюс его еще не сохраненное приращение:
+события других воркеров видны с задержкой не больше интервала сохранения.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import math
+import operator
+import sqlite3
+import struct
+from array import array
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.periodic import PeriodicTask
+from src.db.session import get_db
+from src.db.writer import db_writer
+from src.utils.time import now_ms
+
+
+KINDS = ("links", "clicks")
+
+
+def url_host(url: str) -> Optional[str]:
+    """Домен назначения ссылки в нижнем регистре"""
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+class CountMinSketch:
+    """Count-Min Sketch с d строками по w счетчиков"""
+
+    def __init__(self, width: int, depth: int):
+        if not 1 <= depth <= 16:
+            raise ValueError("depth должен быть от 1 до 16")
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+        self._unpack = struct.Struct(f"<{depth}I").unpack
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        return [h % self.width for h in self._unpack(digest)]
+
+    def add(self, key: str, count: int = 1):
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += count
+        self.total += count
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def merge(self, other: "CountMinSketch"):
+        """Прибавить скетч тех же размеров"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Скетчи разных размеров не складываются")
+        for row, other_row in zip(self._rows, other._rows):
+            row[:] = array("q", map(operator.add, row, other_row))
+        self.total += other.total
+
+    def copy(self) -> "CountMinSketch":
+        return CountMinSketch.from_bytes(self.to_bytes(), self.width, self.depth, self.total)
+
+    @property
+    def epsilon(self) -> float:
+        return math.e / self.width
+
+    @property
+    def delta(self) -> float:
+        return math.exp(-self.depth)
+
+    def to_bytes(self) -> bytes:
+        return b"".join(row.tobytes() for row in self._rows)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, width: int, depth: int, total: int) -> "CountMinSketch":
+        sketch = cls(width, depth)
+        size = 8 * width
+        for i, row in enumerate(sketch._rows):
+            row[:] = array("q", data[i * size:(i + 1) * size])
+        sketch.total = total
+        return sketch
+
+
+class SpaceSaving:
+    """Top-K по алгоритму Space-Saving: ключ -> [count, error]"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self._counters: Dict[str, List[int]] = {}
+        # Куча (count, ключ) для поиска минимума. Рост счетчика кучу не трогает:
+        # запись может отставать от счетчика и обновляется, когда оказывается наверху
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _set(self, counters: Dict[str, List[int]]):
+        self._counters = counters
+        self._heap = [(counter[0], key) for key, counter in counters.items()]
+        heapq.heapify(self._heap)
+
+    def _min_count(self) -> int:
+        """Минимальный счетчик, амортизированно O(log k)"""
+        heap = self._heap
+        while True:
+            count, key = heap[0]
+            actual = self._counters[key][0]
+            if count == actual:
+                return count
+            heapq.heapreplace(heap, (actual, key))
+
+    @property
+    def floor(self) -> int:
+        """
+        Верхняя граница числа событий любого ключа, которого нет в списке:
+        минимальный счетчик, пока список заполнен, иначе 0
+        """
+        return self._min_count() if len(self._counters) >= self.capacity else 0
+
+    def add(self, key: str, count: int = 1):
+        self.total += count
+        counter = self._counters.get(key)
+        if counter is not None:
+            counter[0] += count
+            return
+        if len(self._counters) < self.capacity:
+            self._counters[key] = [count, 0]
+            heapq.heappush(self._heap, (count, key))
+            return
+        # Вытесняется ключ с минимальным счетчиком, его значение становится ошибкой
+        floor = self._min_count()
+        _, evicted = heapq.heapreplace(self._heap, (floor + count, key))
+        del self._counters[evicted]
+        self._counters[key] = [floor + count, floor]
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """n самых частых ключей: (ключ, count, error)"""
+        items = heapq.nlargest(n, self._counters.items(), key=lambda item: item[1][0])
+        return [(key, count, error) for key, (count, error) in items]
+
+    @property
+    def max_error(self) -> float:
+        return self.total / self.capacity
+
+    @classmethod
+    def merge(cls, summaries: List["SpaceSaving"], capacity: int) -> "SpaceSaving":
+        """
+        Сумма сводок. Ключу, которого нет в сводке, она добавляет свой floor
+        и к count, и к error, поэтому истинное значение по-прежнему лежит
+        в [count - error, count]. Остаются capacity самых больших счетчиков
+        """
+        floors = [summary.floor for summary in summaries]
+        keys = set()
+        for summary in summaries:
+            keys.update(summary._counters)
+        merged: Dict[str, List[int]] = {}
+        for key in keys:
+            count = error = 0
+            for summary, floor in zip(summaries, floors):
+                counter = summary._counters.get(key)
+                if counter is None:
+                    count += floor
+                    error += floor
+                else:
+                    count += counter[0]
+                    error += counter[1]
+            merged[key] = [count, error]
+        result = cls(capacity)
+        result._set(dict(heapq.nlargest(capacity, merged.items(), key=lambda item: item[1][0])))
+        result.total = sum(summary.total for summary in summaries)
+        return result
+
+    def dump(self) -> str:
+        return json.dumps([[key, count, error] for key, (count, error) in self._counters.items()])
+
+    @classmethod
+    def load(cls, data: str, capacity: int, total: int) -> "SpaceSaving":
+        summary = cls(capacity)
+        items = sorted(json.loads(data), key=lambda item: item[1], reverse=True)[:capacity]
+        summary._set({key: [count, error] for key, count, error in items})
+        summary.total = total
+        return summary
+
+
+# Приращение одного вида событий с прошлого сохранения
+Delta = Tuple[CountMinSketch, SpaceSaving]
+
+
+class DomainStats:
+    """
+    Скетч и top-K доменов для каждого вида событий: общий итог из
+    таблицы domain_stats вместе с приращением этого процесса (sketches,
+    heavy) и отдельно приращение, которое еще не сохранено (pending)
+    """
+
+    def __init__(self, width: int, depth: int, top_k: int, enabled: bool = True):
+        self.enabled = enabled
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.sketches = {kind: CountMinSketch(width, depth) for kind in KINDS}
+        self.heavy = {kind: SpaceSaving(top_k) for kind in KINDS}
+        self.pending: Dict[str, Delta] = self._empty()
+
+    def _empty(self) -> Dict[str, Delta]:
+        return {kind: (CountMinSketch(self.width, self.depth), SpaceSaving(self.top_k)) for kind in KINDS}
+
+    @property
+    def dirty(self) -> bool:
+        return any(sketch.total for sketch, _ in self.pending.values())
+
+    def record(self, kind: str, url: str):
+        host = url_host(url) if self.enabled else None
+        if not host:
+            return
+        self.sketches[kind].add(host)
+        self.heavy[kind].add(host)
+        sketch, heavy = self.pending[kind]
+        sketch.add(host)
+        heavy.add(host)
+
+    def record_link(self, url: str):
+        self.record("links", url)
+
+    def record_click(self, url: str):
+        self.record("clicks", url)
+
+    def top(self, kind: str, n: int) -> List[Tuple[str, int, int]]:
+        return self.heavy[kind].top(n)
+
+    def estimate(self, kind: str, host: str) -> int:
+        return self.sketches[kind].estimate(host.lower())
+
+    def bounds(self, kind: str) -> Dict[str, float]:
+        """Гарантии точности для текущего числа событий"""
+        sketch = self.sketches[kind]
+        return {
+            "total": sketch.total,
+            "sketch_epsilon": sketch.epsilon,
+            "sketch_delta": sketch.delta,
+            "sketch_max_overestimate": sketch.epsilon * sketch.total,
+            "top_k": self.top_k,
+            "top_max_error": self.heavy[kind].max_error,
+        }
+
+    def take_pending(self) -> Dict[str, Delta]:
+        """Забрать несохраненное приращение; новые события копятся заново"""
+        pending, self.pending = self.pending, self._empty()
+        return pending
+
+    def return_pending(self, pending: Dict[str, Delta]):
+        """Вернуть приращение, которое не удалось сохранить"""
+        for kind, (sketch, heavy) in pending.items():
+            current_sketch, current_heavy = self.pending[kind]
+            current_sketch.merge(sketch)
+            self.pending[kind] = (current_sketch, SpaceSaving.merge([current_heavy, heavy], self.top_k))
+
+    def parse(self, rows: List[sqlite3.Row]) -> Dict[str, Delta]:
+        """Итог из таблицы domain_stats; снимок с другими размерами игнорируется"""
+        stored = self._empty()
+        for row in rows:
+            kind = row["kind"]
+            if kind not in KINDS or (row["width"], row["depth"]) != (self.width, self.depth):
+                continue
+            stored[kind] = (
+                CountMinSketch.from_bytes(row["sketch"], self.width, self.depth, row["total"]),
+                SpaceSaving.load(row["top"], self.top_k, row["total"]),
+            )
+        return stored
+
+    def add(self, stored: Dict[str, Delta], pending: Dict[str, Delta]) -> Dict[str, Delta]:
+        """Итог плюс приращение (stored не меняется)"""
+        result = {}
+        for kind in KINDS:
+            sketch = stored[kind][0].copy()
+            sketch.merge(pending[kind][0])
+            result[kind] = (sketch, SpaceSaving.merge([stored[kind][1], pending[kind][1]], self.top_k))
+        return result
+
+    def dump(self, stored: Dict[str, Delta]) -> List[tuple]:
+        """Строки для таблицы domain_stats"""
+        updated_at = now_ms()
+        return [
+            (kind, self.width, self.depth, sketch.total, sketch.to_bytes(), heavy.dump(), updated_at)
+            for kind, (sketch, heavy) in stored.items()
+        ]
+
+    def restore(self, stored: Dict[str, Delta]):
+        """Ответы - итог из таблицы вместе с несохраненным приращением процесса"""
+        for kind, (sketch, heavy) in self.add(stored, self.pending).items():
+            self.sketches[kind] = sketch
+            self.heavy[kind] = heavy
+
+
+class DomainStatsPersister(PeriodicTask):
+    """
+    Раз в interval секунд и при остановке прибавляет приращение процесса
+    к таблице domain_stats и перечитывает общий итог. Работает в каждом
+    воркере: у каждого свое приращение
+    """
+
+    name = "domain_stats"
+
+    def __init__(self, stats: DomainStats, interval: float, enabled: bool = True):
+        super().__init__(interval, enabled)
+        self.stats = stats
+
+    def _read(self) -> Dict[str, Delta]:
+        with get_db(settings.DB_PATH) as conn:
+            return self.stats.parse(conn.execute("SELECT * FROM domain_stats").fetchall())
+
+    async def load(self):
+        """Перечитать общий итог; чтение и разбор идут в потоке, не в цикле событий"""
+        self.stats.restore(await asyncio.to_thread(self._read))
+
+    async def save(self):
+        if not self.stats.dirty:
+            # Своих событий нет, но итог могли пополнить другие воркеры
+            await self.load()
+            return
+        pending = self.stats.take_pending()
+
+        def op(conn: sqlite3.Connection) -> Dict[str, Delta]:
+            stored = self.stats.parse(conn.execute("SELECT * FROM domain_stats").fetchall())
+            merged = self.stats.add(stored, pending)
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO domain_stats
+                (kind, width, depth, total, sketch, top, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                self.stats.dump(merged)
+            )
+            return merged
+
+        try:
+            merged = await db_writer.submit(op)
+        except BaseException:
+            self.stats.return_pending(pending)
+            raise
+        self.stats.restore(merged)
+
+    async def run_once(self):
+        await self.save()
+
+    async def start(self):
+        if not self.enabled:
+            return
+        try:
+            await self.load()
+        except sqlite3.Error as e:
+            LogManager.sync_log_database_error(f"Не удалось загрузить статистику доменов: {e}")
+        await super().start()
+
+    async def stop(self):
+        await super().stop()
+        if self.enabled:
+            await self.save()
+
+
+domain_stats = DomainStats(
+    width=settings.DOMAIN_SKETCH_WIDTH,
+    depth=settings.DOMAIN_SKETCH_DEPTH,
+    top_k=settings.DOMAIN_TOP_K,
+    enabled=settings.DOMAIN_STATS_ENABLED,
+)
+
+domain_stats_persister = DomainStatsPersister(
+    domain_stats,
+    interval=settings.DOMAIN_STATS_PERSIST_SECONDS,
+    enabled=settings.DOMAIN_STATS_ENABLED,
+)
@@ -0,0 +1,155 @@
+"""
+Хеширование паролей вне цикла событий.
+
+Медленный хеш (scrypt) считается в ограниченном пуле процессов,
+а семафор ограничивает число одновременных задач, поэтому всплеск
+регистраций не блокирует обработку остальных запросов.
+
+Формат хеша: scrypt$<n>$<r>$<p>$<salt>$<hash>. Параметры хранятся в самом
+хеше, поэтому после их изменения в настройках старые хеши продолжают
+проверяться, а needs_rehash подсказывает, что хеш пора пересчитать.
+Хеши bcrypt, созданные до scrypt, проверяет verify_legacy_password_sync
+(нужен необязательный пакет bcrypt) и при входе они пересчитываются.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from src.core.config import settings
+from src.core.metrics import Metrics
+
+
+SCHEME = "scrypt"
+_SALT_BYTES = 16
+_KEY_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r + 1024 * 1024,
+        dklen=_KEY_BYTES,
+    )
+
+
+def hash_password_sync(password: str, n: int, r: int, p: int) -> str:
+    """Хеш пароля с заданной стоимостью (выполняется в процессе пула)"""
+    salt = os.urandom(_SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password_sync(password: str, hashed: str) -> bool:
+    """Проверка пароля по хешу в формате scrypt$... (выполняется в процессе пула)"""
+    try:
+        scheme, n, r, p, salt, key = hashed.split("$")
+        if scheme != SCHEME:
+            return False
+        expected = base64.b64decode(key)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+def verify_legacy_password_sync(password: str, hashed: str) -> bool:
+    """Проверка старого хеша bcrypt (выполняется в процессе пула)"""
+    if not hashed.startswith(_BCRYPT_PREFIXES):
+        return False
+    try:
+        import bcrypt
+    except ImportError:
+        raise RuntimeError("Для проверки хешей bcrypt нужен пакет bcrypt (pip install bcrypt)") from None
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        return False
+
+
+class PasswordHasher:
+    """Асинхронный интерфейс к пулу процессов для хеширования паролей"""
+
+    def __init__(self, workers: int, concurrency: int, n: int, r: int, p: int):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.n = n
+        self.r = r
+        self.p = p
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: в процессе уже работают потоки, fork из них небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _run(self, func: Callable, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        """Хеш пароля с текущими параметрами стоимости"""
+        Metrics.inc("auth.password_hashes")
+        return await self._run(hash_password_sync, password, self.n, self.r, self.p)
+
+    async def verify(
+        self,
+        password: str,
+        hashed: str,
+        legacy_verify: Optional[Callable[[str, str], bool]] = None,
+    ) -> bool:
+        """
+        Проверка пароля. Хеши старого формата проверяются через legacy_verify,
+        который тоже выполняется в пуле (функция должна быть на уровне модуля)
+        """
+        Metrics.inc("auth.password_verifications")
+        if hashed.startswith(f"{SCHEME}$"):
+            return await self._run(verify_password_sync, password, hashed)
+        if legacy_verify is None:
+            return False
+        return await self._run(legacy_verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True, если хеш другого формата или с устаревшими параметрами"""
+        try:
+            scheme, n, r, p, _, _ = hashed.split("$")
+        except ValueError:
+            return True
+        return scheme != SCHEME or (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    async def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    concurrency=settings.PASSWORD_HASH_CONCURRENCY,
+    n=settings.PASSWORD_HASH_N,
+    r=settings.PASSWORD_HASH_R,
+    p=settings.PASSWORD_HASH_P,
+)
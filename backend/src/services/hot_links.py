@@ -0,0 +1,80 @@
+"""
+Самые популярные короткие ссылки за последние 1 минуту, 5 минут и час.
+
+Каждое окно - кольцо из нескольких корзин фиксированной длины, в каждой
+корзине свой Space-Saving на k счетчиков. Устаревшая корзина очищается
+при первом обращении к ней, а top-N окна получается слиянием корзин
+(SpaceSaving.merge): заполненная корзина, в которой ключа нет, добавляет
+свой минимальный счетчик к его hits и error, поэтому истинное число
+просмотров за окно лежит в [hits - error, hits].
+Память ограничена числом корзин * k, ответ не зависит от числа ссылок.
+
+Окно скользит с шагом одной корзины: 1m - по 10 секунд,
+5m - по 30 секунд, 1h - по 5 минут.
+"""
+import time
+from typing import Callable, Dict, List, Tuple
+
+from src.core.config import settings
+from src.services.domain_stats import SpaceSaving
+
+
+# окно -> (длина корзины в секундах, число корзин)
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1m": (10, 6),
+    "5m": (30, 10),
+    "1h": (300, 12),
+}
+
+
+class _Window:
+    """Кольцо корзин Space-Saving для одного окна"""
+
+    def __init__(self, bucket_seconds: int, buckets: int, capacity: int):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self._epochs = [-1] * buckets
+        self._buckets = [SpaceSaving(capacity) for _ in range(buckets)]
+
+    def _bucket(self, now: float) -> SpaceSaving:
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % len(self._buckets)
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._buckets[slot] = SpaceSaving(self.capacity)
+        return self._buckets[slot]
+
+    def add(self, key: str, now: float):
+        self._bucket(now).add(key)
+
+    def top(self, n: int, now: float) -> Tuple[List[Tuple[str, int, int]], int]:
+        """top-N за окно: [(ключ, count, error)] и общее число событий"""
+        oldest = int(now // self.bucket_seconds) - len(self._buckets) + 1
+        buckets = [
+            bucket for epoch, bucket in zip(self._epochs, self._buckets) if epoch >= oldest
+        ]
+        merged = SpaceSaving.merge(buckets, self.capacity)
+        return merged.top(n), merged.total
+
+
+class HotLinks:
+    """Счетчики просмотров коротких ссылок по скользящим окнам"""
+
+    def __init__(self, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.clock = clock
+        self._windows = {
+            name: _Window(bucket_seconds, buckets, capacity)
+            for name, (bucket_seconds, buckets) in WINDOWS.items()
+        }
+
+    def hit(self, short_code: str):
+        now = self.clock()
+        for window in self._windows.values():
+            window.add(short_code, now)
+
+    def top(self, window: str, n: int) -> Tuple[List[Tuple[str, int, int]], int]:
+        return self._windows[window].top(n, self.clock())
+
+
+hot_links = HotLinks(capacity=settings.HOT_LINKS_TOP_K)
@@ -0,0 +1,149 @@
+"""
+LRU-кэш коротких ссылок по short_code с прогревом после перезапуска.
+
+При остановке самые просматриваемые за последний час коды (по hot_links,
+а если просмотров мало - по порядку LRU) записываются в файл снимка,
+по одному коду на строку. При старте on_startup читает снимок и загружает
+эти ссылки одним запросом, поэтому после деплоя горячие коды сразу
+обслуживаются из памяти.
+
+Запись живет не дольше ttl: клики и изменения из других процессов
+становятся видны не позже чем через ttl секунд.
+"""
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+from src.schemas.common import LinkRecord
+from src.services.hot_links import HotLinks, hot_links
+
+
+class LinkCache:
+    """Ограниченный LRU-кэш: short_code -> LinkRecord"""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        snapshot_path: str,
+        warm_keys: int,
+        hot: Optional[HotLinks] = None,
+    ):
+        self.hot = hot
+        self.max_size = max_size
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.warm_keys = warm_keys
+        self._entries: "OrderedDict[str, Tuple[LinkRecord, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, short_code: str) -> Optional[LinkRecord]:
+        entry = self._entries.get(short_code)
+        if entry is not None and (entry[1] <= time.monotonic() or entry[0].is_expired()):
+            del self._entries[short_code]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            Metrics.inc("link_cache.misses")
+            return None
+
+        self._entries.move_to_end(short_code)
+        self.hits += 1
+        Metrics.inc("link_cache.hits")
+        return entry[0]
+
+    def put(self, record: LinkRecord):
+        if record.is_expired():
+            return
+        self._entries[record.short_code] = (record, time.monotonic() + self.ttl)
+        self._entries.move_to_end(record.short_code)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def add_click(self, record: LinkRecord):
+        """Учесть переход по ссылке: срок жизни уже закэшированной записи не продлевается"""
+        entry = self._entries.get(record.short_code)
+        if entry is None:
+            self.put(record.with_clicks(record.clicks + 1))
+            return
+        self._entries[record.short_code] = (entry[0].with_clicks(entry[0].clicks + 1), entry[1])
+
+    def discard(self, short_codes: Iterable[str]):
+        """Сбросить записи (после удаления или изменения ссылок)"""
+        for code in short_codes:
+            self._entries.pop(code, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def hottest(self, limit: int) -> List[str]:
+        """Коды для прогрева: сначала по просмотрам за час, затем недавно использованные"""
+        codes, _ = self.hot.top("1h", limit) if self.hot is not None else ([], 0)
+        hottest = dict.fromkeys(code for code, _, _ in codes)
+        for code in reversed(self._entries):
+            if len(hottest) >= limit:
+                break
+            hottest.setdefault(code)
+        return list(hottest)
+
+    def dump(self) -> int:
+        """Записать коды для прогрева в файл снимка, вернуть их число"""
+        codes = self.hottest(self.warm_keys)
+        path = Path(self.snapshot_path)
+        # У каждого воркера свой временный файл, последний os.replace побеждает
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("".join(f"{code}\n" for code in codes), encoding="ascii")
+        os.replace(tmp_path, path)
+        return len(codes)
+
+    def load_snapshot(self) -> List[str]:
+        try:
+            text = Path(self.snapshot_path).read_text(encoding="ascii")
+        except FileNotFoundError:
+            return []
+        return [code for code in text.split() if code][:self.warm_keys]
+
+    def warm(self, records: List[LinkRecord]):
+        """Загрузить записи, самые горячие окажутся в конце LRU"""
+        for record in reversed(records):
+            self.put(record)
+
+
+link_cache = LinkCache(
+    max_size=settings.LINK_CACHE_SIZE,
+    ttl=settings.LINK_CACHE_TTL_SECONDS,
+    snapshot_path=settings.LINK_CACHE_SNAPSHOT_PATH or f"{settings.DB_PATH}.warm",
+    warm_keys=settings.LINK_CACHE_WARM_KEYS,
+    hot=hot_links,
+)
+Metrics.register_gauge("link_cache.size", lambda: len(link_cache))
+Metrics.register_gauge("link_cache.hit_rate", lambda: link_cache.stats()["hit_rate"])
+
+
+async def dump_link_cache():
+    """Обработчик shutdown: снимок горячих кодов"""
+    try:
+        count = link_cache.dump()
+    except OSError as e:
+        LogManager.sync_log_database_error(f"Не удалось сохранить снимок кэша ссылок: {e}")
+        return
+    LogManager.sync_log_database_info("Сохранен снимок кэша ссылок", {"count": count})
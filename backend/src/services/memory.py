@@ -0,0 +1,182 @@
+"""
+Инструменты для поиска утечек памяти в долгоживущих воркерах.
+
+- RSS процесса из /proc/self/statm (или пик из getrusage вне Linux);
+- tracemalloc: базовый снимок и разница с ним, сгруппированная по
+  файлу или строке. Трассировка замедляет аллокации, поэтому включается
+  только по запросу (или MEMORY_TRACEMALLOC_ENABLED);
+- MemoryWatch: периодически записывает RSS и помечает устойчивый рост,
+  если RSS рос почти в каждом замере окна и суммарно больше порога.
+
+Размеры подсистем (кэши, логгеры, шаблоны Jinja, соединения SQLite)
+регистрируются как gauge в Metrics и попадают в отчет вместе с RSS.
+"""
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+from src.core.periodic import PeriodicTask
+
+
+SUBSYSTEM_GAUGES = (
+    "link_cache.size",
+    "auth.token_cache.size",
+    "log.loggers",
+    "jinja.cached_templates",
+    "sqlite.open_connections",
+    "db_writer.connections",
+    "single_flight.lookup.in_flight",
+    "single_flight.shorten.in_flight",
+)
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Вне Linux доступен только пиковый RSS (в КБ, на macOS - в байтах)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryProfiler:
+    """Снимки tracemalloc и отчет о памяти процесса"""
+
+    def __init__(self, frames: int):
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[float] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: Optional[int] = None):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = None
+        self._baseline_at = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        # Собственные структуры tracemalloc не интересны
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def take_baseline(self):
+        """Запомнить снимок, с которым будет сравниваться diff"""
+        self.start()
+        self._baseline = self._snapshot()
+        self._baseline_at = time.time()
+
+    def top(self, group_by: str, limit: int) -> List[Dict[str, Any]]:
+        """Крупнейшие места аллокаций"""
+        stats = self._snapshot().statistics(group_by)[:limit]
+        return [
+            {"where": str(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in stats
+        ]
+
+    def diff(self, group_by: str, limit: int) -> List[Dict[str, Any]]:
+        """Наибольший прирост памяти с момента базового снимка"""
+        if self._baseline is None:
+            raise ValueError("Базовый снимок не снят")
+        stats = self._snapshot().compare_to(self._baseline, group_by)[:limit]
+        return [
+            {
+                "where": str(stat.traceback),
+                "size": stat.size,
+                "size_diff": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats
+        ]
+
+    def report(self) -> Dict[str, Any]:
+        gauges = Metrics.snapshot()["gauges"]
+        report = {
+            "rss_bytes": rss_bytes(),
+            "subsystems": {name: gauges.get(name) for name in SUBSYSTEM_GAUGES},
+            "tracemalloc": None,
+            "growth": memory_watch.status(),
+        }
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            report["tracemalloc"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "baseline_at": self._baseline_at,
+            }
+        return report
+
+
+class MemoryWatch(PeriodicTask):
+    """Замеры RSS раз в interval секунд и флаг устойчивого роста"""
+
+    name = "memory_watch"
+
+    def __init__(self, interval: float, window: int, growth_ratio: float, enabled: bool = True):
+        super().__init__(interval, enabled)
+        self.growth_ratio = growth_ratio
+        self.samples: Deque[Tuple[float, int]] = deque(maxlen=window)
+        self.growing = False
+
+    def record(self, rss: int):
+        self.samples.append((time.time(), rss))
+        was_growing = self.growing
+        self.growing = self._is_growing()
+        if self.growing and not was_growing:
+            first, last = self.samples[0][1], self.samples[-1][1]
+            LogManager.sync_log_database_error(
+                "Устойчивый рост памяти процесса",
+                params={"pid": os.getpid(), "rss_from": first, "rss_to": last},
+            )
+
+    def _is_growing(self) -> bool:
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        values = [rss for _, rss in self.samples]
+        rises = sum(b > a for a, b in zip(values, values[1:]))
+        # Рост почти в каждом замере и заметный в сумме, а не разовый скачок
+        return rises >= 0.8 * (len(values) - 1) and values[-1] > values[0] * (1 + self.growth_ratio)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "growing": self.growing,
+            "samples": [{"at": at, "rss_bytes": rss} for at, rss in self.samples],
+        }
+
+    async def run_once(self):
+        self.record(rss_bytes())
+
+
+memory_profiler = MemoryProfiler(frames=settings.MEMORY_TRACEMALLOC_FRAMES)
+memory_watch = MemoryWatch(
+    interval=settings.MEMORY_WATCH_INTERVAL_SECONDS,
+    window=settings.MEMORY_WATCH_WINDOW,
+    growth_ratio=settings.MEMORY_WATCH_GROWTH_RATIO,
+    enabled=settings.MEMORY_WATCH_ENABLED,
+)
+Metrics.register_gauge("memory.rss_bytes", rss_bytes)
+Metrics.register_gauge("memory.growth_suspected", lambda: int(memory_watch.growing))
+
+
+async def start_memory_tracing():
+    """Обработчик startup: трассировка с самого старта, если включена"""
+    if settings.MEMORY_TRACEMALLOC_ENABLED:
+        memory_profiler.take_baseline()
@@ -0,0 +1,68 @@
+"""
+Объединение одинаковых одновременных операций (single-flight).
+
+Первый вызов с ключом выполняет операцию, остальные вызовы с тем же
+ключом, пришедшие до ее завершения, ждут тот же результат (или ту же
+ошибку) вместо повторного запроса к базе. Объединяются только
+одновременные вызовы: результат не кэшируется.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from src.core.metrics import Metrics
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Группа операций с общим пространством ключей и метриками"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            Metrics.inc(f"single_flight.{self.name}.coalesced")
+            # shield: отмена ожидающего запроса не отменяет общую операцию
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку без ожидающих не нужно отдельно логировать как "never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+lookup_flight = SingleFlight("lookup")
+shorten_flight = SingleFlight("shorten")
+Metrics.register_gauge("single_flight.lookup.in_flight", lambda: len(lookup_flight))
+Metrics.register_gauge("single_flight.shorten.in_flight", lambda: len(shorten_flight))
@@ -0,0 +1,149 @@
+import base64
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+from src.core.config import settings
+from src.core.metrics import Metrics
+
+
+def read_token_claims(token: str) -> Dict[str, Any]:
+    """
+    Полезная нагрузка JWT без проверки подписи.
+    Вызывается только для токена, который уже прошел проверку
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+class CachedToken:
+    """Проверенный токен: claims и снимок пользователя с его версией"""
+
+    __slots__ = ("claims", "user", "user_id", "version", "expires_at")
+
+    def __init__(self, claims: Dict[str, Any], user: Any, expires_at: float):
+        self.claims = claims
+        self.user = user
+        self.user_id = str(getattr(user, "id", claims.get("sub")))
+        self.version = getattr(user, "version", None)
+        self.expires_at = expires_at
+
+
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кэш: sha256(токен) -> проверенные claims и пользователь.
+
+    Запись живет не дольше срока действия токена (exp) и не дольше max_ttl.
+    invalidate_user сбрасывает записи пользователя только в своем процессе,
+    поэтому get сверяет версию снимка с текущей версией пользователя
+    (current_version, один запрос по первичному ключу): изменение
+    или удаление пользователя в другом воркере prefork-сервера
+    делает запись устаревшей сразу, а не через max_ttl.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._by_user: Dict[str, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(
+        self, token: str, current_version: Optional[Callable[[str], Optional[int]]] = None
+    ) -> Optional[CachedToken]:
+        """
+        Запись токена или None. current_version(user_id) - текущая версия
+        пользователя (None, если его нет); запись с другой версией устарела
+        """
+        key = self._digest(token)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self._remove(key)
+            entry = None
+        if entry is not None and current_version is not None and current_version(entry.user_id) != entry.version:
+            self._remove(key)
+            self.stale += 1
+            Metrics.inc("auth.token_cache.stale")
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            Metrics.inc("auth.token_cache.misses")
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        Metrics.inc("auth.token_cache.hits")
+        # Отдаем копию, чтобы обработчики не меняли закэшированный снимок
+        return CachedToken(entry.claims, copy.copy(entry.user), entry.expires_at)
+
+    def put(self, token: str, claims: Dict[str, Any], user: Any):
+        now = time.time()
+        expires_at = now + self.max_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        if expires_at <= now:
+            return
+
+        key = self._digest(token)
+        self._remove(key)
+        entry = CachedToken(claims, copy.copy(user), expires_at)
+        self._entries[key] = entry
+        self._by_user.setdefault(entry.user_id, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: Any):
+        """Сбросить все токены пользователя (после изменения его данных)"""
+        for key in self._by_user.pop(str(user_id), set()):
+            self._entries.pop(key, None)
+
+    def _remove(self, key: bytes):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry.user_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(
+    max_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    max_ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+)
+Metrics.register_gauge("auth.token_cache.size", lambda: len(token_cache))
+Metrics.register_gauge("auth.token_cache.hit_rate", lambda: token_cache.stats()["hit_rate"])
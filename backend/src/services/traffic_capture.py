@@ -0,0 +1,235 @@
+"""
+Запись боевого трафика для воспроизведения (benchmarks/replay.py).
+
+Синтетическая нагрузка не повторяет реальный перекос обращений, поэтому
+POST /shorten и GET /{short_code} можно записывать в компактный бинарный
+трейс и затем проигрывать на локальном экземпляре.
+
+Формат файла: MAGIC, время начала записи (uint64, мс), затем записи
+<смещение мс uint32><тип uint8><длина ключа uint8><ключ>. Ключ /shorten -
+url_digest ссылки (сама ссылка не пишется), ключ просмотра - short_code.
+Каждый процесс пишет свой файл <TRAFFIC_CAPTURE_PATH>.<pid>.
+
+Запись включается для всех воркеров сразу флаг-файлом
+<TRAFFIC_CAPTURE_PATH>-enabled (в нем доля выборки): enable его создает,
+disable удаляет. Каждый воркер проверяет флаг не чаще раза в
+TRAFFIC_CAPTURE_POLL_SECONDS при очередном запросе, поэтому запись в
+других воркерах начинается и останавливается с этой задержкой. Флаг
+переживает перезапуск сервера; воркер, остановивший запись по
+TRAFFIC_CAPTURE_MAX_BYTES, не начинает ее снова до нового enable.
+
+Выборка делается по ключу (crc32), а не по запросу: ключ либо записан
+со всеми обращениями, либо не записан совсем, и повторные обращения
+к одной ссылке в трейсе сохраняются.
+"""
+import heapq
+import os
+import struct
+import time
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+from src.core.config import settings
+from src.core.log_manager import LogManager
+from src.core.metrics import Metrics
+from src.utils.generators import url_digest
+from src.utils.time import now_ms
+
+
+MAGIC = b"BOTOTRC1"
+_HEADER = struct.Struct("<Q")
+_RECORD = struct.Struct("<IBB")
+
+KIND_SHORTEN = 1
+KIND_LOOKUP = 2
+# Просмотр несуществующего кода: при воспроизведении его не нужно создавать
+KIND_LOOKUP_MISS = 3
+KIND_NAMES = {KIND_SHORTEN: "shorten", KIND_LOOKUP: "lookup", KIND_LOOKUP_MISS: "lookup_miss"}
+
+TraceRecord = Tuple[int, int, bytes]
+
+
+class TrafficCapture:
+    """Буферизованная запись трейса текущего процесса"""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float,
+        max_bytes: int,
+        poll_interval: float = 1.0,
+        flag_path: Optional[str] = None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.records = 0
+        self._flag_path = flag_path
+        self._file: Optional[BinaryIO] = None
+        self._file_path: Optional[str] = None
+        self._started_ms = 0
+        self._written = 0
+        # mtime флага, по которому запись уже включалась, и время следующей проверки
+        self._flag_mtime: Optional[int] = None
+        self._next_poll = 0.0
+        self.set_sample_rate(sample_rate)
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    @property
+    def flag_path(self) -> str:
+        return self._flag_path or f"{self.path}-enabled"
+
+    def enable(self, sample_rate: Optional[float] = None, overwrite: bool = True):
+        """Включить запись во всех воркерах; overwrite=False не трогает уже созданный флаг"""
+        rate = self.sample_rate if sample_rate is None else sample_rate
+        if not overwrite and os.path.exists(self.flag_path):
+            self.poll(force=True)
+            return
+        tmp_path = f"{self.flag_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(repr(rate))
+        os.replace(tmp_path, self.flag_path)
+        self.poll(force=True)
+
+    def disable(self):
+        """Остановить запись во всех воркерах"""
+        try:
+            os.remove(self.flag_path)
+        except FileNotFoundError:
+            pass
+        self.poll(force=True)
+
+    def poll(self, force: bool = False):
+        """Привести запись этого процесса к состоянию флага"""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        try:
+            mtime = os.stat(self.flag_path).st_mtime_ns
+        except FileNotFoundError:
+            # Останавливается только запись, включенная флагом, а не прямым start
+            if self._flag_mtime is not None:
+                self._flag_mtime = None
+                self.stop()
+            return
+        if mtime == self._flag_mtime:
+            return
+        self._flag_mtime = mtime
+        try:
+            with open(self.flag_path) as f:
+                sample_rate = float(f.read())
+        except (OSError, ValueError):
+            sample_rate = None
+        self.start(sample_rate)
+
+    def set_sample_rate(self, sample_rate: float):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self._threshold = int(self.sample_rate * 2**32)
+
+    def start(self, sample_rate: Optional[float] = None):
+        """Начать запись в новый файл <path>.<pid> (старый трейс перезаписывается)"""
+        if sample_rate is not None:
+            self.set_sample_rate(sample_rate)
+        if self.active:
+            return
+        self._file_path = f"{self.path}.{os.getpid()}"
+        self._file = open(self._file_path, "wb", buffering=64 * 1024)
+        self._started_ms = now_ms()
+        self._file.write(MAGIC + _HEADER.pack(self._started_ms))
+        self._written = len(MAGIC) + _HEADER.size
+        self.records = 0
+        LogManager.sync_log_database_info(
+            "Запись трафика включена", {"path": self._file_path, "sample_rate": self.sample_rate}
+        )
+
+    def stop(self):
+        if not self.active:
+            return
+        self._file.close()
+        self._file = None
+        LogManager.sync_log_database_info(
+            "Запись трафика остановлена", {"path": self._file_path, "records": self.records}
+        )
+
+    def _record(self, kind: int, key: bytes):
+        if self._file is None or zlib.crc32(key) >= self._threshold:
+            return
+        offset = now_ms() - self._started_ms
+        if self._written >= self.max_bytes or offset >= 2**32:
+            self.stop()
+            return
+        self._file.write(_RECORD.pack(offset, kind, len(key)) + key)
+        self._written += _RECORD.size + len(key)
+        self.records += 1
+
+    def record_shorten(self, original_url: str):
+        self.poll()
+        if self._file is not None:
+            self._record(KIND_SHORTEN, url_digest(original_url))
+
+    def record_lookup(self, short_code: str, found: bool):
+        self.poll()
+        if self._file is not None:
+            self._record(KIND_LOOKUP if found else KIND_LOOKUP_MISS, short_code.encode()[:255])
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": os.path.exists(self.flag_path),
+            "active": self.active,
+            "path": self._file_path,
+            "sample_rate": self.sample_rate,
+            "records": self.records,
+            "bytes": self._written,
+        }
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """Записи трейса (время мс, тип, ключ) в порядке записи"""
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + _HEADER.size)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: не трейс трафика")
+        (started_ms,) = _HEADER.unpack(header[len(MAGIC):])
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            offset, kind, length = _RECORD.unpack(head)
+            key = f.read(length)
+            if len(key) < length:
+                # Оборванная последняя запись (процесс завершился без stop)
+                return
+            yield started_ms + offset, kind, key
+
+
+def merge_traces(paths: Iterable[str]) -> Iterator[TraceRecord]:
+    """Трейсы нескольких воркеров одним потоком по времени"""
+    return heapq.merge(*(read_trace(path) for path in paths), key=lambda record: record[0])
+
+
+traffic_capture = TrafficCapture(
+    path=settings.TRAFFIC_CAPTURE_PATH or f"{settings.DB_PATH}.trace",
+    sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+    max_bytes=settings.TRAFFIC_CAPTURE_MAX_BYTES,
+    poll_interval=settings.TRAFFIC_CAPTURE_POLL_SECONDS,
+)
+Metrics.register_gauge("traffic_capture.records", lambda: traffic_capture.records)
+
+
+async def start_traffic_capture():
+    """Обработчик startup: запись с самого старта, если включена настройкой или флагом"""
+    # Уже созданный флаг не перезаписывается: иначе каждый запущенный
+    # воркер начинал бы трейс остальных заново
+    if settings.TRAFFIC_CAPTURE_ENABLED:
+        traffic_capture.enable(overwrite=False)
+    else:
+        traffic_capture.poll(force=True)
+
+
+async def stop_traffic_capture():
+    # Флаг остается: запись в других воркерах продолжается
+    traffic_capture.stop()
@@ -26,4 +26,11 @@ class UserAlreadyExistsError(BaseAppException):
             else:
                 message = "Пользователь уже существует"
         
-        super().__init__(message, status_code=409)
\ No newline at end of file
+        super().__init__(message, status_code=409)
+
+
+class ShortCodeTakenError(BaseAppException):
+    """Сгенерированный код уже занят действующей или архивной ссылкой"""
+    def __init__(self, short_code: str):
+        self.short_code = short_code
+        super().__init__(f"Код '{short_code}' уже занят", status_code=409)
@@ -1,15 +1,56 @@
+import hashlib
 import random
 import string
 from fastapi import Request
 
 BASE62 = string.digits + string.ascii_letters
 
+# Коды массового импорта длиннее случайных (4-8 символов),
+# поэтому два пространства кодов не пересекаются
+SEQUENCE_CODE_LENGTH = 9
+_SEQUENCE_SPACE = len(BASE62) ** SEQUENCE_CODE_LENGTH
+# Множитель взаимно прост с 62, поэтому отображение seq -> код биективно
+_SEQUENCE_MULTIPLIER = 6_364_136_223_846_793
+_SEQUENCE_OFFSET = 1_442_695_040_888_963
+
 
 def generate_short_code() -> str:
     length = random.randint(4, 8)
     return "".join(random.choices(BASE62, k=length))
 
 
+def encode_base62(value: int, length: int) -> str:
+    """Кодирует число в base62 фиксированной длины"""
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, len(BASE62))
+        chars.append(BASE62[rem])
+    return "".join(reversed(chars))
+
+
+def sequence_short_code(seq: int) -> str:
+    """
+    Уникальный код для номера последовательности.
+    Номера перемешиваются, чтобы соседние коды не были похожи
+    """
+    scrambled = (seq * _SEQUENCE_MULTIPLIER + _SEQUENCE_OFFSET) % _SEQUENCE_SPACE
+    return encode_base62(scrambled, SEQUENCE_CODE_LENGTH)
+
+
+# Окончание короткой ссылки после кода
+SHORT_URL_SUFFIX = "_byzil"
+
+
+def build_short_url(base_url: str, short_code: str) -> str:
+    """Короткая ссылка для кода"""
+    return base_url + "/" + short_code + SHORT_URL_SUFFIX
+
+
+def url_digest(url: str) -> bytes:
+    """Ключ поиска ссылки в базе: 16 байт blake2b от исходной ссылки"""
+    return hashlib.blake2b(url.encode(), digest_size=16).digest()
+
+
 def get_base_url(request: Request) -> str:
     """
     Возвращает базовый URL без пути и query-параметров.
@@ -19,4 +60,4 @@ def get_base_url(request: Request) -> str:
     scheme = request.url.scheme         
     host = request.url.netloc           
     
-    return f"{scheme}://{host}"
\ No newline at end of file
+    return f"{scheme}://{host}"
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -14,3 +15,18 @@ def dt_to_ms(dt: Optional[datetime]) -> Optional[int]:
     if dt is None:
         return None
     return int(dt.timestamp() * 1000)
+
+
+def dt_to_sql(dt: datetime) -> str:
+    """
+    Конвертация datetime в формат CURRENT_TIMESTAMP SQLite (UTC),
+    чтобы значения сравнивались со строками времени в запросах
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def now_ms() -> int:
+    """Текущее время в миллисекундах (формат dt_to_ms)"""
+    return time.time_ns() // 1_000_000
@@ -1,7 +1,23 @@
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
+
+# Тесты работают с временной базой, а не с boto.db из репозитория
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ADMIN_TOKEN", "test-admin")
+
 from src.main import app
 
+
 @pytest.fixture
 def client():
-    return TestClient(app)
\ No newline at end of file
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers():
+    return {"X-Admin-Token": os.environ["ADMIN_TOKEN"]}
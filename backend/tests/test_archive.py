@@ -0,0 +1,188 @@
+import sqlite3
+
+import pytest
+
+from src.cli.import_urls import import_urls
+from src.db.archive import link_archive, link_archiver
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.session import _column_names, get_db, init_schema
+from src.services.link_cache import link_cache
+from src.utils.generators import url_digest
+
+
+def _shorten(client, url):
+    return client.post("/shorten", json={"url": url}).json()["code"]
+
+
+def _make_idle(url, clicked: bool):
+    """Ссылка без переходов 100 дней: старый клик или старая дата создания"""
+    record = UrlInfoDbClient.get_by_id(url)
+    with get_db(db_path) as conn:
+        if clicked:
+            conn.execute(
+                "INSERT INTO url_clicks (link_id, clicks, clicked_at) VALUES (?, 7, ?)", (record.id, 1)
+            )
+        conn.execute(
+            "UPDATE urls SET created_at = datetime('now', '-100 days') WHERE id = ?", (record.id,)
+        )
+        conn.commit()
+    return record.id
+
+
+def _in_hot(code):
+    with get_db(db_path) as conn:
+        return conn.execute("SELECT id FROM urls WHERE short_code = ?", (code,)).fetchone()
+
+
+@pytest.mark.asyncio
+async def test_archive_and_promote_on_access(client):
+    """Холодные ссылки уходят в архив без tombstone и возвращаются при открытии"""
+    clicked, never, fresh = (f"https://cold.test/{name}" for name in ("clicked", "never", "fresh"))
+    codes = {url: _shorten(client, url) for url in (clicked, never, fresh)}
+    clicked_id = _make_idle(clicked, clicked=True)
+    _make_idle(never, clicked=False)
+    client.get(f"/{codes[clicked]}")
+    link_cache.discard(codes.values())
+    with get_db(db_path) as conn:
+        conn.execute("UPDATE url_clicks SET clicked_at = 1 WHERE link_id = ?", (clicked_id,))
+        conn.commit()
+
+    assert await link_archiver.archive_idle() >= 2
+    assert _in_hot(codes[clicked]) is None and _in_hot(codes[never]) is None
+    assert _in_hot(codes[fresh]) is not None
+    assert link_archive.get(short_code=codes[clicked]).clicks == 8
+    with get_db(db_path) as conn:
+        tombstones = {row[0] for row in conn.execute("SELECT short_code FROM url_tombstones")}
+    assert not tombstones & {codes[clicked], codes[never]}
+
+    page = client.get(f"/{codes[clicked]}")
+    assert page.status_code == 200 and "перешли 9 раз" in page.text
+    assert _in_hot(codes[clicked])[0] == clicked_id
+    assert link_archive.get(short_code=codes[clicked]) is None
+
+    # Повторное сокращение архивной ссылки отдает ее прежний код
+    assert _shorten(client, never) == codes[never]
+    assert link_archive.get(short_code=codes[never]) is None
+    assert await link_archiver.archive_idle() == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_archived(client):
+    """Удаление архивной ссылки убирает ее из архива и пишет tombstone"""
+    url = "https://cold.test/deleted"
+    code = _shorten(client, url)
+    _make_idle(url, clicked=False)
+    assert await link_archiver.archive_idle() >= 1
+    assert link_archive.get(short_code=code) is not None
+
+    assert await UrlInfoDbClient.delete_by_id(url)
+    assert link_archive.get(short_code=code) is None
+    assert client.get(f"/{code}").status_code == 404
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM url_tombstones WHERE short_code = ?", (code,)).fetchone()
+
+
+@pytest.mark.asyncio
+async def test_archived_code_not_reused(client, monkeypatch):
+    """Код архивной ссылки зарезервирован: новая ссылка получает другой"""
+    old = "https://cold.test/reserved"
+    code = _shorten(client, old)
+    _make_idle(old, clicked=False)
+    assert await link_archiver.archive_idle() >= 1
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM archived_codes WHERE short_code = ?", (code,)).fetchone()
+
+    generated = iter([code, "fresh1"])
+    monkeypatch.setattr("src.api.v1.page.generate_short_code", lambda: next(generated))
+    assert _shorten(client, "https://cold.test/newcomer") == "fresh1"
+
+    page = client.get(f"/{code}")
+    assert page.status_code == 200 and old in page.text
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM archived_codes WHERE short_code = ?", (code,)).fetchone() is None
+
+
+@pytest.mark.asyncio
+async def test_archived_code_of_live_url(client, monkeypatch):
+    """Архивный код ссылки, которая снова есть в urls, один раз связывается с ней"""
+    url = "https://cold.test/twice"
+    code = _shorten(client, url)
+    _make_idle(url, clicked=False)
+    assert await link_archiver.archive_idle() >= 1
+    with get_db(db_path) as conn:
+        conn.execute(
+            "INSERT INTO urls (short_url, original_url, short_code, url_hash) VALUES (?, ?, ?, ?)",
+            ("http://sho.rt/live01_byzil", url, "live01", url_digest(url))
+        )
+        conn.commit()
+    live_id = _in_hot("live01")[0]
+
+    page = client.get(f"/{code}")
+    assert page.status_code == 200 and url in page.text
+    assert link_archive.get(short_code=code) is None
+    link_cache.discard([code, "live01"])
+
+    def no_archive(**kwargs):
+        raise AssertionError("архив не должен читаться")
+
+    monkeypatch.setattr(link_archive, "get", no_archive)
+    assert UrlInfoDbClient.get_by_id("", code).id == live_id
+    monkeypatch.undo()
+
+    assert await UrlInfoDbClient.delete_by_id(url)
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM code_aliases WHERE short_code = ?", (code,)).fetchone() is None
+        assert conn.execute("SELECT 1 FROM archived_codes WHERE short_code = ?", (code,)).fetchone() is None
+    assert client.get(f"/{code}").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_shorten_skips_archive_for_live_urls(client, monkeypatch):
+    """При непустом архиве /shorten новой ссылки не обращается к архиву"""
+    url = "https://cold.test/parked"
+    code = _shorten(client, url)
+    _make_idle(url, clicked=False)
+    assert await link_archiver.archive_idle() >= 1
+    assert link_archive.active
+
+    def no_promote(**kwargs):
+        raise AssertionError("архив не должен читаться")
+
+    with monkeypatch.context() as m:
+        m.setattr("src.db.clients.lite_client.promote", no_promote)
+        _shorten(client, "https://cold.test/brand-new")
+    assert _shorten(client, url) == code
+
+
+def test_archived_codes_gain_url_hash(tmp_path):
+    """Таблица archived_codes без url_hash дополняется колонкой, и резерв кодов повторяется"""
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE archived_codes (short_code TEXT PRIMARY KEY, link_id INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute("CREATE TABLE import_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT INTO import_state VALUES ('archive:codes_reserved', 1)")
+    init_schema(conn)
+
+    assert "url_hash" in _column_names(conn, "archived_codes")
+    assert conn.execute("SELECT 1 FROM import_state WHERE key = 'archive:codes_reserved'").fetchone() is None
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_import_skips_archived_url(client):
+    """Импорт архивной ссылки не создает вторую строку с новым кодом"""
+    url = "https://cold.test/imported"
+    code = _shorten(client, url)
+    _make_idle(url, clicked=False)
+    assert await link_archiver.archive_idle() >= 1
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        stats = import_urls(conn, [url, "https://cold.test/imported-new"], "archived", "http://sho.rt")
+    finally:
+        conn.close()
+    assert stats.inserted == 1
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM urls WHERE url_hash = ?", (url_digest(url),)).fetchone() is None
+    assert _shorten(client, url) == code
@@ -0,0 +1,90 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from src.api.v1.auth import get_current_user_cached
+from src.db.clients.user_client import UserDbClient, db_path
+from src.db.session import get_db
+from src.services.auth import create_access_token
+from src.services.hashing import password_hasher
+from src.services.token_cache import token_cache
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_cached_user_follows_other_workers(client):
+    """Изменение и удаление пользователя в другом процессе сбрасывают запись кэша"""
+    user = await UserDbClient.process({"login": "cached", "email": "old@cache.test"})
+    token = create_access_token({"sub": str(user.id)})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    assert (await get_current_user_cached(credentials)).email == "old@cache.test"
+    assert (await get_current_user_cached(credentials)).email == "old@cache.test"
+
+    # Другой воркер: его invalidate_user до этого процесса не доходит
+    with get_db(db_path) as conn:
+        conn.execute(
+            "UPDATE users SET email = 'new@cache.test', version = version + 1 WHERE id = ?", (user.id,)
+        )
+        conn.commit()
+    assert (await get_current_user_cached(credentials)).email == "new@cache.test"
+
+    with get_db(db_path) as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (user.id,))
+        conn.commit()
+    with pytest.raises(HTTPException) as error:
+        await get_current_user_cached(credentials)
+    assert error.value.status_code == 401
+    assert token_cache.get(token) is None
+
+
+@pytest.mark.asyncio
+async def test_token_checks(client):
+    """Подписанный токен принимается, подделанный и истекший - нет"""
+    user = await UserDbClient.process({"login": "token-checks"})
+    token = create_access_token({"sub": str(user.id)})
+
+    response = client.patch("/auth/email/update", json={"email": "t@checks.test"}, headers=_bearer(token))
+    assert response.status_code == 200
+    assert UserDbClient.get_by_id(user.id).email == "t@checks.test"
+
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    expired = create_access_token({"sub": str(user.id)}, expires_in=-1)
+    for bad in (forged, expired, "not-a-token"):
+        response = client.patch("/auth/email/update", json={"email": "x@checks.test"}, headers=_bearer(bad))
+        assert response.status_code == 401
+
+
+def test_login_round_trip_with_rehash(client, monkeypatch):
+    """Регистрация, вход, пересчет хеша с новыми параметрами и повторный вход"""
+    credentials = {"auth_param": "round-trip", "password": "correct horse"}
+    response = client.post("/auth/create", json={"login": "round-trip", "password": "correct horse"})
+    assert response.status_code == 200
+    assert client.post("/auth", json=credentials).status_code == 200
+    assert client.post("/auth", json={**credentials, "password": "wrong horse"}).status_code == 401
+
+    old_hash = UserDbClient.get_by_login("round-trip").hashed_password
+    monkeypatch.setattr(password_hasher, "n", password_hasher.n // 2)
+    assert client.post("/auth", json=credentials).status_code == 200
+    new_hash = UserDbClient.get_by_login("round-trip").hashed_password
+    assert new_hash != old_hash and not password_hasher.needs_rehash(new_hash)
+
+    response = client.post("/auth", json=credentials)
+    assert response.status_code == 200
+    headers = _bearer(response.json()["access_token"])
+    assert client.patch("/auth/email/update", json={"email": "r@trip.test"}, headers=headers).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_with_legacy_bcrypt_hash(client):
+    """Хеш bcrypt проверяется в пуле и после входа заменяется на scrypt"""
+    bcrypt = pytest.importorskip("bcrypt")
+    legacy = bcrypt.hashpw(b"old password", bcrypt.gensalt(4)).decode()
+    await UserDbClient.process({"login": "legacy", "hashed_password": legacy})
+
+    credentials = {"auth_param": "legacy", "password": "old password"}
+    assert client.post("/auth", json=credentials).status_code == 200
+    assert UserDbClient.get_by_login("legacy").hashed_password.startswith("scrypt$")
+    assert client.post("/auth", json=credentials).status_code == 200
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from src.db.archive import default_archive_path
+from src.db.backup import (
+    create_snapshot,
+    create_snapshots,
+    list_snapshots,
+    prune_snapshots,
+    restore_snapshot,
+    restore_target,
+    verify_snapshot,
+)
+from src.db.session import init_schema
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    init_schema(conn)
+    conn.executemany(
+        "INSERT INTO urls (short_url, original_url, url_hash, short_code) VALUES (?, ?, ?, ?)",
+        [(f"http://sho.rt/{i}", f"https://b.test/{i}", bytes([i]), str(i)) for i in range(50)]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_snapshot_verify_restore(db_path, tmp_path, compress):
+    """Снимок проверяется и восстанавливается поверх измененной базы"""
+    progress = []
+    snapshot = create_snapshot(
+        db_path, str(tmp_path / "backups"), pages=1, pause=0, compress=compress,
+        progress=lambda status, remaining, total: progress.append(remaining),
+    )
+    assert len(progress) > 1 and progress[-1] == 0
+    assert verify_snapshot(str(snapshot)).urls == 50
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM urls")
+    result = restore_snapshot(str(snapshot), db_path, pages=4, pause=0)
+
+    assert result.ok
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 50
+
+
+def test_retention_and_corrupt_snapshot(db_path, tmp_path):
+    """Хранятся только последние снимки, поврежденный снимок не восстанавливается"""
+    backups = str(tmp_path / "backups")
+    for _ in range(3):
+        create_snapshot(db_path, backups, compress=False)
+    assert len(prune_snapshots(db_path, backups, keep=2)) == 1
+    assert len(list_snapshots(db_path, backups)) == 2
+
+    broken = tmp_path / "backups" / "live-broken.db"
+    broken.write_bytes(b"not a database" * 100)
+    assert not verify_snapshot(str(broken)).ok
+    with pytest.raises(ValueError):
+        restore_snapshot(str(broken), db_path)
+
+
+def test_archive_snapshot(db_path, tmp_path):
+    """Архив снимается вместе с базой и восстанавливается в архив"""
+    backups = str(tmp_path / "backups")
+    assert len(create_snapshots(db_path, backups, compress=False)) == 1
+
+    archive = default_archive_path(db_path)
+    with sqlite3.connect(archive) as conn:
+        conn.execute("CREATE TABLE archived_urls (id INTEGER PRIMARY KEY, short_code TEXT)")
+        conn.executemany("INSERT INTO archived_urls (short_code) VALUES (?)", [("a",), ("b",)])
+    hot, cold = create_snapshots(db_path, backups, compress=False)
+
+    assert verify_snapshot(str(hot)).urls == 50 and verify_snapshot(str(cold)).urls == 2
+    assert list_snapshots(db_path, backups)[-1] == hot and list_snapshots(archive, backups) == [cold]
+    assert restore_target(str(cold), db_path) == archive
+    assert restore_target(str(hot), db_path) == db_path
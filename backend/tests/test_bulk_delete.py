@@ -0,0 +1,154 @@
+import io
+import sqlite3
+import time
+
+import pytest
+
+from src.cli.__main__ import main
+from src.cli.import_urls import import_urls, read_csv
+from src.db.bulk_delete import BulkDelete, DeleteCriteria
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.session import get_db
+from src.services.bulk_delete import INTERRUPTED, bulk_delete_jobs
+from src.services.link_cache import link_cache
+
+
+def _shorten(client, url):
+    return client.post("/shorten", json={"url": url}).json()["code"]
+
+
+def _age(cache, seconds):
+    """Сдвинуть сроки жизни записей кэша, как если бы прошло seconds секунд"""
+    for code, (record, deadline) in cache._entries.items():
+        cache._entries[code] = (record, deadline - seconds)
+
+
+def test_dry_run_and_delete_by_domain(client, admin_headers):
+    """Пробный запуск только считает; удаление затрагивает домен и поддомены, кэш сбрасывается"""
+    doomed = [f"https://takedown.test/{i}" for i in range(3)] + ["https://cdn.takedown.test/x"]
+    kept = ["https://nottakedown.test/1", "https://other.test/?next=takedown.test"]
+    codes = {url: _shorten(client, url) for url in doomed + kept}
+    client.get(f"/{codes[doomed[0]]}")
+    assert codes[doomed[0]] in link_cache._entries
+
+    body = {"domain": "takedown.test", "include_subdomains": True}
+    response = client.post("/admin/links/delete", headers=admin_headers, json={**body, "dry_run": True})
+    assert response.status_code == 200
+    dry = response.json()
+    assert dry["matched"] == 4 and dry["scanned"] == 6
+    assert set(dry["sample"]) == set(doomed)
+    assert all(UrlInfoDbClient.get_by_id(url) for url in doomed)
+
+    response = client.post("/admin/links/delete", headers=admin_headers, json=body)
+    assert response.status_code == 202
+    job = response.json()
+    for _ in range(100):
+        status = client.get(f"/admin/links/delete/{job['job_id']}", headers=admin_headers).json()
+        if not status["running"]:
+            break
+        time.sleep(0.02)
+    assert status["deleted"] == 4 and status["error"] is None
+
+    assert not any(UrlInfoDbClient.get_by_id(url) for url in doomed)
+    assert all(UrlInfoDbClient.get_by_id(url) for url in kept)
+    assert codes[doomed[0]] not in link_cache._entries
+    assert client.get(f"/{codes[doomed[0]]}").status_code == 404
+    assert client.post("/admin/links/delete", headers=admin_headers, json={"dry_run": True}).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_resumes_after_failure(client):
+    """Прерванное удаление продолжается с сохраненной позиции"""
+    urls = [f"https://resume.test/{i}" for i in range(7)]
+    for url in urls:
+        _shorten(client, url)
+    criteria = DeleteCriteria(url_prefix="https://resume.test/")
+    calls = 0
+
+    async def flaky_write(op):
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise sqlite3.OperationalError("database is locked")
+        with get_db(db_path) as conn:
+            result = op(conn)
+            conn.commit()
+        return result
+
+    with pytest.raises(sqlite3.OperationalError):
+        await BulkDelete(criteria, batch_size=2, pause=0, write=flaky_write).run()
+    assert sum(UrlInfoDbClient.get_by_id(url) is None for url in urls) == 4
+
+    stats = await BulkDelete(criteria, batch_size=2, pause=0).run()
+    assert stats.resumed_from > 0 and stats.deleted == 3
+    assert not any(UrlInfoDbClient.get_by_id(url) for url in urls)
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM import_state WHERE key = ?", (criteria.key,)).fetchone() is None
+
+
+def test_status_from_other_worker(client, admin_headers):
+    """Состояние задания читается из базы процессом, который его не выполнял"""
+    _shorten(client, "https://elsewhere.test/1")
+    body = {"url_prefix": "https://elsewhere.test/"}
+    job_id = client.post("/admin/links/delete", headers=admin_headers, json=body).json()["job_id"]
+    for _ in range(100):
+        if not client.get(f"/admin/links/delete/{job_id}", headers=admin_headers).json()["running"]:
+            break
+        time.sleep(0.02)
+
+    # Другой воркер: в его памяти этого задания нет
+    bulk_delete_jobs._jobs.clear()
+    status = client.get(f"/admin/links/delete/{job_id}", headers=admin_headers).json()
+    assert status["done"] and status["deleted"] == 1 and not status["running"]
+
+    # Воркер, выполнявший задание, завершился посреди удаления
+    with get_db(db_path) as conn:
+        conn.execute("UPDATE bulk_delete_jobs SET running = 1, pid = 4194305 WHERE id = ?", (job_id,))
+        conn.commit()
+    status = client.get(f"/admin/links/delete/{job_id}", headers=admin_headers).json()
+    assert not status["running"] and status["error"] == INTERRUPTED
+    assert client.get("/admin/links/delete/missing", headers=admin_headers).status_code == 404
+
+
+def test_cli_by_created_at(tmp_path, capsys):
+    """CLI удаляет ссылки старше даты пачками; --dry-run ничего не меняет"""
+    path = str(tmp_path / "links.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    stream = io.StringIO("url\n" + "".join(f"https://dates.test/{i}\n" for i in range(10)))
+    import_urls(conn, read_csv(stream), "dates", "http://sho.rt", batch_size=100)
+    conn.execute("UPDATE urls SET created_at = '2020-01-01 00:00:00' WHERE id <= 6")
+
+    assert main(["delete", "--db", path, "--created-to", "2021-01-01", "--dry-run"]) == 0
+    assert "matched 6 of 6" in capsys.readouterr().out
+    assert main(["delete", "--db", path, "--created-to", "2021-01-01", "--batch-size", "4", "--pause", "0"]) == 0
+    assert "deleted 6 links" in capsys.readouterr().out
+
+    assert conn.execute("SELECT count(*) FROM urls").fetchone()[0] == 4
+    assert main(["delete", "--db", path, "--domain", "ab"]) == 2
+    conn.close()
+
+
+def test_deleted_by_other_worker_expires_from_cache(client, admin_headers, monkeypatch):
+    """Ссылка под нагрузкой, удаленная заданием другого воркера, отдает 404 после ttl кэша"""
+    code = _shorten(client, "https://busy.test/1")
+    for _ in range(3):
+        assert client.get(f"/{code}").status_code == 200
+        _age(link_cache, link_cache.ttl / 4)
+
+    with monkeypatch.context() as m:
+        # Задание выполняет другой воркер: кэш этого процесса оно не сбрасывает
+        m.setattr(link_cache, "discard", lambda codes: None)
+        body = {"url_prefix": "https://busy.test/"}
+        job_id = client.post("/admin/links/delete", headers=admin_headers, json=body).json()["job_id"]
+        for _ in range(100):
+            status = client.get(f"/admin/links/delete/{job_id}", headers=admin_headers).json()
+            if not status["running"]:
+                break
+            time.sleep(0.02)
+    assert status["deleted"] == 1
+    assert link_cache.get(code) is not None
+
+    _age(link_cache, link_cache.ttl)
+    assert link_cache.get(code) is None
+    assert client.get(f"/{code}").status_code == 404
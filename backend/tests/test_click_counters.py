@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.session import _column_names, get_db, init_schema
+
+
+def test_migrates_clicks_column(tmp_path):
+    """Счетчики из urls.clicks переносятся в url_clicks, колонка удаляется"""
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        """
+        CREATE TABLE urls (
+            id INTEGER PRIMARY KEY,
+            original_url TEXT NOT NULL UNIQUE,
+            short_code TEXT NOT NULL,
+            short_url TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            clicks INT NOT NULL DEFAULT 0,
+            expires_at DATETIME DEFAULT NULL,
+            updated_at INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO urls (original_url, short_code, short_url, clicks) VALUES (?, ?, ?, ?)",
+        [("https://old.test/a", "a", "http://sho.rt/a", 5), ("https://old.test/b", "b", "http://sho.rt/b", 0)],
+    )
+    conn.commit()
+
+    init_schema(conn)
+
+    assert "clicks" not in _column_names(conn, "urls")
+    assert [tuple(row) for row in conn.execute("SELECT link_id, clicks FROM url_clicks")] == [(1, 5)]
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_click_touches_only_counter(client):
+    """Клик меняет url_clicks, строка urls остается прежней; удаление убирает счетчик"""
+    url = "https://clicks.test/narrow"
+    code = client.post("/shorten", json={"url": url}).json()["code"]
+    record = UrlInfoDbClient.get_by_id(url)
+    with get_db(db_path) as conn:
+        before = tuple(conn.execute("SELECT * FROM urls WHERE id = ?", (record.id,)).fetchone())
+
+    client.get(f"/{code}")
+    assert await UrlInfoDbClient.increment_clicks(record.id)
+
+    with get_db(db_path) as conn:
+        assert tuple(conn.execute("SELECT * FROM urls WHERE id = ?", (record.id,)).fetchone()) == before
+    assert UrlInfoDbClient.get_by_id(url).clicks == 2
+
+    assert await UrlInfoDbClient.delete_by_id(url)
+    assert not await UrlInfoDbClient.increment_clicks(record.id)
+    with get_db(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM url_clicks WHERE link_id = ?", (record.id,)).fetchone() is None
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from src.cli import code_index as code_index_command
+from src.db.code_index import CodeIndex, build_code_index
+from src.db.session import init_schema
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    conn = sqlite3.connect(tmp_path / "links.db")
+    conn.row_factory = sqlite3.Row
+    init_schema(conn)
+    conn.executemany(
+        "INSERT INTO urls (id, short_url, original_url, url_hash, short_code) VALUES (?, ?, ?, ?, ?)",
+        [(i + 1, f"http://sho.rt/c{i}", f"https://idx.test/пример/{i}", bytes([i]), f"c{i}") for i in range(100)]
+    )
+    conn.executemany("INSERT INTO url_clicks (link_id, clicks) VALUES (?, ?)", [(i + 1, i) for i in range(1, 100)])
+    conn.execute(
+        "INSERT INTO urls (short_url, original_url, url_hash, short_code, expires_at) "
+        "VALUES ('http://sho.rt/gone', 'https://idx.test/gone', x'ff', 'gone', '2000-01-01 00:00:00')"
+    )
+    conn.commit()
+    path = str(tmp_path / "links.idx")
+    assert build_code_index(conn, path) == 100
+    conn.close()
+    return path
+
+
+def test_lookup(index_path):
+    """Все коды находятся, отсутствующие и истекшие - нет"""
+    index = CodeIndex(index_path)
+    try:
+        for i in range(100):
+            record = index.get(f"c{i}")
+            assert record.original_url == f"https://idx.test/пример/{i}"
+            assert record.clicks == i
+        assert index.get("missing") is None
+        assert index.get("gone") is None
+        assert len(index) == 100
+    finally:
+        index.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        CodeIndex(str(path))
+
+
+def test_cli_builds_from_read_only_snapshot(tmp_path, index_path):
+    """Сборка из CLI не пишет в исходную базу и работает с файлом только на чтение"""
+    db = tmp_path / "links.db"
+    with sqlite3.connect(db) as conn:
+        # Снимок старой версии: миграция вернула бы таблицу
+        conn.execute("DROP TABLE sync_clock")
+        schema = conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall()
+    os.chmod(db, stat.S_IRUSR)
+    try:
+        args = argparse.Namespace(action="build", db=str(db), index=str(tmp_path / "cli.idx"), code=None)
+        assert code_index_command.run(args) == 0
+    finally:
+        os.chmod(db, stat.S_IRUSR | stat.S_IWUSR)
+    assert sqlite3.connect(db).execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall() == schema
+
+    index = CodeIndex(str(tmp_path / "cli.idx"))
+    try:
+        assert len(index) == 100
+    finally:
+        index.close()
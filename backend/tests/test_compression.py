@@ -0,0 +1,102 @@
+import io
+import sqlite3
+
+import pytest
+
+from src.cli import compression
+from src.cli.import_urls import import_urls, read_ndjson
+from src.db import compression as codec_module
+from src.db.compression import UrlCodec, zstd
+from src.db.recompress import RecompressionJob
+from src.db.session import init_schema
+
+needs_zstd = pytest.mark.skipif(zstd is None, reason="zstandard не установлен")
+
+
+def _urls(count):
+    return [f"https://shop.test/catalog/item?id={i}&utm_source=mail&utm_medium=email" for i in range(count)]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(tmp_path / "compress.db", isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    lines = "".join(f'{{"url": "{url}"}}\n' for url in _urls(500))
+    import_urls(connection, read_ndjson(io.StringIO(lines)), "ndjson", "http://sho.rt")
+    yield connection
+    connection.close()
+
+
+@needs_zstd
+def test_train_and_recompress(conn, tmp_path):
+    """После обучения словаря строки хранятся сжатыми и распаковываются без потерь"""
+    codec = UrlCodec(str(tmp_path / "compress.db"), level=3, enabled=True)
+    codec.reload(conn)
+    version = compression.train(conn, codec, sample_size=500, dict_size=4096)
+
+    assert compression.recompress(conn, codec, batch_size=100) == 500
+    rows = conn.execute("SELECT original_url, dict_version FROM urls ORDER BY id").fetchall()
+    assert {row["dict_version"] for row in rows} == {version}
+    assert [codec.decode(row[0], row[1]) for row in rows] == _urls(500)
+
+    report = compression.stats(conn, codec, sample_size=500)
+    assert report["ratio"] > 1.5
+
+
+@needs_zstd
+def test_import_uses_current_dictionary(conn, tmp_path):
+    """Импорт сжимает новые ссылки текущим словарем и не дублирует старые"""
+    codec = UrlCodec(str(tmp_path / "compress.db"), level=3, enabled=True)
+    codec.reload(conn)
+    version = compression.train(conn, codec, sample_size=500, dict_size=4096)
+
+    lines = '{"url": "https://shop.test/catalog/item?id=1&utm_source=mail&utm_medium=email"}\n'
+    lines += '{"url": "https://shop.test/catalog/item?id=9999&utm_source=mail&utm_medium=email"}\n'
+    stats = import_urls(conn, read_ndjson(io.StringIO(lines)), "more", "http://sho.rt")
+
+    assert (stats.inserted, stats.duplicates) == (1, 1)
+    row = conn.execute("SELECT dict_version FROM urls ORDER BY id DESC LIMIT 1").fetchone()
+    assert row["dict_version"] == version
+
+
+@needs_zstd
+@pytest.mark.asyncio
+async def test_lookup_after_recompression(client):
+    """Сокращение и переход работают со сжатыми ссылками"""
+    url = "https://compress.test/landing?campaign=autumn"
+    code = client.post("/shorten", json={"url": url}).json()["code"]
+    for i in range(300):
+        client.post("/shorten", json={"url": f"https://compress.test/landing?campaign={i}"})
+
+    job = RecompressionJob(interval=60, batch_size=50, pause=0)
+    assert await job.train(min_samples=1) is not None
+    assert await job.recompress() >= 1
+
+    assert client.post("/shorten", json={"url": url}).json()["code"] == code
+    response = client.get(f"/{code}")
+    assert response.status_code == 200
+    assert url in response.text
+
+
+def test_compressed_rows_need_zstd(tmp_path, monkeypatch):
+    """Без zstandard база со сжатыми строками дает понятную ошибку при запуске"""
+    conn = sqlite3.connect(tmp_path / "stored.db", isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    init_schema(conn)
+    codec = UrlCodec(str(tmp_path / "stored.db"), level=3, enabled=True)
+    monkeypatch.setattr(codec_module, "zstd", None)
+
+    conn.execute("INSERT INTO url_dictionaries (dictionary, sample_size) VALUES (x'00', 1)")
+    conn.execute(
+        "INSERT INTO urls (original_url, short_code, short_url, url_hash) VALUES ('https://plain.test', 'p', 'p', x'01')"
+    )
+    codec.check_stored(conn)
+    conn.execute(
+        "INSERT INTO urls (original_url, short_code, short_url, url_hash, dict_version) VALUES (x'28b5', 'z', 'z', x'02', 1)"
+    )
+    with pytest.raises(RuntimeError, match="zstandard"):
+        codec.check_stored(conn)
+    with pytest.raises(RuntimeError, match="zstandard"):
+        codec.decode(b"\x28\xb5", 1)
+    assert codec.decode("https://plain.test", None) == "https://plain.test"
+    conn.close()
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from src.core.config import settings
+from src.db.session import get_db
+from src.services.domain_stats import CountMinSketch, DomainStats, DomainStatsPersister, SpaceSaving
+
+
+def test_count_min_sketch_never_underestimates():
+    """Оценка скетча не меньше истинного значения и в пределах e / w * N"""
+    sketch = CountMinSketch(width=64, depth=4)
+    truth = {f"host{i}.test": i + 1 for i in range(200)}
+    for host, count in truth.items():
+        sketch.add(host, count)
+
+    for host, count in truth.items():
+        assert count <= sketch.estimate(host) <= count + sketch.epsilon * sketch.total * 3
+
+    restored = CountMinSketch.from_bytes(sketch.to_bytes(), 64, 4, sketch.total)
+    assert restored.estimate("host7.test") == sketch.estimate("host7.test")
+
+
+def test_space_saving_keeps_heavy_hitters():
+    """Домены с долей больше 1 / k остаются в top-K, ошибка не больше N / k"""
+    summary = SpaceSaving(capacity=10)
+    for i in range(1000):
+        summary.add("big.test" if i % 3 == 0 else f"tail{i}.test")
+
+    host, count, error = summary.top(1)[0]
+    assert host == "big.test"
+    assert count - error <= 334 <= count
+    assert error <= summary.max_error
+
+
+def test_space_saving_eviction_matches_full_scan():
+    """Вытеснение через кучу выбирает тот же минимум, что и полный перебор"""
+    rng = random.Random(7)
+    summary = SpaceSaving(capacity=16)
+    for _ in range(5000):
+        key = f"k{int(rng.paretovariate(1.2)) % 200}"
+        if len(summary) == summary.capacity and key not in summary._counters:
+            assert summary.floor == min(counter[0] for counter in summary._counters.values())
+        summary.add(key)
+    assert sum(count - error for _, count, error in summary.top(16)) <= summary.total
+
+
+def test_space_saving_merge_keeps_bounds():
+    """После слияния истинное значение ключа лежит в [count - error, count]"""
+    rng = random.Random(3)
+    parts = [SpaceSaving(capacity=8) for _ in range(3)]
+    truth = {}
+    for _ in range(3000):
+        part = rng.choice(parts)
+        key = f"k{int(rng.paretovariate(1.1)) % 50}"
+        part.add(key)
+        truth[key] = truth.get(key, 0) + 1
+
+    merged = SpaceSaving.merge(parts, 8)
+    assert merged.total == 3000
+    for key, count, error in merged.top(8):
+        assert count - error <= truth[key] <= count
+
+
+def test_domain_stats_snapshot_roundtrip():
+    """Снимок восстанавливается в новый экземпляр"""
+    stats = DomainStats(width=128, depth=3, top_k=5)
+    for i in range(20):
+        stats.record_click(f"https://Example.test/page/{i}")
+    stats.record_link("https://other.test/")
+
+    columns = ("kind", "width", "depth", "total", "sketch", "top", "updated_at")
+    rows = [dict(zip(columns, row)) for row in stats.dump(stats.take_pending())]
+    restored = DomainStats(width=128, depth=3, top_k=5)
+    restored.restore(restored.parse(rows))
+
+    assert restored.top("clicks", 1) == [("example.test", 20, 0)]
+    assert restored.estimate("links", "OTHER.test") >= 1
+
+
+@pytest.mark.asyncio
+async def test_domains_endpoint(client):
+    """Эндпоинт отдает top-K и границы ошибки"""
+    code = client.post("/shorten", json={"url": "https://heavy.test/a"}).json()["code"]
+    for _ in range(3):
+        client.get(f"/{code}")
+
+    data = client.get("/stats/domains", params={"kind": "clicks"}).json()
+    assert {"host": "heavy.test", "count": 3, "error": 0} in data["items"]
+    assert data["bounds"]["top_k"] > 0
+
+    estimate = client.get("/stats/domains/heavy.test", params={"kind": "links"}).json()
+    assert estimate["estimate"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_workers_add_up(client):
+    """Приращения нескольких воркеров складываются, а не затирают друг друга"""
+    with get_db(settings.DB_PATH) as conn:
+        conn.execute("DELETE FROM domain_stats")
+        conn.commit()
+    workers = [DomainStats(width=64, depth=3, top_k=4) for _ in range(3)]
+    persisters = [DomainStatsPersister(stats, interval=60) for stats in workers]
+    for persister in persisters:
+        await persister.load()
+
+    for i, stats in enumerate(workers):
+        for _ in range(10 + i):
+            stats.record_click("https://shared.test/")
+        stats.record_click(f"https://only{i}.test/")
+    for persister in persisters:
+        await persister.save()
+    await persisters[0].save()
+
+    first = workers[0]
+    assert first.estimate("clicks", "shared.test") == 33
+    assert first.top("clicks", 1) == [("shared.test", 33, 0)]
+    assert first.bounds("clicks")["total"] == 36
+    assert not first.dirty
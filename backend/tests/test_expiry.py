@@ -0,0 +1,57 @@
+import pytest
+from fastapi import status
+
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.reaper import ExpiredUrlReaper
+from src.db.session import get_db
+from src.services.link_cache import link_cache
+from src.utils.generators import url_digest
+
+
+def _expire(original_url: str):
+    """Переносит срок жизни ссылки в прошлое"""
+    with get_db(db_path) as conn:
+        conn.execute(
+            "UPDATE urls SET expires_at = datetime('now', '-1 minute') WHERE url_hash = ?",
+            (url_digest(original_url),)
+        )
+        conn.commit()
+    # Изменение в обход приложения: кэш узнал бы о нем только через ttl
+    link_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_shorten_with_ttl(client):
+    """Ссылка со сроком жизни возвращает момент истечения"""
+    response = client.post(
+        "/shorten",
+        json={"url": "https://ttl.test/page", "ttl_seconds": 3600}
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["expires_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_shorten_expiry_in_past(client):
+    """Момент истечения в прошлом отклоняется"""
+    response = client.post(
+        "/shorten",
+        json={"url": "https://ttl.test/past", "expires_at": "2000-01-01T00:00:00Z"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_expired_link_not_found(client):
+    """Просроченная ссылка не находится, а reaper удаляет ее"""
+    url = "https://ttl.test/expired"
+    code = client.post("/shorten", json={"url": url, "ttl_seconds": 60}).json()["code"]
+    assert client.get(f"/{code}").status_code == 200
+
+    _expire(url)
+    assert client.get(f"/{code}").status_code == 404
+
+    reaper = ExpiredUrlReaper(interval=60, batch_size=1, pause=0)
+    assert await reaper.reap() >= 1
+    assert await UrlInfoDbClient.delete_expired(10) == 0
@@ -0,0 +1,28 @@
+from src.services.hashing import PasswordHasher, hash_password_sync, verify_password_sync
+
+
+def test_hash_and_verify():
+    """Хеш проверяется только исходным паролем"""
+    hashed = hash_password_sync("secret", 2**10, 8, 1)
+    assert verify_password_sync("secret", hashed)
+    assert not verify_password_sync("wrong", hashed)
+    assert not verify_password_sync("secret", "$2b$12$legacy")
+
+
+def test_needs_rehash_on_changed_parameters():
+    """Хеш со старыми параметрами или другого формата требует пересчета"""
+    hasher = PasswordHasher(workers=1, concurrency=1, n=2**11, r=8, p=1)
+    assert hasher.needs_rehash(hash_password_sync("secret", 2**10, 8, 1))
+    assert hasher.needs_rehash("$2b$12$legacy")
+    assert not hasher.needs_rehash(hash_password_sync("secret", 2**11, 8, 1))
+
+
+async def test_hash_in_pool():
+    """Хеширование и проверка через пул процессов"""
+    hasher = PasswordHasher(workers=1, concurrency=2, n=2**10, r=8, p=1)
+    try:
+        hashed = await hasher.hash("secret")
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("secret", "$2b$12$legacy")
+    finally:
+        await hasher.shutdown()
@@ -0,0 +1,58 @@
+import pytest
+
+from src.services.hot_links import HotLinks
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_windows_slide():
+    """Просмотры выпадают из окна после его окончания"""
+    clock = _Clock()
+    hot = HotLinks(capacity=10, clock=clock)
+    for _ in range(5):
+        hot.hit("old")
+    clock.now += 120
+    for _ in range(3):
+        hot.hit("new")
+
+    items, total = hot.top("1m", 10)
+    assert items == [("new", 3, 0)] and total == 3
+    items, total = hot.top("5m", 10)
+    assert [code for code, _, _ in items] == ["old", "new"] and total == 8
+
+    clock.now += 3600
+    assert hot.top("1h", 10) == ([], 0)
+
+
+def test_window_bound_counts_full_buckets():
+    """Ключ, вытесненный из заполненной корзины, не выходит за [hits - error, hits]"""
+    clock = _Clock()
+    hot = HotLinks(capacity=2, clock=clock)
+    for code in ("a", "a", "a", "b", "b", "c", "c", "c"):
+        hot.hit(code)
+    clock.now += 10
+    for code in ("a", "d", "d", "d", "e", "e"):
+        hot.hit(code)
+
+    truth = {"a": 4, "b": 2, "c": 3, "d": 3, "e": 2}
+    items, total = hot.top("1m", 2)
+    assert total == 14
+    for code, hits, error in items:
+        assert hits - error <= truth[code] <= hits
+
+
+@pytest.mark.asyncio
+async def test_hot_endpoint(client):
+    """Эндпоинт показывает просматриваемую ссылку"""
+    code = client.post("/shorten", json={"url": "https://hot.test/a"}).json()["code"]
+    for _ in range(4):
+        client.get(f"/{code}")
+
+    data = client.get("/stats/hot", params={"window": "1m"}).json()
+    assert {"short_code": code, "hits": 4, "error": 0} in data["items"]
@@ -0,0 +1,71 @@
+import io
+import sqlite3
+
+import pytest
+
+from src.cli import import_urls as import_command
+from src.cli.__main__ import main
+from src.cli.import_urls import ImportStats, import_urls, read_csv, read_ndjson
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(tmp_path / "import.db", isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    yield connection
+    connection.close()
+
+
+def _interrupt_after(rows, count):
+    """Итератор, падающий после count строк, как прерванный импорт"""
+    for i, row in enumerate(rows):
+        if i == count:
+            raise KeyboardInterrupt
+        yield row
+
+
+def test_import_csv(conn):
+    """Импорт CSV: невалидные строки и дубликаты не вставляются"""
+    stream = io.StringIO("url\nhttps://a.test/1\nnot-a-url\nhttps://a.test/2\nhttps://a.test/1\n")
+    stats = import_urls(conn, read_csv(stream), "csv", "http://sho.rt", batch_size=2)
+
+    assert (stats.read, stats.inserted, stats.duplicates, stats.invalid) == (4, 2, 1, 1)
+    codes = [row["short_code"] for row in conn.execute("SELECT short_code FROM urls")]
+    assert len(set(codes)) == 2
+    indexes = {row["name"] for row in conn.execute("PRAGMA index_list(urls)")}
+    assert "idx_urls_short_code" in indexes
+
+
+def test_import_resumes_from_checkpoint(conn):
+    """Прерванный импорт продолжается с последнего чекпоинта"""
+    lines = "".join(f'{{"url": "https://b.test/{i}"}}\n' for i in range(10))
+
+    with pytest.raises(KeyboardInterrupt):
+        import_urls(
+            conn, _interrupt_after(read_ndjson(io.StringIO(lines)), 7), "nd", "http://sho.rt",
+            batch_size=3,
+        )
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 6
+
+    stats = import_urls(conn, read_ndjson(io.StringIO(lines)), "nd", "http://sho.rt", batch_size=3)
+    assert stats.resumed_from == 6
+    assert stats.inserted == 4
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 10
+
+
+def test_cli_keeps_indexes_of_serving_db(tmp_path, monkeypatch):
+    """Импорт в базу работающего сервиса по умолчанию не трогает индексы"""
+    calls = []
+
+    def fake_import(*args, **kwargs):
+        calls.append(kwargs)
+        return ImportStats()
+
+    monkeypatch.setattr(import_command, "import_urls", fake_import)
+    source = tmp_path / "links.csv"
+    source.write_text("url\nhttps://c.test/1\n")
+
+    main(["import", str(source), "--base-url", "http://sho.rt"])
+    main(["import", str(source), "--base-url", "http://sho.rt", "--db", str(tmp_path / "other.db")])
+    main(["import", str(source), "--base-url", "http://sho.rt", "--defer-indexes"])
+    assert [kwargs["defer_indexes"] for kwargs in calls] == [False, True, True]
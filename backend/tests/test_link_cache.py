@@ -0,0 +1,101 @@
+import pytest
+
+from src.db.clients.lite_client import db_path
+from src.db.session import get_db, warm_link_cache
+from src.schemas.common import LinkRecord
+from src.services.link_cache import LinkCache, link_cache
+from src.utils.generators import build_short_url
+
+
+def _record(code, **extra):
+    return LinkRecord(code, build_short_url("http://sho.rt", code), "https://a.test", **extra)
+
+
+def test_lru_eviction_and_expiry(tmp_path):
+    """Старые записи вытесняются, просроченные ссылки не отдаются"""
+    cache = LinkCache(max_size=2, ttl=60, snapshot_path=str(tmp_path / "warm"), warm_keys=10)
+    cache.put(_record("a"))
+    cache.put(_record("b"))
+    cache.get("a")
+    cache.put(_record("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    cache.put(_record("old", expires_ms=946684800000))
+    assert cache.get("old") is None
+
+
+def _age(cache, seconds):
+    """Сдвинуть сроки жизни записей, как если бы прошло seconds секунд"""
+    for code, (record, deadline) in cache._entries.items():
+        cache._entries[code] = (record, deadline - seconds)
+
+
+def test_clicks_do_not_extend_ttl(tmp_path):
+    """Запись, обновляемая переходами, все равно истекает через ttl"""
+    cache = LinkCache(max_size=10, ttl=60, snapshot_path=str(tmp_path / "warm"), warm_keys=10)
+    cache.put(_record("hot", clicks=1))
+    for _ in range(2):
+        _age(cache, 20)
+        cache.add_click(cache.get("hot"))
+    assert cache.get("hot").clicks == 3
+
+    _age(cache, 20)
+    assert cache.get("hot") is None
+    cache.add_click(_record("hot", clicks=3))
+    assert cache.get("hot").clicks == 4
+
+
+def test_snapshot_roundtrip(tmp_path):
+    """Снимок хранит коды в порядке от самых горячих"""
+    cache = LinkCache(max_size=10, ttl=60, snapshot_path=str(tmp_path / "warm"), warm_keys=2)
+    for code in ("x", "y", "z"):
+        cache.put(_record(code))
+
+    assert cache.dump() == 2
+    assert cache.load_snapshot() == ["z", "y"]
+
+
+@pytest.mark.asyncio
+async def test_warm_start_after_restart(client):
+    """После перезапуска горячий код отдается из кэша без обращения к базе"""
+    code = client.post("/shorten", json={"url": "https://warm.test/a"}).json()["code"]
+    client.get(f"/{code}")
+    link_cache.dump()
+
+    link_cache.clear()
+    warm_link_cache()
+
+    record = link_cache.get(code)
+    assert record is not None and record.original_url == "https://warm.test/a"
+
+
+def test_link_record_shares_base_url():
+    """Записи ссылок одного хоста хранят один объект base_url, а не short_url"""
+    base_url = "".join(["http://", "sho.rt"])
+    first = LinkRecord("abc", build_short_url(base_url, "abc"), "https://a.test", created_ms=1_700_000_000_000)
+    second = LinkRecord("xyz", build_short_url("http://sho.rt", "xyz"), "https://b.test")
+    assert first._base_url is second._base_url and first._short_url is None
+    assert not hasattr(first, "__dict__")
+
+    clicked = first.with_clicks(5)
+    assert (first.clicks, clicked.clicks) == (0, 5)
+    assert clicked.short_url == build_short_url("http://sho.rt", "abc")
+    assert clicked.created_at.timestamp() == 1_700_000_000
+
+    custom = LinkRecord("abc", "http://sho.rt/abc", "https://a.test")
+    assert custom.short_url == "http://sho.rt/abc" and custom._base_url is None
+
+
+def test_deleted_behind_cache_is_not_found(client):
+    """Закэшированная ссылка, удаленная другим процессом, отдает 404 и уходит из кэша"""
+    code = client.post("/shorten", json={"url": "https://gone.test/a"}).json()["code"]
+    assert client.get(f"/{code}").status_code == 200
+    with get_db(db_path) as conn:
+        conn.execute("DELETE FROM urls WHERE short_code = ?", (code,))
+        conn.commit()
+
+    assert link_cache.get(code) is not None
+    assert client.get(f"/{code}").status_code == 404
+    assert code not in link_cache._entries
@@ -0,0 +1,72 @@
+import json
+import logging
+
+from src.core.log_manager import JsonLinesFormatter, LogLimiter, LogManager
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampling_per_endpoint():
+    """Эндпоинт со своей долей семплируется отдельно от остального логгера"""
+    limiter = LogLimiter({"network": 0.5, "network:/shorten": 0.1}, {})
+
+    shorten = [limiter.check("network", "/shorten")[0] for _ in range(100)]
+    other = [limiter.check("network", "/abc")[0] for _ in range(100)]
+    errors = [limiter.check("network_errors", "/shorten")[0] for _ in range(10)]
+
+    assert sum(shorten) == 10
+    assert sum(other) == 50
+    assert all(errors)
+
+
+def test_rate_limit_reports_suppressed():
+    """Сверх лимита сообщения подавляются, их число приходит со следующей записью"""
+    clock = _Clock()
+    limiter = LogLimiter({}, {"network": 2}, clock=clock)
+
+    results = [limiter.check("network", "/x") for _ in range(5)]
+    assert results == [(True, 0), (True, 0), (False, 0), (False, 0), (False, 0)]
+
+    clock.now += 1
+    assert limiter.check("network", "/x") == (True, 3)
+    limiter.check("network", "/x")
+    limiter.check("network", "/x")
+    assert limiter.drain() == {"network": 1}
+
+
+def test_json_lines_formatter():
+    """JSON-формат содержит структурированные поля вместо repr в тексте"""
+    record = logging.LogRecord("network", logging.INFO, __file__, 1, "hit", None, None)
+    record.fields = {"endpoint": "/shorten", "data": {"url": "https://a.test"}}
+
+    entry = json.loads(JsonLinesFormatter().format(record))
+    assert entry["logger"] == "network"
+    assert entry["message"] == "hit"
+    assert entry["data"] == {"url": "https://a.test"}
+
+
+def test_text_built_only_when_logged(monkeypatch):
+    """Подавленное сообщение не форматирует данные"""
+    class Payload:
+        def __repr__(self):
+            raise AssertionError("repr должен вызываться только для записанных сообщений")
+
+    monkeypatch.setattr(LogManager, "limiter", LogLimiter({"network": 0.0}, {}))
+    LogManager.sync_log_network_info("/shorten", "skip", {"payload": Payload()})
+
+
+def test_link_views_share_one_rule(client, monkeypatch):
+    """Просмотры всех кодов попадают под правило шаблона маршрута"""
+    codes = [
+        client.post("/shorten", json={"url": f"https://logs.test/{i}"}).json()["code"] for i in range(3)
+    ]
+    monkeypatch.setattr(LogManager, "limiter", LogLimiter({"network:/{short_code}": 0.0}, {}))
+    for code in codes:
+        assert client.get(f"/{code}").status_code == 200
+    assert LogManager.limiter.drain() == {"network:/{short_code}": 3}
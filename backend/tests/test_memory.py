@@ -0,0 +1,47 @@
+from src.core.config import settings
+from src.services.memory import MemoryWatch
+
+
+def test_growth_flagged_only_when_steady():
+    """Рост помечается при росте почти в каждом замере, разовый скачок - нет"""
+    watch = MemoryWatch(interval=60, window=6, growth_ratio=0.1)
+    for rss in (100, 300, 300, 300, 300, 300):
+        watch.record(rss)
+    assert not watch.growing
+
+    for rss in (100, 105, 110, 116, 122, 130):
+        watch.record(rss)
+    assert watch.growing
+
+
+def test_memory_report(client, admin_headers):
+    """Отчет содержит RSS и размеры подсистем"""
+    report = client.get("/admin/memory", headers=admin_headers).json()
+    assert report["rss_bytes"] > 0
+    assert report["subsystems"]["log.loggers"] >= 4
+    assert "sqlite.open_connections" in report["subsystems"]
+
+
+def test_tracemalloc_diff(client, admin_headers):
+    """После базового снимка diff показывает прирост по строкам"""
+    assert client.get("/admin/memory/diff", headers=admin_headers).status_code == 409
+    client.post("/admin/memory/tracemalloc/start", headers=admin_headers)
+    try:
+        leak = [bytearray(1024) for _ in range(1000)]
+        diff = client.get("/admin/memory/diff", headers=admin_headers, params={"limit": 50}).json()
+        assert any("test_memory.py" in item["where"] and item["size_diff"] > 0 for item in diff)
+        assert client.get("/admin/memory/top", headers=admin_headers).status_code == 200
+        del leak
+    finally:
+        client.post("/admin/memory/tracemalloc/stop", headers=admin_headers)
+
+
+def test_admin_requires_token(client, admin_headers, monkeypatch):
+    """Без верного токена доступа нет, без ADMIN_TOKEN эндпоинтов нет вовсе"""
+    assert client.get("/admin/memory").status_code == 403
+    assert client.get("/admin/memory", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/admin/links/delete", json={"domain": "a.test"}).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/admin/memory", headers=admin_headers).status_code == 404
+    assert client.post("/admin/capture/start", headers={"X-Admin-Token": ""}).status_code == 404
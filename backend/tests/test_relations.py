@@ -0,0 +1,78 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from src.db.clients import user_client
+from src.db.clients.user_client import UserDbClient, db_path
+from src.db.relations import RELATION_TABLES, USER_RELATIONS, parse_relations
+from src.db.session import get_db
+from src.services.auth import create_access_token
+
+
+def test_parse_relations():
+    """Пустой параметр - все связи, повторы убираются, порядок сохраняется"""
+    assert parse_relations(None) == USER_RELATIONS
+    assert parse_relations("notes, routes,notes") == ("notes", "routes")
+
+
+def test_parse_unknown_relation():
+    with pytest.raises(ValueError):
+        parse_relations("routes,passwords")
+
+
+@pytest.fixture
+def selects(monkeypatch):
+    """SELECT-запросы, выполненные клиентом пользователей"""
+    statements = []
+
+    @contextmanager
+    def traced_db(path, *args, **kwargs):
+        with get_db(path, *args, **kwargs) as conn:
+            conn.set_trace_callback(statements.append)
+            yield conn
+
+    monkeypatch.setattr(user_client, "get_db", traced_db)
+    return lambda: [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+async def _user_with_rows(login, rows_per_relation):
+    user = await UserDbClient.process({"login": login})
+    with get_db(db_path) as conn:
+        for table in RELATION_TABLES.values():
+            conn.executemany(
+                f"INSERT INTO {table} (user_id, data) VALUES (?, ?)",
+                [(user.id, json.dumps({"n": n})) for n in range(rows_per_relation)]
+            )
+        conn.commit()
+    return user
+
+
+@pytest.mark.asyncio
+async def test_relations_query_count(client, selects):
+    """1 запрос на пользователей + 1 на каждую связь, независимо от числа строк и пользователей"""
+    users = [await _user_with_rows(f"relations-{n}", rows) for n, rows in enumerate((1, 5, 20))]
+
+    profile = UserDbClient.get_by_id_with_relations(users[2].id)
+    assert len(selects()) == 1 + len(USER_RELATIONS)
+    assert [row["n"] for row in profile["routes"]] == list(range(20))
+
+    before = len(selects())
+    profiles = UserDbClient.get_many_with_relations([user.id for user in users], ("routes", "notes"))
+    assert len(selects()) - before == 3
+    assert [len(profile["notes"]) for profile in profiles] == [1, 5, 20]
+    assert "trains" not in profiles[0]
+
+
+@pytest.mark.asyncio
+async def test_get_profile_fields(client):
+    """GET /auth?fields= отдает только запрошенные связи"""
+    user = await _user_with_rows("relations-api", 2)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+    response = client.get("/auth", params={"fields": "notes"}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user"]["login"] == "relations-api" and "hashed_password" not in body["user"]
+    assert len(body["notes"]) == 2 and body["routes"] is None
+    assert client.get("/auth", params={"fields": "passwords"}, headers=headers).status_code == 400
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.search import search_backfill
+from src.db.session import get_db
+from src.utils.generators import url_digest
+
+
+def _shorten(client, url):
+    return client.post("/shorten", json={"url": url}).json()["code"]
+
+
+def test_search_by_substring_with_pages(client):
+    """Подстрока домена находит ссылки постранично, без дублей"""
+    codes = {_shorten(client, f"https://Search-Docs.test/guide/{i}") for i in range(5)}
+    _shorten(client, "https://other.test/search-docs")
+
+    found, cursor = [], None
+    while True:
+        params = {"q": "search-docs.test/guide", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/search/urls", params=params).json()
+        found += [item["short_code"] for item in page["items"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+
+    assert sorted(found) == sorted(codes)
+    assert client.get("/search/urls", params={"q": "ab"}).status_code == 422
+
+
+def test_stream(client):
+    """Поток отдает все совпадения по одной JSON-строке"""
+    for i in range(3):
+        _shorten(client, f"https://stream.test/item/{i}")
+
+    response = client.get("/search/urls/stream", params={"q": "stream.test/item"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert {line["original_url"] for line in lines} == {f"https://stream.test/item/{i}" for i in range(3)}
+    assert client.get("/search/urls/stream", params={"q": "no-such-link.test"}).text == ""
+
+
+@pytest.mark.asyncio
+async def test_delete_and_backfill(client):
+    """Удаление убирает ссылку из индекса, backfill дописывает строки, вставленные в обход process"""
+    url = "https://backfill.test/gone"
+    _shorten(client, url)
+    assert await UrlInfoDbClient.delete_by_id(url)
+    assert UrlInfoDbClient.search("backfill.test/gone", 10) == []
+
+    with get_db(db_path) as conn:
+        conn.execute(
+            "INSERT INTO urls (short_url, original_url, url_hash, short_code) VALUES (?, ?, ?, ?)",
+            ("http://sho.rt/imp", "https://backfill.test/imported", url_digest("https://backfill.test/imported"), "imp"),
+        )
+        conn.commit()
+    assert UrlInfoDbClient.search("backfill.test/imported", 10) == []
+
+    assert await search_backfill.backfill() >= 1
+    assert [hit["short_code"] for hit in UrlInfoDbClient.search("backfill.test/imported", 10)] == ["imp"]
+    assert await search_backfill.backfill() == 0
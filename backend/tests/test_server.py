@@ -0,0 +1,111 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork-сервер работает только на POSIX")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str) -> int:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+        return response.status
+
+
+def _wait_ready(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return _get(port, "/ping")
+        except OSError:
+            time.sleep(0.2)
+    raise AssertionError("сервер не поднялся")
+
+
+def _children(pid: int) -> set:
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return set(path.read_text().split()) if path.exists() else set()
+
+
+@pytest.mark.parametrize("reuse_port", [False, True])
+def test_prefork_reload_and_graceful_stop(tmp_path, reuse_port):
+    port = _free_port()
+    db_path = tmp_path / "server.db"
+    env = {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "REAPER_ENABLED": "false",
+        "MEMORY_WATCH_ENABLED": "false",
+        "SERVER_GRACEFUL_TIMEOUT_SECONDS": "10",
+    }
+    args = [sys.executable, "-m", "src.server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"]
+    if reuse_port:
+        args.append("--reuse-port")
+    master = subprocess.Popen(args, cwd=BACKEND, env=env)
+    try:
+        assert _wait_ready(port) == 200
+        workers = _children(master.pid)
+
+        # Во время поочередного перезапуска сервер продолжает отвечать
+        master.send_signal(signal.SIGHUP)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and _children(master.pid) & workers:
+            assert _get(port, "/ping") == 200
+            time.sleep(0.1)
+        if workers:
+            assert not _children(master.pid) & workers
+        assert _get(port, "/ping") == 200
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
+
+    # shutdown-обработчики воркеров отработали: снимок кэша ссылок записан
+    assert Path(f"{db_path}.warm").exists()
+
+
+def test_failed_respawn_is_retried(monkeypatch):
+    """Воркер, не поднявшийся после падения, запускается повторно с паузой"""
+    from src import server
+
+    arbiter = server.Arbiter(app=None, host="127.0.0.1", port=0, workers=2)
+    arbiter.children = {101: 0, 102: 1}
+    exits = iter([(101, 256), (0, 0)])
+    monkeypatch.setattr(server.os, "waitpid", lambda pid, flags: next(exits))
+    results = iter([None, 201])
+
+    def spawn(index):
+        pid = next(results)
+        if pid is not None:
+            arbiter.children[pid] = index
+        return pid
+
+    monkeypatch.setattr(arbiter, "spawn", spawn)
+    arbiter._reap(stopping=False)
+    arbiter._respawn()
+    assert arbiter.missing == {0} and arbiter._respawn_at > time.monotonic()
+
+    # До истечения паузы новых попыток нет
+    arbiter._respawn()
+    assert arbiter.missing == {0}
+
+    arbiter._respawn_at = 0.0
+    arbiter._respawn()
+    assert not arbiter.missing and arbiter.children == {102: 1, 201: 0}
@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.main import app
+from src.services.single_flight import SingleFlight, shorten_flight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result():
+    """Одновременные вызовы с одним ключом выполняют операцию один раз"""
+    flight = SingleFlight("test")
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return runs
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert flight.stats() == {"in_flight": 0, "calls": 10, "coalesced": 9}
+    assert await flight.do("k", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_shorten_single_code(client):
+    """Одновременное сокращение одной ссылки возвращает один код"""
+    before = shorten_flight.coalesced
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(
+            async_client.post("/shorten", json={"url": "https://viral.test/post"}) for _ in range(20)
+        ))
+
+    assert len({r.json()["code"] for r in responses}) == 1
+    assert shorten_flight.coalesced > before
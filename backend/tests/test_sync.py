@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from src.db.clients.lite_client import UrlInfoDbClient
+from src.db.session import init_schema
+
+
+def _sync_all(client, since):
+    """Проходит все страницы и возвращает (коды, удаленные коды, watermark)"""
+    codes, deleted, cursor = [], [], None
+    while True:
+        params = {"since": since, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/sync/urls", params=params).json()
+        codes += [item["short_code"] for item in page["items"]]
+        deleted += [item["short_code"] for item in page["deleted"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            return codes, deleted, page["watermark"]
+
+
+@pytest.mark.asyncio
+async def test_sync_pages_and_tombstones(client):
+    """Синхронизация отдает изменения постранично и удаления после отметки"""
+    created = [
+        client.post("/shorten", json={"url": f"https://sync.test/{i}"}).json()["code"]
+        for i in range(5)
+    ]
+    codes, _, watermark = _sync_all(client, 0)
+    assert set(created) <= set(codes)
+    assert len(codes) == len(set(codes))
+
+    assert await UrlInfoDbClient.delete_by_id("https://sync.test/0")
+    client.get(f"/{created[1]}")
+
+    codes, deleted, _ = _sync_all(client, watermark)
+    assert codes == [created[1]]
+    assert deleted == [created[0]]
+
+
+@pytest.mark.asyncio
+async def test_sync_bad_cursor(client):
+    assert client.get("/sync/urls", params={"cursor": "garbage"}).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_deleted_id_is_not_reused(client):
+    """id удаленной ссылки с наибольшим id не достается новой ссылке"""
+    client.post("/shorten", json={"url": "https://sync.test/reuse-1"})
+    client.post("/shorten", json={"url": "https://sync.test/reuse-2"})
+    deleted_id = UrlInfoDbClient.get_by_id("https://sync.test/reuse-2").id
+    assert await UrlInfoDbClient.delete_by_id("https://sync.test/reuse-2")
+
+    client.post("/shorten", json={"url": "https://sync.test/reuse-3"})
+    assert UrlInfoDbClient.get_by_id("https://sync.test/reuse-3").id > deleted_id
+
+
+def test_change_stamps_follow_commit_order(client):
+    """Отметки изменений строго растут даже в пределах одной миллисекунды"""
+    for i in range(20):
+        client.post("/shorten", json={"url": f"https://sync.test/stamp-{i}"})
+    ids = [UrlInfoDbClient.get_by_id(f"https://sync.test/stamp-{i}").id for i in range(20)]
+    updated = {item.id: item.updated_at for item in UrlInfoDbClient.get_changes((0, 0), 10_000)}
+    stamps = [updated[link_id] for link_id in ids]
+    assert stamps == sorted(set(stamps))
+
+
+def test_migrate_to_autoincrement(tmp_path):
+    """
+    Старая таблица без AUTOINCREMENT и с UNIQUE на original_url пересоздается,
+    выданные id не повторяются
+    """
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(
+        """
+        CREATE TABLE urls (
+            id INTEGER PRIMARY KEY, original_url TEXT NOT NULL UNIQUE, short_code TEXT NOT NULL,
+            short_url TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME DEFAULT NULL, updated_at INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO urls (id, original_url, short_code, short_url, updated_at)
+        VALUES (1, 'https://old.test/1', 'a', 'http://s/a', 5), (2, 'https://old.test/2', 'b', 'http://s/b', 7);
+        CREATE TABLE url_tombstones (
+            id INTEGER PRIMARY KEY, link_id INTEGER NOT NULL, short_code TEXT NOT NULL,
+            deleted_at INTEGER NOT NULL
+        );
+        INSERT INTO url_tombstones (link_id, short_code, deleted_at) VALUES (9, 'z', 8);
+        """
+    )
+    init_schema(conn)
+
+    rows = conn.execute("SELECT id, short_code, url_hash IS NOT NULL FROM urls ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [(1, "a", 1), (2, "b", 1)]
+    indexes = conn.execute("SELECT name, \"unique\", origin FROM pragma_index_list('urls')").fetchall()
+    assert [tuple(row) for row in indexes if row["unique"]] == [("idx_urls_url_hash", 1, "c")]
+    conn.execute(
+        "INSERT INTO urls (original_url, short_code, short_url) VALUES ('https://old.test/3', 'c', 'http://s/c')"
+    )
+    assert conn.execute("SELECT id FROM urls WHERE short_code = 'c'").fetchone()[0] == 10
+    assert conn.execute("SELECT last FROM sync_clock").fetchone()[0] >= 8
+    conn.execute("DELETE FROM urls WHERE id = 1")
+    assert conn.execute("SELECT COUNT(*) FROM url_tombstones WHERE link_id = 1").fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,48 @@
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+from src.services.token_cache import VerifiedTokenCache, read_token_claims
+
+
+def _token(claims: dict) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    return f"header.{payload}.signature"
+
+
+def test_cache_hit_and_snapshot_copy():
+    """Повторный токен берется из кэша, снимок пользователя не портится"""
+    cache = VerifiedTokenCache(max_size=10, max_ttl=60)
+    token = _token({"sub": "1", "exp": time.time() + 60})
+    assert cache.get(token) is None
+
+    cache.put(token, read_token_claims(token), SimpleNamespace(id=1, email="a@b.c"))
+    first = cache.get(token)
+    first.user.email = None
+
+    assert cache.get(token).user.email == "a@b.c"
+    assert cache.stats()["hit_rate"] == 2 / 3
+
+
+def test_cache_respects_token_expiry():
+    """Истекший токен не кэшируется и не отдается"""
+    cache = VerifiedTokenCache(max_size=10, max_ttl=60)
+    token = _token({"sub": "1", "exp": time.time() - 1})
+    cache.put(token, read_token_claims(token), SimpleNamespace(id=1))
+    assert cache.get(token) is None
+
+
+def test_cache_invalidate_user_and_bound():
+    """Сброс по пользователю и вытеснение самых старых записей"""
+    cache = VerifiedTokenCache(max_size=2, max_ttl=60)
+    tokens = [_token({"sub": str(i), "n": i}) for i in range(3)]
+    for i, token in enumerate(tokens):
+        cache.put(token, read_token_claims(token), SimpleNamespace(id=i))
+
+    assert len(cache) == 2
+    assert cache.get(tokens[0]) is None
+
+    cache.invalidate_user(2)
+    assert cache.get(tokens[2]) is None
+    assert cache.get(tokens[1]) is not None
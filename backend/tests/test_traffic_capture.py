@@ -0,0 +1,73 @@
+from src.services.traffic_capture import (
+    KIND_LOOKUP, KIND_LOOKUP_MISS, KIND_SHORTEN, TrafficCapture, merge_traces, read_trace, traffic_capture,
+)
+from src.utils.generators import url_digest
+
+
+def test_capture_shorten_and_lookups(client, admin_headers, tmp_path, monkeypatch):
+    """Трейс содержит хеш сокращенной ссылки и коды просмотров с признаком промаха"""
+    monkeypatch.setattr(traffic_capture, "path", str(tmp_path / "trace"))
+    assert client.post("/admin/capture/start", headers=admin_headers).json()["active"]
+    url = "https://capture.test/page"
+    code = client.post("/shorten", json={"url": url}).json()["code"]
+    client.get(f"/{code}")
+    client.get("/no-such-code")
+    status = client.post("/admin/capture/stop", headers=admin_headers).json()
+
+    records = list(read_trace(status["path"]))
+    assert status["records"] == 3
+    assert [(kind, key) for _, kind, key in records] == [
+        (KIND_SHORTEN, url_digest(url)), (KIND_LOOKUP, code.encode()), (KIND_LOOKUP_MISS, b"no-such-code"),
+    ]
+    assert [ts for ts, _, _ in records] == sorted(ts for ts, _, _ in records)
+
+
+def test_sampling_by_key_and_merge(tmp_path):
+    """Выборка по ключу сохраняет все обращения записанного ключа; трейсы сливаются по времени"""
+    capture = TrafficCapture(str(tmp_path / "a"), sample_rate=0.5, max_bytes=1 << 20)
+    capture.start()
+    for i in range(200):
+        capture.record_lookup(f"code{i % 20}", found=True)
+    capture.stop()
+    counts = {}
+    for _, _, key in read_trace(capture.status()["path"]):
+        counts[key] = counts.get(key, 0) + 1
+    assert 0 < len(counts) < 20
+    assert set(counts.values()) == {10}
+
+    other = TrafficCapture(str(tmp_path / "b"), sample_rate=1.0, max_bytes=1 << 20)
+    other.start()
+    other.record_shorten("https://merge.test/")
+    other.stop()
+    merged = list(merge_traces([capture.status()["path"], other.status()["path"]]))
+    assert len(merged) == sum(counts.values()) + 1
+    assert [ts for ts, _, _ in merged] == sorted(ts for ts, _, _ in merged)
+
+
+def test_flag_reaches_other_workers(tmp_path):
+    """Запись, включенная в одном воркере, начинается и останавливается во всех"""
+    flag = str(tmp_path / "trace-enabled")
+    first, second = (
+        TrafficCapture(str(tmp_path / name), sample_rate=1.0, max_bytes=64, poll_interval=0, flag_path=flag)
+        for name in ("first", "second")
+    )
+    first.enable(0.5)
+    assert first.active and not second.active
+    second.record_lookup("code", found=True)
+    assert second.active and second.sample_rate == 0.5 and second.status()["enabled"]
+
+    # Лимит размера останавливает воркер до следующего enable
+    for _ in range(10):
+        second.record_lookup("code", found=True)
+    assert not second.active
+    second.record_lookup("code", found=True)
+    assert not second.active
+
+    first.disable()
+    assert not first.active
+    first.enable()
+    second.record_lookup("code", found=True)
+    assert second.active
+    first.disable()
+    second.record_lookup("code", found=True)
+    assert not second.active and not second.status()["enabled"]
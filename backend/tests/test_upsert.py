@@ -0,0 +1,58 @@
+import pytest
+
+from src.db.clients.lite_client import UrlInfoDbClient, db_path
+from src.db.session import get_db
+from src.utils.generators import url_digest
+
+
+def _data(url, code):
+    return {"short_url": f"http://sho.rt/{code}", "short_code": code, "original_url": url}
+
+
+@pytest.mark.asyncio
+async def test_process_returns_existing_row(client):
+    """Повторная вставка возвращает существующую строку без изменений"""
+    created = await UrlInfoDbClient.process(_data("https://upsert.test/a", "first"))
+    again = await UrlInfoDbClient.process(_data("https://upsert.test/a", "second"))
+
+    assert created.id is not None
+    assert (again.id, again.short_code, again.updated_at) == (created.id, "first", created.updated_at)
+
+
+@pytest.mark.asyncio
+async def test_existing_url_wins_over_taken_code(client):
+    """Существующая ссылка возвращается, даже если новый код занят другой ссылкой"""
+    created = await UrlInfoDbClient.process(_data("https://upsert.test/owner", "owner"))
+    await UrlInfoDbClient.process(_data("https://upsert.test/other", "taken"))
+
+    again = await UrlInfoDbClient.process(_data("https://upsert.test/owner", "taken"))
+    assert (again.id, again.short_code) == (created.id, "owner")
+
+
+@pytest.mark.asyncio
+async def test_duplicate_shorten_does_not_bump_clicks(client):
+    """Повторное сокращение не считается переходом"""
+    url = "https://upsert.test/clicks"
+    code = client.post("/shorten", json={"url": url}).json()["code"]
+    assert client.post("/shorten", json={"url": url}).json()["code"] == code
+
+    assert UrlInfoDbClient.get_by_id(url).clicks == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_link_is_replaced(client):
+    """Истекшая ссылка заменяется новой с тем же id"""
+    url = "https://upsert.test/expired"
+    created = await UrlInfoDbClient.process(_data(url, "old"))
+    with get_db(db_path) as conn:
+        conn.execute(
+            "UPDATE urls SET expires_at = datetime('now', '-1 minute') WHERE url_hash = ?",
+            (url_digest(url),)
+        )
+        conn.execute("INSERT INTO url_clicks (link_id, clicks) VALUES (?, 7)", (created.id,))
+        conn.commit()
+
+    replaced = await UrlInfoDbClient.process(_data(url, "new"))
+
+    assert (replaced.id, replaced.short_code, replaced.clicks) == (created.id, "new", 0)
+    assert replaced.expires_at is None
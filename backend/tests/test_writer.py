@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.core.metrics import Metrics
+from src.db.writer import DbWriter
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = tmp_path / "writer.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (value INTEGER UNIQUE)")
+    return str(path)
+
+
+async def test_group_commit(db_file):
+    """Одновременные записи объединяются в общие транзакции"""
+    Metrics.reset()
+    writer = DbWriter(db_file, max_batch=64)
+    await writer.start()
+
+    def insert(value):
+        return lambda conn: conn.execute("INSERT INTO items VALUES (?)", (value,)).rowcount
+
+    results = await asyncio.gather(*(writer.submit(insert(i)) for i in range(100)))
+    await writer.stop()
+
+    assert results == [1] * 100
+    batches = Metrics.snapshot()["summaries"]["db_writer.batch_size"]
+    assert batches["count"] < 100
+    assert batches["max"] > 1
+
+
+async def test_failed_op_does_not_abort_batch(db_file):
+    """Ошибка одной операции не откатывает остальные операции пачки"""
+    writer = DbWriter(db_file, max_batch=64)
+    await writer.start()
+
+    def insert(value):
+        return lambda conn: conn.execute("INSERT INTO items VALUES (?)", (value,)).rowcount
+
+    results = await asyncio.gather(
+        writer.submit(insert(1)),
+        writer.submit(insert(1)),
+        writer.submit(insert(2)),
+        return_exceptions=True,
+    )
+    await writer.stop()
+
+    assert results[0] == 1 and results[2] == 1
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2